@@ -0,0 +1,289 @@
+import copy
+import os
+import subprocess
+import sys
+
+from harness import Case, benchmark, main
+from toonbattle.calculator.clash.estimate import BattleInputs, estimate
+from toonbattle.calculator.common.cache import OutcomeCache
+from toonbattle.calculator.common.eventlog import EventLog
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.globals import ClashObjectRegistry
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects, MathTargets
+
+ScalingSizes = (4, 16, 64, 256)
+
+
+def make_battle(cogs: int = 4, toons: int = 4, always_hit: bool = True) -> ClashState:
+    battle = ClashState()
+    if always_hit:
+        battle.create_effect(battle, CommonEffects.ToonsHit)
+    for _ in range(toons):
+        battle.create_toon()
+    for i in range(cogs):
+        battle.create_cog(8 + i % 12, exe=i % 3 == 0)
+    return battle
+
+
+def add_effects(battle: ClashState):
+    for cog in battle.cogs:
+        battle.create_effect(cog, ClashEffects.Lured, knockback=50)
+        battle.create_effect(cog, ClashEffects.Soak)
+        battle.create_effect(cog, ClashEffects.Dazed)
+        battle.create_effect(cog, CommonEffects.Stun)
+    for toon in battle.toons:
+        battle.create_effect(toon, ClashEffects.Encore, multiplier=1.2)
+        battle.create_effect(toon, ClashEffects.Cheer)
+
+
+def cleanup(battle: ClashState):
+    battle.cleanup()
+
+
+def gags_for(battle: ClashState, track: int, level: int, parts: int, target=None) -> list[tuple]:
+    toons = list(battle.toons)
+    if target is None:
+        target = battle.cogs.at(0).avatar_id
+    return [(toons[i].avatar_id, track, level, target, False) for i in range(parts)]
+
+
+# construction
+
+
+@benchmark("construct.state")
+def construct_state():
+    return Case(ClashState)
+
+
+@benchmark("construct.create_cog")
+def construct_cog():
+    return Case(lambda battle: battle.create_cog(12), prepare=ClashState, teardown=cleanup)
+
+
+@benchmark("construct.create_toon")
+def construct_toon():
+    return Case(lambda battle: battle.create_toon(), prepare=ClashState, teardown=cleanup)
+
+
+@benchmark("construct.battle_4v4")
+def construct_battle():
+    return Case(lambda: cleanup(make_battle()))
+
+
+# run_gags per track
+
+
+def register_run_gags(name: str, track: int, level: int, parts: int, aoe: bool = False, effects: bool = False):
+    @benchmark(f"run_gags.{name}")
+    def run_gags_case():
+        def prepare():
+            battle = make_battle()
+            if effects:
+                add_effects(battle)
+            return battle, gags_for(battle, track, level, parts, () if aoe else None)
+
+        return Case(lambda arg: arg[0].run_gags(*arg[1]), prepare=prepare, teardown=lambda arg: cleanup(arg[0]))
+
+
+for _track in (ClashGags.Trap, ClashGags.Lure, ClashGags.Squirt, ClashGags.Zap, ClashGags.Throw, ClashGags.Drop):
+    register_run_gags(_track.name.lower(), _track, 6, 1)
+register_run_gags("toonup", ClashGags.ToonUp, 6, 1)
+register_run_gags("throw_x4", ClashGags.Throw, 6, 4)
+register_run_gags("squirt_x4", ClashGags.Squirt, 6, 4)
+register_run_gags("drop_x4", ClashGags.Drop, 6, 4)
+register_run_gags("sound_aoe", ClashGags.Sound, 6, 1, aoe=True)
+register_run_gags("sound_aoe_x4", ClashGags.Sound, 6, 4, aoe=True)
+register_run_gags("throw_x4_effects", ClashGags.Throw, 6, 4, effects=True)
+register_run_gags("sound_aoe_x4_effects", ClashGags.Sound, 6, 4, aoe=True, effects=True)
+
+
+@benchmark("use_gags.tick_effects")
+def use_gags_tick():
+    def prepare():
+        battle = make_battle()
+        add_effects(battle)
+        return battle
+
+    return Case(lambda battle: battle.use_gags(), prepare=prepare, teardown=cleanup)
+
+
+@benchmark("use_gags.same_state")
+def use_gags_same_state():
+    # definitions, the gag controller and the Stun effects are reused between turns (see common/pooling.py)
+    battle = make_battle()
+    gags = gags_for(battle, ClashGags.Throw, 3, 4)
+
+    def run():
+        with battle.fork():
+            battle.use_gags(*gags)
+
+    return Case(run)
+
+
+@benchmark("use_gags.recorded")
+def use_gags_recorded():
+    # the same turn as use_gags.same_state, written to an event log
+    battle = make_battle()
+    gags = gags_for(battle, ClashGags.Throw, 3, 4)
+    log = EventLog(os.devnull)
+    battle.event_log = log
+
+    def run():
+        with battle.fork():
+            battle.use_gags(*gags)
+        log.flush()
+
+    return Case(run)
+
+
+@benchmark("deal_damage.many_effects")
+def deal_damage_effects():
+    battle = make_battle(cogs=4)
+    add_effects(battle)
+    cog = battle.cogs(0)
+    toon = battle.toons(0)
+
+    def run():
+        battle.deal_damage(cog, (10, dict(author=toon)), (10, dict(author=toon)), source=None)
+        cog.health = cog.max_health
+
+    return Case(run)
+
+
+@benchmark("calculate.accuracy")
+def calculate_accuracy():
+    battle = make_battle()
+    add_effects(battle)
+    cog = battle.cogs(0)
+    toon = battle.toons(0)
+    return Case(lambda: battle.calculate(MathTargets.Accuracy, 0.7, subject=cog, author=toon))
+
+
+# serialization and branching
+
+
+@benchmark("wrap")
+def wrap():
+    battle = make_battle()
+    add_effects(battle)
+    return Case(battle.wrap)
+
+
+@benchmark("unwrap")
+def unwrap():
+    battle = make_battle()
+    add_effects(battle)
+    wrapped = battle.wrap()
+    return Case(ClashObjectRegistry.unwrap, prepare=lambda: copy.deepcopy(wrapped))
+
+
+@benchmark("fork.rollback")
+def fork_rollback():
+    battle = make_battle()
+    add_effects(battle)
+
+    def run():
+        with battle.fork():
+            battle.deal_damage(battle.cogs(0), 10)
+
+    return Case(run)
+
+
+@benchmark("run_gags_exact.drop_x2")
+def run_gags_exact():
+    battle = make_battle(always_hit=False)
+    gags = gags_for(battle, ClashGags.Drop, 6, 2)
+    return Case(lambda: battle.run_gags_exact(*gags))
+
+
+@benchmark("run_gags_exact.cached")
+def run_gags_exact_cached():
+    battle = make_battle(always_hit=False)
+    add_effects(battle)
+    gags = gags_for(battle, ClashGags.Drop, 6, 2)
+    cache = OutcomeCache()
+    battle.run_gags_exact(*gags, cache=cache)
+    return Case(lambda: battle.run_gags_exact(*gags, cache=cache))
+
+
+@benchmark("estimate.drop_x2")
+def estimate_drop():
+    battle = make_battle(always_hit=False)
+    gags = gags_for(battle, ClashGags.Drop, 6, 2)
+    inputs = BattleInputs.from_state(battle)
+    return Case(lambda: estimate(inputs, gags))
+
+
+@benchmark("cog_turn.4v4")
+def cog_turn():
+    battle = make_battle(always_hit=False)
+
+    def run():
+        with battle.fork():
+            battle.cogs_attack()
+
+    return Case(run)
+
+
+# startup of a fresh interpreter, as paid by every CLI run and worker process
+
+
+def register_startup(name: str, code: str):
+    @benchmark(f"startup.{name}", group="startup")
+    def startup():
+        return Case(lambda: subprocess.run([sys.executable, "-c", code], check=True))
+
+
+ImportState = "from toonbattle.calculator.common.state import ClashState"
+register_startup("interpreter", "pass")
+register_startup("import_state", ImportState)
+register_startup("load_ruleset", f"{ImportState}; ClashState.Rules.load()")
+register_startup("first_battle", f"{ImportState}; ClashState().create_cog(1)")
+
+
+# scaling of the AvatarHolder paths with many avatars
+
+
+def register_scaling(size: int):
+    @benchmark(f"scaling.index[{size}]", group="scaling")
+    def index_case():
+        battle = make_battle(cogs=size)
+        last = battle.cogs.at(size - 1)
+        return Case(lambda: battle.cogs.index(last))
+
+    @benchmark(f"scaling.neighbours[{size}]", group="scaling")
+    def neighbours_case():
+        battle = make_battle(cogs=size)
+        middle = battle.cogs.at(size // 2)
+
+        def run():
+            index = battle.cogs.index(middle)
+            return battle.cogs.at(index - 1), battle.cogs.at(index + 1)
+
+        return Case(run)
+
+    @benchmark(f"scaling.remove[{size}]", group="scaling")
+    def remove_case():
+        def prepare():
+            battle = make_battle(cogs=size)
+            return battle, battle.cogs.at(size // 2)
+
+        return Case(lambda arg: arg[0].cogs.remove(arg[1]), prepare=prepare, teardown=lambda arg: cleanup(arg[0]))
+
+    @benchmark(f"scaling.squirt_effects[{size}]", group="scaling")
+    def squirt_case():
+        def prepare():
+            battle = make_battle(cogs=size)
+            add_effects(battle)
+            middle = battle.cogs.at(size // 2).avatar_id
+            return battle, gags_for(battle, ClashGags.Squirt, 6, 2, middle)
+
+        return Case(lambda arg: arg[0].run_gags(*arg[1]), prepare=prepare, teardown=lambda arg: cleanup(arg[0]))
+
+
+for _size in ScalingSizes:
+    register_scaling(_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Optional
+
+
+class Case:
+    """
+    What a benchmark function returns: `run` is timed, `prepare` (untimed) builds its argument
+    for every call, and `teardown` (untimed) receives the same argument afterwards.
+    """
+
+    def __init__(self, run: Callable, prepare: Optional[Callable] = None, teardown: Optional[Callable] = None):
+        self.run = run
+        self.prepare = prepare
+        self.teardown = teardown
+
+
+class Benchmark:
+    def __init__(self, name: str, group: str, func: Callable[[], Case]):
+        self.name = name
+        self.group = group
+        self.func = func
+
+    def measure(self, min_time: float, min_runs: int) -> dict:
+        case = self.func()
+        timings = []
+        started = time.perf_counter()
+        while len(timings) < min_runs or time.perf_counter() - started < min_time:
+            arg = case.prepare() if case.prepare else None
+            before = time.perf_counter()
+            if case.prepare:
+                case.run(arg)
+            else:
+                case.run()
+            timings.append(time.perf_counter() - before)
+            if case.teardown:
+                case.teardown(arg)
+
+        return {
+            "name": self.name,
+            "group": self.group,
+            "runs": len(timings),
+            "mean_us": statistics.fmean(timings) * 1e6,
+            "median_us": statistics.median(timings) * 1e6,
+            "min_us": min(timings) * 1e6,
+            "stdev_us": (statistics.stdev(timings) if len(timings) > 1 else 0.0) * 1e6,
+        }
+
+
+Benchmarks: list[Benchmark] = []
+
+
+def benchmark(name: str, group: str = "calculator"):
+    def decorator(func: Callable[[], Case]):
+        Benchmarks.append(Benchmark(name, group, func))
+        return func
+
+    return decorator
+
+
+def run_all(name_filter: str = "", min_time: float = 0.2, min_runs: int = 5) -> dict:
+    results = []
+    for bench in Benchmarks:
+        if name_filter not in bench.name:
+            continue
+        result = bench.measure(min_time, min_runs)
+        print(f"{bench.name:<48} {result['median_us']:>12.1f} us  ({result['runs']} runs)", file=sys.stderr)
+        results.append(result)
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Names of benchmarks whose median got slower than the baseline by more than `threshold` (0.1 = 10%)."""
+    old = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        if result["name"] not in old:
+            continue
+        ratio = result["median_us"] / old[result["name"]]["median_us"]
+        marker = ""
+        if ratio > 1 + threshold:
+            regressions.append(result["name"])
+            marker = "  REGRESSION"
+        print(f"{result['name']:<48} x{ratio:.3f}{marker}", file=sys.stderr)
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the toonbattle benchmarks")
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend on every benchmark")
+    parser.add_argument("--min-runs", type=int, default=5)
+    parser.add_argument("--compare", help="baseline JSON file; exit with 1 when a benchmark regressed")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    current = run_all(args.filter, args.min_time, args.min_runs)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, current, args.threshold):
+            sys.exit(1)
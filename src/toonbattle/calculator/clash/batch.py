@@ -0,0 +1,443 @@
+"""
+Vectorized Monte Carlo engine for Clash turns.
+
+Simulates N independent trials of one run_gags (or use_gags) call at once, keeping health,
+effect turns and effect values as NumPy arrays with the trial axis first.
+The rules mirror clash/gags.py and clash/effects.py:
+
+* accuracy is rolled once per merged gag (once per part for Drop), Trap and Zap are decided by the
+  target's effects, and Lured targets / the ToonsHit debug effect make the roll always succeed;
+* damage modifiers are applied the way the message cluster applies them, toon effects (Encore, Winded)
+  first and cog effects (Lure knockback) second;
+* effects that already exist are not refreshed when created again, except for Stun which stacks.
+
+Requires numpy, which is an optional dependency of toonbattle.
+"""
+from math import ceil
+from typing import Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+
+from toonbattle.calculator.clash import cog_config, gag_config
+from toonbattle.calculator.clash.effects import EffectLured
+from toonbattle.calculator.clash.plan import PlannedGag, PlannedPart, plan_state_gags
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects, DamageSources
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import ClashState
+
+UnlureSources = (DamageSources.Squirt, DamageSources.Sound, DamageSources.Throw, DamageSources.Zap)
+KnockbackSources = (DamageSources.Squirt, DamageSources.Throw)
+
+
+def _effect_value(avatar, effect_id: int, attribute: str, default):
+    effect = avatar.effects.get(effect_id)
+    if effect is None:
+        return default
+    return getattr(effect, attribute)
+
+
+class BatchState:
+    """Per-trial arrays of a battle. Cog arrays are (trials, cogs), toon arrays are (trials, toons)."""
+
+    def __init__(self, state: "ClashState", trials: int, rng: Optional[np.random.Generator] = None):
+        self.trials = trials
+        self.rng = rng if rng is not None else np.random.default_rng()
+        cogs = list(state.cogs)
+        toons = list(state.toons)
+        self.cog_ids = [str(cog.avatar_id) for cog in cogs]
+        self.toon_ids = [str(toon.avatar_id) for toon in toons]
+        self.always_hit = state.effects.get(CommonEffects.ToonsHit) is not None
+
+        def tile(values, dtype) -> np.ndarray:
+            return np.tile(np.asarray(values, dtype=dtype).reshape(1, -1), (trials, 1))
+
+        def cog_effect(effect_id: int, attribute: str, default, dtype) -> np.ndarray:
+            return tile([_effect_value(cog, effect_id, attribute, default) for cog in cogs], dtype)
+
+        def toon_effect(effect_id: int, attribute: str, default, dtype) -> np.ndarray:
+            return tile([_effect_value(toon, effect_id, attribute, default) for toon in toons], dtype)
+
+        self.cog_health = tile([cog.health for cog in cogs], np.int64)
+        self.cog_max_health = np.asarray([cog.max_health for cog in cogs], dtype=np.int64)
+        self.executive = np.asarray([getattr(cog, "executive", False) for cog in cogs], dtype=bool)
+        self.cog_level = np.asarray(
+            [min(max(getattr(cog, "level", 1), 0), cog_config.MaxCogLevel) for cog in cogs], dtype=np.int64
+        )
+        self.skelecog = np.asarray(
+            [_effect_value(cog, ClashEffects.SkelecogReduction, "stacks", 0) for cog in cogs], dtype=np.int64
+        )
+
+        self.lured_turns = cog_effect(ClashEffects.Lured, "turns", 0, np.int64)
+        self.knockback = cog_effect(ClashEffects.Lured, "knockback", 0, np.int64)
+        self.trapped = tile([cog.effects.get(ClashEffects.Trapped) is not None for cog in cogs], bool)
+        self.trap_value = cog_effect(ClashEffects.Trapped, "value", 0.0, np.float64)
+        # a zapped Soak stays on the cog with 0 turns until the end of the turn, so presence is tracked separately
+        self.soaked = tile([cog.effects.get(ClashEffects.Soak) is not None for cog in cogs], bool)
+        self.soak_turns = cog_effect(ClashEffects.Soak, "turns", 0, np.int64)
+        self.stun_stacks = cog_effect(CommonEffects.Stun, "stacks", 0, np.int64)
+        self.dazed_turns = cog_effect(ClashEffects.Dazed, "turns", 0, np.int64)
+
+        self.toon_health = tile([toon.health for toon in toons], np.int64)
+        self.toon_max_health = np.asarray([toon.max_health for toon in toons], dtype=np.int64)
+        self.encore_turns = toon_effect(ClashEffects.Encore, "turns", 0, np.int64)
+        self.encore_multiplier = toon_effect(ClashEffects.Encore, "multiplier", 1.0, np.float64)
+        self.winded_turns = toon_effect(ClashEffects.Winded, "turns", 0, np.int64)
+        self.cheer_turns = toon_effect(ClashEffects.Cheer, "turns", 0, np.int64)
+
+    # effect helpers
+
+    def cog_rounds(self, turns: int, cog: int) -> np.ndarray:
+        rounds = np.full(self.trials, turns - self.skelecog[cog], dtype=np.int64)
+        manager = self.cog_health[:, cog] >= 1.5 * self.cog_max_health[cog]
+        rounds = np.where(manager, 2, rounds)
+        return np.maximum(rounds, 1)
+
+    @staticmethod
+    def create(turns: np.ndarray, value, mask: np.ndarray) -> np.ndarray:
+        """Timed effect creation: existing effects are kept as they are."""
+        return np.where(mask & (turns <= 0), value, turns)
+
+    def stun(self, cog: int, stacks: int, mask: np.ndarray):
+        self.stun_stacks[:, cog] += np.where(mask, stacks, 0)
+
+    def unlure(self, cog: int, mask: np.ndarray):
+        self.lured_turns[:, cog] = np.where(mask, 0, self.lured_turns[:, cog])
+
+    def soak(self, cog: int, rounds: int, mask: np.ndarray):
+        created = mask & ~self.soaked[:, cog]
+        self.soak_turns[:, cog] = np.where(created, self.cog_rounds(rounds, cog), self.soak_turns[:, cog])
+        self.soaked[:, cog] |= created
+
+    def wind(self, toon: int, mask: np.ndarray):
+        # Encore listener: dealing Sound damage with Encore active makes the toon Winded
+        mask = mask & (self.encore_turns[:, toon] > 0)
+        self.winded_turns[:, toon] = self.create(self.winded_turns[:, toon], 3, mask)
+
+    # damage helpers
+
+    def damage_value(self, gag: PlannedGag, part: PlannedPart) -> float:
+        return gag_config.ClashGagConfiguration[gag.track].damages[part.level]
+
+    def part_damage(self, value: float, author: Optional[int], source: int, cog: int) -> np.ndarray:
+        damage = np.full(self.trials, float(value))
+        if author is not None:
+            encore = self.encore_turns[:, author] > 0
+            damage = damage * np.where(encore, self.encore_multiplier[:, author], 1.0)
+            if source == DamageSources.Sound:
+                winded = self.winded_turns[:, author]
+                damage = damage * np.where((winded > 0) & (winded < 3), 0.5, 1.0)
+        if source in KnockbackSources:
+            damage = damage + np.where(self.lured_turns[:, cog] > 0, self.knockback[:, cog], 0)
+        return damage
+
+    def deal(self, cog: int, damage: np.ndarray | float, mask: np.ndarray):
+        self.cog_health[:, cog] -= np.where(mask, np.ceil(damage), 0).astype(np.int64)
+
+    def heal(self, toon: int, value: float, mask: np.ndarray):
+        missing = self.toon_max_health[toon] - self.toon_health[:, toon]
+        healed = np.ceil(np.minimum(value, missing)).astype(np.int64)
+        self.toon_health[:, toon] += np.where(mask, healed, 0)
+
+    def perform_attack(self, gag: PlannedGag, cogs: Sequence[int], source: int, mask: np.ndarray, combo=0.0):
+        for cog in cogs:
+            total = np.zeros(self.trials)
+            for part in gag.parts:
+                damage = self.part_damage(self.damage_value(gag, part), part.author, source, cog)
+                self.deal(cog, damage, mask)
+                total += damage
+                if source == DamageSources.Sound:
+                    self.wind(part.author, mask)
+
+            if source in UnlureSources:
+                self.unlure(cog, mask)
+            self.stun(cog, len(gag.parts), mask)
+            if combo and len(gag.parts) > 1:
+                self.deal(cog, total * combo, mask)
+
+    # rolls
+
+    def accuracy(self, gag: PlannedGag) -> np.ndarray:
+        if self.always_hit:
+            return np.ones(self.trials)
+
+        configuration = gag_config.ClashGagConfiguration[gag.track]
+        base = max(configuration.accuracy[level] for level in gag.levels)
+        accuracy = np.full(self.trials, min(0.7 + base, 0.95))
+        if not gag.targets_toons and len(gag.target) == 1:
+            accuracy = np.where(self.lured_turns[:, gag.target[0]] > 0, 1.0, accuracy)
+        return accuracy
+
+    def roll(self, accuracy: np.ndarray) -> np.ndarray:
+        return self.rng.random(self.trials) <= accuracy
+
+    # gags
+
+    def apply(self, gag: PlannedGag) -> np.ndarray:
+        return getattr(self, f"apply_{ClashGags(gag.track).name.lower()}")(gag)
+
+    def apply_toonup(self, gag: PlannedGag) -> np.ndarray:
+        hit = self.roll(self.accuracy(gag))
+        first = gag.parts[0]
+        damage = gag_config.ClashGagConfiguration[gag.track].damages[first.level]
+        for mask, multiplier in ((hit, 1), (~hit, gag_config.ToonupMissMultiplier)):
+            value = damage * multiplier
+            if first.prestige:
+                self.heal(first.author, value * gag_config.ToonupSelfHeal, mask)
+
+            if gag.max_level % 2 == 0:
+                healed = gag.target[:1]
+                self.heal(healed[0], value, mask)
+            else:
+                healed = tuple(toon for toon in range(len(self.toon_ids)) if toon != first.author)
+                for toon in healed:
+                    self.heal(toon, value / len(healed), mask)
+
+            if multiplier == 1:
+                for toon in healed:
+                    self.cheer_turns[:, toon] = self.create(self.cheer_turns[:, toon], 1, mask)
+        return hit
+
+    def apply_trap(self, gag: PlannedGag) -> np.ndarray:
+        cog = gag.target[0]
+        hit = ~self.trapped[:, cog] & (self.lured_turns[:, cog] <= 0)
+        self.stun(cog, len(gag.parts), hit)
+        if len(gag.parts) > 1:
+            return hit
+
+        part = gag.parts[0]
+        damage = self.damage_value(gag, part)
+        if self.executive[cog]:
+            damage *= gag_config.TrapExecutiveBoost
+        if part.prestige:
+            damage *= gag_config.TrapPrestigeBoost
+        damage = self.part_damage(damage, part.author, DamageSources.Trap, cog)
+        self.trap_value[:, cog] = np.where(hit, damage, self.trap_value[:, cog])
+        self.trapped[:, cog] |= hit
+        return hit
+
+    def apply_lure(self, gag: PlannedGag) -> np.ndarray:
+        hit = self.roll(self.accuracy(gag))
+        for cog in gag.target:
+            parts = [part for part in gag.parts if part.targets == () or cog in part.targets]
+            if not parts:
+                continue
+
+            knockback = max(self.lure_knockback(part) for part in parts)
+            # Lure.apply_hit passes the configured rounds as `rounds`, which StatusEffectTimed does not read,
+            # so the effect gets its default duration
+            rounds = EffectLured.DefaultTurns
+
+            # Trapped replaces the creation of Lured: the trap goes off and the cog gets Dazed instead
+            sprung = hit & self.trapped[:, cog]
+            self.trapped[:, cog] &= ~sprung
+            self.deal(cog, self.trap_value[:, cog], sprung)
+            self.dazed_turns[:, cog] = self.create(self.dazed_turns[:, cog], self.cog_rounds(2, cog), sprung)
+
+            lured = hit & ~sprung & (self.lured_turns[:, cog] <= 0)
+            self.lured_turns[:, cog] = np.where(lured, self.cog_rounds(rounds, cog), self.lured_turns[:, cog])
+            self.knockback[:, cog] = np.where(lured, knockback, self.knockback[:, cog])
+        return hit
+
+    @staticmethod
+    def lure_knockback(part: PlannedPart) -> int:
+        damage = gag_config.ClashGagConfiguration[ClashGags.Lure].damages[part.level]
+        if part.prestige:
+            if part.level % 2:
+                damage *= gag_config.PrestigeLureAoEBoost
+            else:
+                damage *= gag_config.PrestigeLureSingleTargetBoost
+        return ceil(damage)
+
+    def apply_squirt(self, gag: PlannedGag) -> np.ndarray:
+        hit = self.roll(self.accuracy(gag))
+        cog = gag.target[0]
+        self.perform_attack(gag, (cog,), DamageSources.Squirt, hit, combo=gag_config.SquirtComboDamage)
+
+        splash = 0
+        for part in gag.parts:
+            if part.prestige:
+                splash += self.damage_value(gag, part) * gag_config.SquirtPrestigeSplashDamage
+            else:
+                splash += self.damage_value(gag, part) * gag_config.SquirtSplashDamage
+
+        rounds = gag_config.ClashGagConfiguration[gag.track].extras["rounds"][gag.max_level]
+        self.soak(cog, rounds, hit)
+        for neighbour in (cog + 1, cog - 1):
+            if not 0 <= neighbour < len(self.cog_ids):
+                continue
+            self.deal(neighbour, splash, hit)
+            self.soak(neighbour, rounds, hit)
+        return hit
+
+    def apply_zap(self, gag: PlannedGag) -> np.ndarray:
+        cog = gag.target[0]
+        hit = self.soaked[:, cog].copy()
+        self.unlure(cog, ~hit)
+
+        def soaked(position: int) -> np.ndarray:
+            if not 0 <= position < len(self.cog_ids):
+                return np.zeros(self.trials, dtype=bool)
+            return self.soaked[:, position]
+
+        options = (
+            (cog + 1, cog + 2),
+            (cog + 1,),
+            (cog - 1, cog - 2),
+            (cog - 1,),
+        )
+        self.perform_attack(gag, (cog,), DamageSources.Zap, hit)
+        self.soak_turns[:, cog] = np.where(hit, 0, self.soak_turns[:, cog])
+
+        total = sum(self.damage_value(gag, part) for part in gag.parts)
+        if gag.parts[0].prestige:
+            total *= gag_config.ZapPrestigePool
+        else:
+            total *= gag_config.ZapUnprestigePool
+
+        remaining = hit.copy()
+        for pool in options:
+            chosen = remaining.copy()
+            for position in pool:
+                chosen &= soaked(position)
+            remaining &= ~chosen
+            for position in pool:
+                self.soak_turns[:, position] = np.where(chosen, 0, self.soak_turns[:, position])
+                self.deal(position, total / len(pool), chosen)
+        return hit
+
+    def apply_throw(self, gag: PlannedGag) -> np.ndarray:
+        hit = self.roll(self.accuracy(gag))
+        self.perform_attack(gag, gag.target[:1], DamageSources.Throw, hit, combo=gag_config.ThrowComboDamage)
+        for part in gag.parts:
+            if part.prestige:
+                self.heal(part.author, self.damage_value(gag, part) * gag_config.ThrowPrestigeHealingValue, hit)
+        return hit
+
+    def apply_sound(self, gag: PlannedGag) -> np.ndarray:
+        hit = self.roll(self.accuracy(gag))
+        self.perform_attack(gag, range(len(self.cog_ids)), DamageSources.Sound, hit)
+        for part in gag.parts:
+            toon = part.author
+            if part.prestige:
+                encore = gag_config.EncorePrestigeValue
+            else:
+                encore = gag_config.EncoreUnprestigeValue
+            # Winded replaces the creation of Encore
+            created = hit & (self.winded_turns[:, toon] <= 0) & (self.encore_turns[:, toon] <= 0)
+            self.encore_turns[:, toon] = np.where(created, 2, self.encore_turns[:, toon])
+            self.encore_multiplier[:, toon] = np.where(created, encore, self.encore_multiplier[:, toon])
+        return hit
+
+    def apply_drop(self, gag: PlannedGag) -> np.ndarray:
+        cog = gag.target[0]
+        lured = self.lured_turns[:, cog] > 0
+        accuracy = np.where(lured, 0.0, self.accuracy(gag))
+        debuffed = np.zeros(self.trials, dtype=bool)
+        for target in gag.target:
+            debuffed |= (self.lured_turns[:, target] > 0) | self.soaked[:, target]
+
+        total = np.zeros(self.trials)
+        hits = np.zeros(self.trials, dtype=np.int64)
+        for part in gag.parts:
+            value = self.damage_value(gag, part)
+            if part.prestige:
+                value = np.where(debuffed, value * gag_config.DropDebuffMultiplier, value)
+            part_hit = self.roll(accuracy)
+            damage = self.part_damage(value, part.author, DamageSources.Drop, cog)
+            self.deal(cog, damage, part_hit)
+            total += np.where(part_hit, damage, 0)
+            hits += part_hit
+
+        self.deal(cog, total * gag_config.DropComboDamage, hits > 1)
+        return hits > 0
+
+    def cog_turn(self):
+        """Every living, unlured cog attacks once, as in clash/cog_attacks.py."""
+        alive = self.toon_health > 0
+        alive_count = alive.sum(axis=1)
+        for cog in range(len(self.cog_ids)):
+            level = self.cog_level[cog]
+            accuracy = np.full(self.trials, cog_config.CogAttackAccuracy[level])
+            accuracy -= np.where(self.dazed_turns[:, cog] > 0, cog_config.DazedAccuracyPenalty, 0.0)
+            accuracy -= cog_config.StunAccuracyPenalty * self.stun_stacks[:, cog]
+
+            kind = self.rng.random(self.trials)
+            target = self.rng.random(self.trials)
+            attacking = (self.cog_health[:, cog] > 0) & (self.lured_turns[:, cog] <= 0) & (alive_count > 0)
+            hit = attacking & (self.rng.random(self.trials) <= np.maximum(accuracy, 0.0))
+
+            damage = np.full(self.trials, cog_config.CogAttackDamage[level], dtype=np.float64)
+            if self.executive[cog]:
+                damage *= cog_config.ExecutiveAttackBoost
+            manager = self.cog_health[:, cog] >= 1.5 * self.cog_max_health[cog]
+            damage = np.where(manager, damage * cog_config.ManagerAttackBoost, damage)
+
+            group = kind < cog_config.GroupAttackChance
+            # the k-th toon that was alive at the start of the turn
+            chosen = np.floor(target * alive_count).astype(np.int64)
+            single = np.argmax(np.cumsum(alive, axis=1) > chosen[:, None], axis=1)
+            for toon in range(len(self.toon_ids)):
+                damaged = hit & alive[:, toon] & (group | (single == toon))
+                value = np.where(group, damage * cog_config.GroupAttackMultiplier, damage)
+                self.toon_health[:, toon] -= np.where(damaged, np.ceil(value), 0).astype(np.int64)
+
+    def tick(self):
+        """Events.ToonsMoved: every timed effect loses a turn."""
+        for turns in (
+            self.lured_turns,
+            self.soak_turns,
+            self.dazed_turns,
+            self.encore_turns,
+            self.winded_turns,
+            self.cheer_turns,
+        ):
+            turns -= turns > 0
+        self.soaked &= self.soak_turns > 0
+        self.stun_stacks[:] = 0
+
+
+class BatchResult:
+    """Final per-trial state of a batch, plus which merged gags hit in each trial."""
+
+    def __init__(self, batch: BatchState, gags: list[PlannedGag], hits: np.ndarray):
+        self.batch = batch
+        self.gags = gags
+        self.hits = hits
+
+    @property
+    def trials(self) -> int:
+        return self.batch.trials
+
+    def health(self, avatar_id) -> np.ndarray:
+        avatar_id = str(avatar_id)
+        if avatar_id in self.batch.cog_ids:
+            return self.batch.cog_health[:, self.batch.cog_ids.index(avatar_id)]
+        return self.batch.toon_health[:, self.batch.toon_ids.index(avatar_id)]
+
+    def kill_probability(self, *avatar_ids) -> float:
+        killed = np.ones(self.trials, dtype=bool)
+        for avatar_id in avatar_ids:
+            killed &= self.health(avatar_id) <= 0
+        return float(killed.mean())
+
+    def expected_health(self, avatar_id) -> float:
+        return float(self.health(avatar_id).mean())
+
+    def __repr__(self):
+        return f"BatchResult({self.trials} trials, {len(self.gags)} gags)"
+
+
+def run_batch(
+    state: "ClashState", gags: Sequence[tuple], trials: int, seed=None, use: bool = False, cogs_attack: bool = False
+) -> BatchResult:
+    batch = BatchState(state, trials, np.random.default_rng(seed))
+    planned = plan_state_gags(state, gags)
+    hits = np.zeros((trials, len(planned)), dtype=bool)
+    for index, gag in enumerate(planned):
+        hits[:, index] = batch.apply(gag)
+    if cogs_attack:
+        batch.cog_turn()
+    if use:
+        batch.tick()
+    return BatchResult(batch, planned, hits)
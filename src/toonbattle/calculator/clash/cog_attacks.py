@@ -0,0 +1,75 @@
+"""
+Cog turn of a Clash battle, see ClashState.play_round.
+
+Every cog which is alive and not lured attacks once, either a single toon (picked uniformly among the
+toons alive when the turn starts) or, with GroupAttackChance, every one of them. Damage and accuracy
+come from the per-level tables of clash/cog_config.py; executives and managers hit harder, and Dazed
+and Stun make cogs miss more often. Attacks are plain tuples and damage goes straight through
+deal_damage, so a turn creates no objects besides them.
+"""
+from typing import TYPE_CHECKING, TypeAlias
+
+from toonbattle.calculator.clash import cog_config
+from toonbattle.calculator.helpers.enums import ClashEffects, CommonEffects, DamageSources
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.clash.cogs import ClashCog
+    from toonbattle.calculator.common.avatar import Toon
+    from toonbattle.calculator.common.state import CalculationState
+
+# (cog, toons that were hit, damage dealt to each of them)
+CogAttack: TypeAlias = tuple["ClashCog", tuple["Toon", ...], float]
+
+# [level][executive][manager]
+AttackDamage = tuple(
+    tuple(
+        tuple(
+            damage
+            * (cog_config.ExecutiveAttackBoost if executive else 1)
+            * (cog_config.ManagerAttackBoost if manager else 1)
+            for manager in (False, True)
+        )
+        for executive in (False, True)
+    )
+    for damage in cog_config.CogAttackDamage
+)
+
+
+def attack_damage(cog: "ClashCog") -> float:
+    level = min(max(cog.level, 0), cog_config.MaxCogLevel)
+    return AttackDamage[level][cog.executive][cog.manager]
+
+
+def attack_accuracy(cog: "ClashCog") -> float:
+    level = min(max(cog.level, 0), cog_config.MaxCogLevel)
+    accuracy = cog_config.CogAttackAccuracy[level]
+    if ClashEffects.Dazed in cog.effects:
+        accuracy -= cog_config.DazedAccuracyPenalty
+    if stun := cog.effects.get(CommonEffects.Stun):
+        accuracy -= cog_config.StunAccuracyPenalty * stun.stacks
+    return max(accuracy, 0.0)
+
+
+def cog_turn(state: "CalculationState") -> list[CogAttack]:
+    toons = [toon for toon in state.toons if toon.health > 0]
+    if not toons:
+        return []
+
+    attackers = [cog for cog in state.cogs if cog.health > 0 and ClashEffects.Lured not in cog.effects]
+    # attack kinds and targets are drawn for every cog up front
+    draws = [(state.draw(), state.draw()) for _ in attackers]
+    attacks = []
+    for cog, (kind, target) in zip(attackers, draws):
+        if not state.roll(attack_accuracy(cog)):
+            continue
+
+        damage = attack_damage(cog)
+        if kind < cog_config.GroupAttackChance:
+            targets = tuple(toons)
+            damage *= cog_config.GroupAttackMultiplier
+        else:
+            targets = (toons[int(target * len(toons))],)
+        for toon in targets:
+            state.deal_damage(toon, damage, author=cog, source=DamageSources.CogAttack)
+        attacks.append((cog, targets, damage))
+    return attacks
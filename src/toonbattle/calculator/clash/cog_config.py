@@ -0,0 +1,17 @@
+from math import ceil
+
+MaxCogLevel = 20
+
+# per cog level (index 0 is unused): damage of a single target attack and its accuracy
+CogAttackDamage = tuple(ceil(2 + 1.6 * level) for level in range(MaxCogLevel + 1))
+CogAttackAccuracy = tuple(min(0.6 + 0.02 * level, 0.95) for level in range(MaxCogLevel + 1))
+
+# a group attack hits every toon for a fraction of the single target damage
+GroupAttackChance = 0.25
+GroupAttackMultiplier = 0.6
+
+ExecutiveAttackBoost = 1.25
+ManagerAttackBoost = 1.5
+
+DazedAccuracyPenalty = 0.1
+StunAccuracyPenalty = 0.1  # per stack
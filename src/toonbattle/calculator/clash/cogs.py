@@ -1,9 +1,5 @@
-import random
-
-from pycluster.messenger.helpers import math
-
 from toonbattle.calculator.common.avatar import AvatarHolder, Cog, Toon
-from toonbattle.calculator.helpers.decorators import check_subject
+from toonbattle.calculator.helpers.dispatch import subject_math
 from toonbattle.calculator.helpers.enums import AuxillaryObjects, ClashEffects, MathTargets
 from toonbattle.calculator.globals import ClashObjectRegistry as COReg
 from toonbattle.calculator.common.status_effects import StatusEffectController
@@ -16,6 +12,7 @@ COReg.bind(AuxillaryObjects.Toon, Toon)
 @COReg.register(AuxillaryObjects.Cog)
 class ClashCog(Cog):
     executive: bool = False
+    level: int = 1
 
     @classmethod
     def from_level(
@@ -42,10 +39,11 @@ class ClashCog(Cog):
             max_health *= 1.5
 
         if skelecog:
-            max_health *= 1.1 - (random.random() * 0.2 * skelecog)
+            max_health *= 1.1 - (holder.parent_cluster.draw() * 0.2 * skelecog)
 
         cog = holder.create(max_health=max_health, defense=defense, cast_to=ClashCog)
         cog.executive = exe
+        cog.level = level
         if skelecog:
             cog.parent_cluster.create_effect(cog, ClashEffects.SkelecogReduction, stacks=skelecog)
         return cog
@@ -54,8 +52,7 @@ class ClashCog(Cog):
     def manager(self) -> bool:
         return self.health / self.max_health >= 1.5
 
-    @math(MathTargets.EffectRounds, priority=-100)
-    @check_subject
+    @subject_math(MathTargets.EffectRounds, priority=-100)
     def change_effect_rounds(self, value: int, **kwargs):
         if self.manager:
             return 2
@@ -0,0 +1,309 @@
+import heapq
+import itertools
+from math import ceil
+from typing import Callable, Iterable, Iterator, Optional, Sequence, TYPE_CHECKING
+
+from toonbattle.calculator.clash import gag_config
+from toonbattle.calculator.clash.gag_config import ClashGagTuple
+from toonbattle.calculator.clash.plan import plan_gags
+from toonbattle.calculator.common.outcomes import effects_of
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import ClashState
+
+# (track 0-indexed, level 0-indexed, prestige)
+AvailableGag = tuple[int, int, bool]
+
+MaxKnockback = max(
+    ceil(damage * gag_config.PrestigeLureSingleTargetBoost)
+    for damage in gag_config.ClashGagConfiguration[ClashGags.Lure].damages
+)
+MaxEncore = max(gag_config.EncorePrestigeValue, gag_config.EncoreUnprestigeValue)
+
+
+def fewest_gags(gag: ClashGagTuple) -> float:
+    return 1
+
+
+def cheapest_gags(gag: ClashGagTuple) -> float:
+    return gag[2] + 1
+
+
+Objectives: dict[str, Callable[[ClashGagTuple], float]] = {"fewest": fewest_gags, "cheapest": cheapest_gags}
+
+
+def damage_upper_bound(
+    track: int, level: int, prestige: bool, target: Optional[int], cogs: int, toons: int
+) -> list[float]:
+    """
+    Most damage (per cog position) that one gag can contribute to a turn, derived from ClashGagConfiguration.
+    Every multiplier the gag could possibly receive is applied, so the real damage never exceeds it.
+    `target` is the position of the targeted cog, or None for gags that target every cog.
+    """
+    base = gag_config.ClashGagConfiguration[track].damages[level]
+    bound = [0.0] * cogs
+    targets = range(cogs) if target is None else (target,)
+
+    def add(position: int, value: float):
+        if 0 <= position < cogs:
+            bound[position] += value + 1  # + 1 accounts for rounding up
+
+    trap_boost = gag_config.TrapPrestigeBoost if prestige else 1
+    splash = gag_config.SquirtPrestigeSplashDamage if prestige else gag_config.SquirtSplashDamage
+    drop_boost = gag_config.DropDebuffMultiplier if prestige else 1
+    for cog in targets:
+        if track == ClashGags.Trap:
+            add(cog, base * gag_config.TrapExecutiveBoost * trap_boost * MaxEncore)
+        elif track == ClashGags.Lure:
+            # knockback of every other toon's Squirt or Throw part, plus combo damage on top of it
+            combo = 1 + max(gag_config.SquirtComboDamage, gag_config.ThrowComboDamage)
+            add(cog, MaxKnockback * (toons - 1) * combo)
+        elif track == ClashGags.Squirt:
+            add(cog, (base * MaxEncore + MaxKnockback) * (1 + gag_config.SquirtComboDamage))
+            add(cog - 1, base * splash)
+            add(cog + 1, base * splash)
+        elif track == ClashGags.Zap:
+            add(cog, base * MaxEncore)
+            for offset in (-2, -1, 1, 2):
+                add(cog + offset, base * gag_config.ZapPrestigePool)
+        elif track == ClashGags.Throw:
+            add(cog, (base * MaxEncore + MaxKnockback) * (1 + gag_config.ThrowComboDamage))
+        elif track == ClashGags.Sound:
+            add(cog, base * MaxEncore)
+        elif track == ClashGags.Drop:
+            add(cog, base * drop_boost * MaxEncore * (1 + gag_config.DropComboDamage))
+
+    return bound
+
+
+def assume_hit(chance: float) -> bool:
+    return chance > 0
+
+
+def check_kill(
+    state: "ClashState", gags: Sequence[ClashGagTuple], targets: Sequence[str], min_chance: Optional[float] = None
+) -> bool:
+    """
+    Whether the gags kill every target. Every gag which can hit is assumed to hit,
+    unless `min_chance` is set, in which case the exact kill chance has to reach it. The state is not modified.
+    """
+    if min_chance is not None:
+        return state.run_gags_exact(*gags).kill_probability(*targets) >= min_chance
+
+    roll_hook = state.roll_hook
+    state.roll_hook = assume_hit
+    try:
+        with state.fork():
+            state.run_gags(*gags)
+            return all(state.cogs[target].health <= 0 for target in targets)
+    finally:
+        state.roll_hook = roll_hook
+
+
+class Combo:
+    gags: tuple[ClashGagTuple, ...]
+    cost: float
+
+    def __init__(self, gags: tuple[ClashGagTuple, ...], cost: float):
+        self.gags = gags
+        self.cost = cost
+
+    def __repr__(self):
+        return f"Combo({self.cost}, {list(self.gags)})"
+
+
+class ComboFinder:
+    """
+    Branch-and-bound search for gag assignments which kill the target cogs.
+
+    Every toon uses at most one of its available gags. Partial assignments are pruned when
+    the damage upper bounds of the chosen gags plus the best remaining gags cannot kill a target,
+    and assignments whose bounds cannot kill are never simulated. Simulated assignments are
+    memoized by the merged gag plan they produce, so equivalent permutations are only run once.
+    """
+
+    def __init__(self, state: "ClashState"):
+        self.state = state
+        self.toon_ids = [str(toon.avatar_id) for toon in state.toons]
+        self.cog_ids = [str(cog.avatar_id) for cog in state.cogs]
+        # authors only matter through their effects (Encore, Winded) when only cog health is checked
+        self.author_effects = {str(toon.avatar_id): effects_of(toon) for toon in state.toons}
+        self.trap_values = [getattr(cog.effects.get(ClashEffects.Trapped), "value", 0) for cog in state.cogs]
+        self.memo: dict[tuple, bool] = {}
+        self.evaluations = 0
+
+    def options(self, toon_id: str, gags: Iterable[AvailableGag]) -> list[tuple[ClashGagTuple, list[float]]]:
+        options = []
+        for track, level, prestige in gags:
+            if track == ClashGags.ToonUp:
+                continue
+
+            if track == ClashGags.Sound or (track == ClashGags.Lure and level % 2):
+                targets = [None]
+            else:
+                targets = list(range(len(self.cog_ids)))
+
+            for target in targets:
+                bound = damage_upper_bound(track, level, prestige, target, len(self.cog_ids), len(self.toon_ids))
+                if track == ClashGags.Lure:
+                    # luring sets off traps which are already in place
+                    for position in range(len(self.cog_ids)) if target is None else (target,):
+                        bound[position] += self.trap_values[position]
+                target_id = () if target is None else self.cog_ids[target]
+                options.append(((toon_id, track, level, target_id, prestige), bound))
+        return options
+
+    def plan_key(self, gags: Sequence[ClashGagTuple]) -> tuple:
+        key = []
+        for gag in plan_gags(self.toon_ids, self.cog_ids, gags):
+            parts = sorted(
+                (part.level, part.prestige, part.targets, self.author_effects[self.toon_ids[part.author]])
+                for part in gag.parts
+            )
+            key.append((gag.track, gag.target, tuple(parts)))
+        return tuple(key)
+
+    def kills(self, gags: Sequence[ClashGagTuple], targets: Sequence[str], min_chance: Optional[float]) -> bool:
+        key = (self.plan_key(gags), tuple(targets), min_chance)
+        if key in self.memo:
+            return self.memo[key]
+
+        self.evaluations += 1
+        result = check_kill(self.state, gags, targets, min_chance)
+        self.memo[key] = result
+        return result
+
+    def search_space(
+        self,
+        available: dict[str, Iterable[AvailableGag]],
+        targets: Optional[Sequence[str]],
+        objective: str | Callable[[ClashGagTuple], float],
+    ) -> "SearchSpace":
+        cost = Objectives[objective] if isinstance(objective, str) else objective
+        targets = [str(target) for target in (targets if targets is not None else self.cog_ids)]
+        needed = {self.cog_ids.index(target): self.state.cogs[target].health for target in targets}
+
+        available = {str(toon_id): gags for toon_id, gags in available.items()}
+        toons = [toon_id for toon_id in self.toon_ids if toon_id in available]
+        toon_options = []
+        for toon_id in toons:
+            options = sorted(self.options(toon_id, available[toon_id]), key=lambda o: (cost(o[0]), -max(o[1])))
+            toon_options.append(options)
+
+        # best bound any toon from index i onwards can still add, per cog position
+        remaining = [[0.0] * len(self.cog_ids) for _ in range(len(toons) + 1)]
+        for i in range(len(toons) - 1, -1, -1):
+            for position in range(len(self.cog_ids)):
+                best = max((bound[position] for _, bound in toon_options[i]), default=0.0)
+                remaining[i][position] = remaining[i + 1][position] + best
+
+        return SearchSpace(cost, targets, needed, toon_options, remaining)
+
+    def candidates(
+        self,
+        available: dict[str, Iterable[AvailableGag]],
+        targets: Optional[Sequence[str]] = None,
+        objective: str | Callable[[ClashGagTuple], float] = "fewest",
+    ) -> Iterator[tuple[float, tuple[ClashGagTuple, ...]]]:
+        """
+        Every (cost, gags) assignment whose damage upper bounds can kill the targets, without simulating any.
+        Assignments are generated lazily, cheapest first and in the order of the serial search within a cost,
+        so only the part of the search tree cheaper than the last yielded assignment is expanded.
+        Costs of the objective must not be negative.
+        """
+        space = self.search_space(available, targets, objective)
+
+        # (cost, path, expand, index, gags, damage): `path` holds the option picked for every toon up to the last
+        # chosen one (len(options) when the toon is skipped), which orders assignments as the depth-first search does.
+        # An assignment sorts before every assignment below it, so it is yielded (expand=0) before they are expanded
+        frontier: list[tuple] = [(0, (), 1, 0, (), [0.0] * len(self.cog_ids))]
+        while frontier:
+            cost, path, expand, index, chosen, damage = heapq.heappop(frontier)
+            if not expand:
+                yield cost, chosen
+                continue
+            if index == len(space.toon_options):
+                continue
+
+            options = space.toon_options[index]
+            for option, (gag, bound) in enumerate(options):
+                gags_damage = space.add(damage, bound)
+                if not space.reachable(index + 1, gags_damage):
+                    continue
+                gags_cost = cost + space.cost(gag)
+                gags_path = path + (option,)
+                if space.covered(gags_damage):
+                    heapq.heappush(frontier, (gags_cost, gags_path, 0, index + 1, chosen + (gag,), gags_damage))
+                heapq.heappush(frontier, (gags_cost, gags_path, 1, index + 1, chosen + (gag,), gags_damage))
+            if space.reachable(index + 1, damage):
+                heapq.heappush(frontier, (cost, path + (len(options),), 1, index + 1, chosen, damage))
+
+    def find(
+        self,
+        available: dict[str, Iterable[AvailableGag]],
+        targets: Optional[Sequence[str]] = None,
+        objective: str | Callable[[ClashGagTuple], float] = "fewest",
+        limit: int = 1,
+        min_chance: Optional[float] = None,
+    ) -> list[Combo]:
+        """
+        Returns up to `limit` cheapest assignments which kill every target (all cogs by default).
+        Gags are assumed to hit unless `min_chance` is set, in which case the exact kill chance is required.
+        """
+        space = self.search_space(available, targets, objective)
+
+        # max-heap of the best combos found so far: (-cost, -insertion counter, gags), so ties keep the earliest
+        found: list[tuple[float, int, tuple[ClashGagTuple, ...]]] = []
+        order = itertools.count()
+
+        def search(index: int, chosen: tuple[ClashGagTuple, ...], chosen_cost: float, damage: list[float]):
+            if len(found) >= limit and chosen_cost >= -found[0][0]:
+                return
+            if not space.reachable(index, damage) or index == len(space.toon_options):
+                return
+
+            for gag, bound in space.toon_options[index]:
+                gags = chosen + (gag,)
+                gags_cost = chosen_cost + space.cost(gag)
+                gags_damage = space.add(damage, bound)
+                if len(found) >= limit and gags_cost >= -found[0][0]:
+                    continue
+
+                if space.covered(gags_damage) and self.kills(gags, space.targets, min_chance):
+                    heapq.heappush(found, (-gags_cost, -next(order), gags))
+                    if len(found) > limit:
+                        heapq.heappop(found)
+                search(index + 1, gags, gags_cost, gags_damage)
+            search(index + 1, chosen, chosen_cost, damage)
+
+        search(0, (), 0, [0.0] * len(self.cog_ids))
+        return [Combo(gags, -neg_cost) for neg_cost, _, gags in sorted(found, key=lambda x: (-x[0], -x[1]))]
+
+
+class SearchSpace:
+    """Options of every toon with their damage upper bounds, and the health the bounds have to cover."""
+
+    def __init__(
+        self,
+        cost: Callable[[ClashGagTuple], float],
+        targets: list[str],
+        needed: dict[int, int],
+        toon_options: list[list[tuple[ClashGagTuple, list[float]]]],
+        remaining: list[list[float]],
+    ):
+        self.cost = cost
+        self.targets = targets
+        self.needed = needed
+        self.toon_options = toon_options
+        self.remaining = remaining
+
+    @staticmethod
+    def add(damage: list[float], bound: list[float]) -> list[float]:
+        return [damage[pos] + bound[pos] for pos in range(len(damage))]
+
+    def covered(self, damage: list[float]) -> bool:
+        return all(damage[pos] >= health for pos, health in self.needed.items())
+
+    def reachable(self, index: int, damage: list[float]) -> bool:
+        return all(damage[pos] + self.remaining[index][pos] >= health for pos, health in self.needed.items())
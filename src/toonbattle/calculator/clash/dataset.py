@@ -0,0 +1,291 @@
+"""
+Streaming generator of simulated battle datasets, for balance analysis and model training.
+
+A dataset is a directory of shards. Every shard holds `shard_size` random scenarios (toon count, cog lineup,
+one gag plan) from a ScenarioSpace together with their outcome, and is written as one .npy file per column
+(see Columns) in its own directory, which is renamed into place once complete. Shards are independent: shard k
+draws its scenarios and rolls from RandomStreams(seed).stream(k, ...), so it holds the same battles whichever
+process makes it and in whichever order, and generating again skips the shards that already exist.
+
+Shards are simulated on a process pool. Every worker keeps one warm BattleBatch per toon count (see
+clash/evaluate.py) and runs each scenario on a fork of it, writes the shard itself and only returns its size;
+at most two shards per process are in flight, so memory depends on the shard size, not on the dataset size.
+Read the dataset back with iter_shards(), which memory-maps the columns.
+
+Requires numpy, which is an optional dependency of toonbattle.
+"""
+import os
+import random
+import shutil
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Iterator, Optional
+
+import numpy as np
+
+from toonbattle.calculator.clash import cog_config
+from toonbattle.calculator.clash.evaluate import BattleBatch
+from toonbattle.calculator.clash.gag_config import ClashGagTuple
+from toonbattle.calculator.common.rng import RandomStreams
+from toonbattle.calculator.helpers.enums import ClashGags
+
+MaxToons = 4
+MaxCogs = 4
+Levels = 8
+# (dtype, entries per scenario); per-cog and per-toon columns are padded with -1 (False for flags, NaN for health),
+# so whether a position is used is told by `toons`, `cogs` or `cog_level`
+Columns = {
+    "scenario": (np.int64, 1),
+    "toons": (np.uint8, 1),
+    "cogs": (np.uint8, 1),
+    "cog_level": (np.int8, MaxCogs),
+    "cog_exe": (np.bool_, MaxCogs),
+    "cog_skelecog": (np.int8, MaxCogs),
+    # -1 when not given, 0 or 1 otherwise
+    "cog_attack_oriented": (np.int8, MaxCogs),
+    # gag of the toon at each position, track -1 when the toon passes, target -1 for all targets
+    "gag_track": (np.int8, MaxToons),
+    "gag_level": (np.int8, MaxToons),
+    "gag_target": (np.int8, MaxToons),
+    "gag_prestige": (np.bool_, MaxToons),
+    # floats, so that health is stored as the avatars hold it and never truncated
+    "max_health": (np.float64, MaxCogs),
+    "health": (np.float64, MaxCogs),
+    "hits": (np.uint8, 1),
+    "cogs_alive": (np.uint8, 1),
+}
+Tracks = tuple(ClashGags)
+# gags which hit every target whatever their target is
+GroupTracks = (ClashGags.Sound,)
+# ToonUp and Lure hit every target at odd levels
+OddGroupTracks = (ClashGags.ToonUp, ClashGags.Lure)
+
+Scenario = tuple[int, list[dict], tuple[ClashGagTuple, ...]]
+
+
+class ScenarioSpace:
+    """Distribution of the random scenarios, every draw is uniform within its bounds."""
+
+    def __init__(
+        self,
+        toons: tuple[int, int] = (1, MaxToons),
+        cogs: tuple[int, int] = (1, MaxCogs),
+        cog_levels: tuple[int, int] = (1, cog_config.MaxCogLevel),
+        exe_chance: float = 0.2,
+        skelecog_chance: float = 0.1,
+        attack_oriented_chance: float = 0.3,
+        gag_levels: tuple[int, int] = (0, Levels - 1),
+        pass_chance: float = 0.1,
+        prestige_chance: float = 0.2,
+    ):
+        if not 1 <= toons[0] <= toons[1] <= MaxToons or not 1 <= cogs[0] <= cogs[1] <= MaxCogs:
+            raise ValueError(f"at most {MaxToons} toons and {MaxCogs} cogs")
+        self.toons = toons
+        self.cogs = cogs
+        self.cog_levels = cog_levels
+        self.exe_chance = exe_chance
+        self.skelecog_chance = skelecog_chance
+        self.attack_oriented_chance = attack_oriented_chance
+        self.gag_levels = gag_levels
+        self.pass_chance = pass_chance
+        self.prestige_chance = prestige_chance
+
+    def cog(self, rng: random.Random) -> dict:
+        spec = {"level": rng.randint(*self.cog_levels), "exe": rng.random() < self.exe_chance}
+        if rng.random() < self.skelecog_chance:
+            spec["skelecog"] = 1
+        if rng.random() < self.attack_oriented_chance:
+            spec["attack_oriented"] = rng.random() < 0.5
+        return spec
+
+    def gag(self, rng: random.Random, author: int, toons: int, cogs: int) -> Optional[ClashGagTuple]:
+        if rng.random() < self.pass_chance:
+            return None
+        track = rng.choice(Tracks)
+        level = rng.randint(*self.gag_levels)
+        if track in GroupTracks or track in OddGroupTracks and level % 2:
+            target = ()
+        else:
+            target = rng.randrange(toons if track == ClashGags.ToonUp else cogs)
+        return author, track, level, target, rng.random() < self.prestige_chance
+
+    def sample(self, rng: random.Random) -> Scenario:
+        toons = rng.randint(*self.toons)
+        lineup = [self.cog(rng) for _ in range(rng.randint(*self.cogs))]
+        gags = (self.gag(rng, author, toons, len(lineup)) for author in range(toons))
+        return toons, lineup, tuple(gag for gag in gags if gag is not None)
+
+
+def padding(dtype) -> float:
+    if np.issubdtype(dtype, np.floating):
+        return np.nan
+    return -1 if np.issubdtype(dtype, np.signedinteger) else 0
+
+
+class ShardWriter:
+    """Columns of one shard, filled row by row."""
+
+    def __init__(self, size: int, first: int):
+        self.columns = {name: np.full((size, width), padding(dtype), dtype) for name, (dtype, width) in Columns.items()}
+        self.columns["scenario"][:, 0] = np.arange(first, first + size)
+
+    def add(self, row: int, scenario: Scenario, max_health: list[float], health: list[float], hits: int):
+        toons, lineup, gags = scenario
+        columns = self.columns
+        columns["toons"][row] = toons
+        columns["cogs"][row] = len(lineup)
+        for position, spec in enumerate(lineup):
+            columns["cog_level"][row, position] = spec["level"]
+            columns["cog_exe"][row, position] = spec["exe"]
+            columns["cog_skelecog"][row, position] = spec.get("skelecog", 0)
+            columns["cog_attack_oriented"][row, position] = int(spec.get("attack_oriented", -1))
+        for author, track, level, target, prestige in gags:
+            columns["gag_track"][row, author] = track
+            columns["gag_level"][row, author] = level
+            columns["gag_target"][row, author] = -1 if target == () else target
+            columns["gag_prestige"][row, author] = prestige
+        columns["max_health"][row, : len(max_health)] = max_health
+        columns["health"][row, : len(health)] = health
+        columns["hits"][row] = hits
+        columns["cogs_alive"][row] = sum(value > 0 for value in health)
+
+    def save(self, path: str):
+        """Writes every column next to `path` and renames the directory into place, so shards appear whole."""
+        temporary = f"{path}.tmp"
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+        for name, values in self.columns.items():
+            np.save(os.path.join(temporary, f"{name}.npy"), values[:, 0] if Columns[name][1] == 1 else values)
+        os.replace(temporary, path)
+
+
+_batches: dict[tuple[int, bool], BattleBatch] = {}
+
+
+def _init_worker():
+    from toonbattle.calculator.common.state import ClashState
+
+    ClashState.Rules.freeze()
+
+
+def _batch(toons: int, always_hit: bool) -> BattleBatch:
+    batch = _batches.get((toons, always_hit))
+    if batch is None:
+        batch = _batches[toons, always_hit] = BattleBatch(toons, always_hit)
+    return batch
+
+
+def _close_batches():
+    for batch in _batches.values():
+        batch.close()
+    _batches.clear()
+
+
+def shard_path(directory: str, shard: int) -> str:
+    return os.path.join(directory, f"{shard:06d}")
+
+
+def write_shard(
+    directory: str, shard: int, size: int, seed: int, space: ScenarioSpace, use: bool = False, always_hit: bool = False
+) -> int:
+    """Simulates and writes one shard, returns the number of scenarios in it."""
+    streams = RandomStreams(seed)
+    scenarios = streams.stream(shard, 0)
+    rolls = streams.stream(shard, 1)
+    writer = ShardWriter(size, shard * size)
+
+    for row in range(size):
+        scenario = space.sample(scenarios)
+        toons, lineup, gags = scenario
+        batch = _batch(toons, always_hit)
+        state = batch.state
+        state.rng = rolls
+        with state.fork():
+            cogs = [batch.create_cog(spec) for spec in lineup]
+            max_health = [cog.health for cog in cogs]
+            hits = (state.use_gags if use else state.run_gags)(*gags)
+            writer.add(row, scenario, max_health, [cog.health for cog in cogs], len(hits))
+
+    writer.save(shard_path(directory, shard))
+    return size
+
+
+class DatasetGenerator:
+    """
+    Use as a context manager (or call close()) so the pool is shut down.
+    With processes=0 the shards are simulated in this process.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        space: Optional[ScenarioSpace] = None,
+        shard_size: int = 1 << 16,
+        seed: Optional[int] = None,
+        processes: Optional[int] = None,
+        use: bool = False,
+        always_hit: bool = False,
+    ):
+        self.directory = directory
+        self.space = space if space is not None else ScenarioSpace()
+        self.shard_size = shard_size
+        self.seed = RandomStreams(seed).seed
+        self.use = use
+        self.always_hit = always_hit
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        self.pool = ProcessPoolExecutor(self.processes, initializer=_init_worker) if self.processes else None
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self) -> "DatasetGenerator":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+        else:
+            _close_batches()
+
+    def arguments(self, shard: int) -> tuple:
+        return self.directory, shard, self.shard_size, self.seed, self.space, self.use, self.always_hit
+
+    def generate(self, shards: int, start: int = 0) -> Iterator[int]:
+        """
+        Writes shards `start` to `start + shards - 1`, skipping the ones that exist,
+        and yields the index of every shard once it is on disk, in the order they finish.
+        """
+        pending = (shard for shard in range(start, start + shards) if not os.path.isdir(self.shard_path(shard)))
+        if self.pool is None:
+            for shard in pending:
+                write_shard(*self.arguments(shard))
+                yield shard
+            return
+
+        running: dict[Future, int] = {}
+        for shard in pending:
+            running[self.pool.submit(write_shard, *self.arguments(shard))] = shard
+            if len(running) >= 2 * self.processes:
+                yield from self.collect(running)
+        while running:
+            yield from self.collect(running)
+
+    @staticmethod
+    def collect(running: dict[Future, int]) -> Iterator[int]:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            future.result()
+            yield running.pop(future)
+
+    def shard_path(self, shard: int) -> str:
+        return shard_path(self.directory, shard)
+
+
+def iter_shards(directory: str, columns: Optional[tuple[str, ...]] = None) -> Iterator[dict[str, np.ndarray]]:
+    """The columns of every complete shard in order, memory-mapped, so only the pages that are read are loaded."""
+    names = tuple(Columns) if columns is None else columns
+    for entry in sorted(os.listdir(directory)):
+        path = os.path.join(directory, entry)
+        if entry.isdigit() and os.path.isdir(path):
+            yield {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in names}
@@ -1,9 +1,10 @@
-from pycluster.messenger.helpers import listen, math, replace
+from pycluster.messenger.helpers import replace
 from pycluster.messenger.message_object import FizzleReplace
 
 from toonbattle.calculator.common.avatar import Avatar
 from toonbattle.calculator.common.debug import GagsAlwaysHit
-from toonbattle.calculator.helpers.decorators import check_object, check_source, check_subject
+from toonbattle.calculator.helpers.decorators import check_source
+from toonbattle.calculator.helpers.dispatch import author_listen, author_math, subject_listen, subject_math
 from toonbattle.calculator.helpers.enums import (
     ClashEffects,
     CommonEffects,
@@ -26,15 +27,14 @@ CFReg.bind(CommonEffects.ToonsHit, GagsAlwaysHit)
 class EffectCheer(StatusEffectTimed):
     DefaultTurns = 1
 
-    @math(MathTargets.Accuracy)
-    @check_object
+    @author_math(MathTargets.Accuracy)
     def calculate_accuracy(self, value: float, **kwargs):
         return value + 0.2
 
 
 @CFReg.register(ClashEffects.Trapped)
 class EffectTrapped(StatusEffect):
-    def __init__(self, parent, value: int, **kwargs):
+    def __init__(self, parent, value: int = 0, **kwargs):
         super().__init__(parent, **kwargs)
         self.value = value
 
@@ -61,15 +61,14 @@ class EffectTrapped(StatusEffect):
 class EffectDazed(StatusEffectTimed):
     DefaultTurns = 2
 
-    @math(MathTargets.Accuracy)
-    @check_subject
+    @subject_math(MathTargets.Accuracy)
     def calculate_accuracy(self, value: float, **kwargs):
         return value + 0.1
 
 
 @CFReg.register(ClashEffects.Lured)
 class EffectLured(StatusEffectTimed):
-    def __init__(self, parent, knockback: int, **kwargs):
+    def __init__(self, parent, knockback: int = 0, **kwargs):
         super().__init__(parent, **kwargs)
         self.knockback = knockback
 
@@ -81,8 +80,7 @@ class EffectLured(StatusEffectTimed):
     def datagram(self, value):
         self.turns, self.knockback = value
 
-    @math(MathTargets.Damage)
-    @check_subject
+    @subject_math(MathTargets.Damage)
     def replace_damage(self, value: float, source: int = None, extra_source: int = None, **kwargs):
         if source in (DamageSources.Squirt, DamageSources.Throw) and extra_source != ExtraSources.ComboDamage:
             return value + self.knockback
@@ -95,8 +93,7 @@ class EffectLured(StatusEffectTimed):
 
         return 1.0
 
-    @listen(Events.DamageDealt)
-    @check_subject
+    @subject_listen(Events.DamageDealt)
     def dealt_damage(self, source: int = None, **kwargs):
         if source in (DamageSources.Squirt, DamageSources.Sound, DamageSources.Throw, DamageSources.Zap):
             self.parent.remove(self)
@@ -104,8 +101,7 @@ class EffectLured(StatusEffectTimed):
 
 @CFReg.register(ClashEffects.Soak)
 class EffectSoak(StatusEffectTimed):
-    @math(MathTargets.Accuracy)
-    @check_subject
+    @subject_math(MathTargets.Accuracy)
     def calculate_accuracy(self, value: float, **kwargs):
         return value + 0.1
 
@@ -114,7 +110,7 @@ class EffectSoak(StatusEffectTimed):
 class EffectEncore(StatusEffectTimed):
     DefaultTurns = 2
 
-    def __init__(self, parent, multiplier: float, **kwargs):
+    def __init__(self, parent, multiplier: float = 1.0, **kwargs):
         super().__init__(parent, **kwargs)
         self.multiplier = multiplier
 
@@ -126,16 +122,12 @@ class EffectEncore(StatusEffectTimed):
     def datagram(self, value):
         self.multiplier = value
 
-    @math(MathTargets.Damage)
-    @check_object
+    @author_math(MathTargets.Damage)
     def calculate_damage(self, value: float, **kwargs):
         return value * self.multiplier
 
-    @listen(Events.DamagePartDealt)
-    def dealt_damage(self, author: Avatar = None, source: int = -1, **kwargs):
-        if author is not self.parent_avatar:
-            return
-
+    @author_listen(Events.DamagePartDealt)
+    def dealt_damage(self, source: int = -1, **kwargs):
         if source == DamageSources.Sound:
             state = self.true_parent_cluster
             state.create_effect(self.parent_avatar, ClashEffects.Winded)
@@ -143,8 +135,7 @@ class EffectEncore(StatusEffectTimed):
 
 @CFReg.register(ClashEffects.Winded)
 class EffectWinded(StatusEffectTimed):
-    @math(MathTargets.Damage)
-    @check_object
+    @author_math(MathTargets.Damage)
     @check_source(DamageSources.Sound)
     def calculate_damage(self, value: float = 1.1, **kwargs):
         if self.turns < 3:
@@ -171,7 +162,6 @@ class EffectSkelecogReduction(StatusEffect):
     def datagram(self, value):
         self.stacks = value
 
-    @math(MathTargets.EffectRounds)
-    @check_subject
+    @subject_math(MathTargets.EffectRounds)
     def calculate_effect_rounds(self, value: int, **kwargs):
         return value - self.stacks
@@ -0,0 +1,324 @@
+"""
+Closed-form damage estimates for a gag plan, computed from lookup tables compiled from gag_config.
+
+The rules are the ones of clash/batch.py (which mirror the engine) applied to plain numbers:
+no GagDefinition is created and nothing is dispatched. Every hit/miss decision is enumerated
+the same way as common/outcomes.py does, so the expected damage is exact rather than sampled;
+a plan with k uncertain rolls takes at most 2^k cheap passes.
+
+Only damage to cogs is modelled, healing and effects which only matter in later turns are ignored.
+estimate_state(..., validate=True) checks the estimate against run_gags_exact.
+"""
+from math import ceil
+from typing import Iterable, Optional, Sequence, TYPE_CHECKING
+
+from toonbattle.calculator.clash import gag_config
+from toonbattle.calculator.clash.gag_config import ClashGagTuple
+from toonbattle.calculator.clash.plan import PlannedGag, plan_gags
+from toonbattle.calculator.common.outcomes import ScriptedRolls
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import ClashState
+
+AccuracyCap = 0.95
+
+
+def _prestige_damage(track: int, level: int, damage: float) -> float:
+    if track == ClashGags.Lure:
+        boost = gag_config.PrestigeLureAoEBoost if level % 2 else gag_config.PrestigeLureSingleTargetBoost
+        return ceil(damage * boost)
+    return damage
+
+
+# 0.7 + configured accuracy of every level, before the cap
+BaseAccuracy = {
+    track: tuple(0.7 + accuracy for accuracy in configuration.accuracy)
+    for track, configuration in gag_config.ClashGagConfiguration.items()
+}
+# damage of one part, [track][level][prestige]; prestige only changes Lure knockback here,
+# the other prestige bonuses depend on the target and are applied by the gags themselves
+PartDamage = {
+    track: tuple(
+        (damage, _prestige_damage(track, level, damage)) for level, damage in enumerate(configuration.damages)
+    )
+    for track, configuration in gag_config.ClashGagConfiguration.items()
+}
+# [prestige]
+SplashFactor = (gag_config.SquirtSplashDamage, gag_config.SquirtPrestigeSplashDamage)
+PoolFactor = (gag_config.ZapUnprestigePool, gag_config.ZapPrestigePool)
+EncoreMultiplier = (gag_config.EncoreUnprestigeValue, gag_config.EncorePrestigeValue)
+ComboBonus = {
+    ClashGags.Squirt: gag_config.SquirtComboDamage,
+    ClashGags.Throw: gag_config.ThrowComboDamage,
+    ClashGags.Drop: gag_config.DropComboDamage,
+}
+UnlureTracks = (ClashGags.Squirt, ClashGags.Sound, ClashGags.Throw, ClashGags.Zap)
+KnockbackTracks = (ClashGags.Squirt, ClashGags.Throw)
+ZapPools = ((1, 2), (1,), (-1, -2), (-1,))
+
+
+class EstimateError(AssertionError):
+    pass
+
+
+class BattleInputs:
+    """
+    Everything the estimator reads from a battle. Cog and toon values are indexed by position,
+    `lured`, `trapped` and `encore` map positions to the knockback, trap damage and Encore multiplier.
+    """
+
+    def __init__(
+        self,
+        toons: int,
+        cog_health: Sequence[int],
+        executive: Sequence[bool] = (),
+        lured: Optional[dict[int, int]] = None,
+        trapped: Optional[dict[int, float]] = None,
+        soaked: Iterable[int] = (),
+        encore: Optional[dict[int, float]] = None,
+        winded: Optional[dict[int, int]] = None,
+        always_hit: bool = False,
+        toon_ids: Optional[Sequence[str]] = None,
+        cog_ids: Optional[Sequence[str]] = None,
+    ):
+        cogs = len(cog_health)
+        self.cog_health = list(cog_health)
+        self.executive = list(executive) or [False] * cogs
+        self.lured = dict(lured or {})
+        self.trapped = dict(trapped or {})
+        self.soaked = set(soaked)
+        self.encore = dict(encore or {})
+        # toon position: turns left on Winded
+        self.winded = dict(winded or {})
+        self.always_hit = always_hit
+        # gags refer to avatars by position unless IDs are given
+        self.toon_ids = list(toon_ids) if toon_ids is not None else [str(i) for i in range(toons)]
+        self.cog_ids = list(cog_ids) if cog_ids is not None else [str(i) for i in range(cogs)]
+
+    @classmethod
+    def from_state(cls, state: "ClashState") -> "BattleInputs":
+        def effect(avatar, effect_id: int):
+            return avatar.effects.get(effect_id)
+
+        cogs = list(state.cogs)
+        toons = list(state.toons)
+        return cls(
+            len(toons),
+            [cog.health for cog in cogs],
+            [getattr(cog, "executive", False) for cog in cogs],
+            lured={i: lure.knockback for i, cog in enumerate(cogs) if (lure := effect(cog, ClashEffects.Lured))},
+            trapped={i: trap.value for i, cog in enumerate(cogs) if (trap := effect(cog, ClashEffects.Trapped))},
+            soaked=[i for i, cog in enumerate(cogs) if effect(cog, ClashEffects.Soak)],
+            encore={i: e.multiplier for i, toon in enumerate(toons) if (e := effect(toon, ClashEffects.Encore))},
+            winded={i: w.turns for i, toon in enumerate(toons) if (w := effect(toon, ClashEffects.Winded))},
+            always_hit=state.effects.get(CommonEffects.ToonsHit) is not None,
+            toon_ids=[str(toon.avatar_id) for toon in toons],
+            cog_ids=[str(cog.avatar_id) for cog in cogs],
+        )
+
+
+class Scenario:
+    """One pass over the plan with fixed hit/miss decisions."""
+
+    def __init__(self, inputs: BattleInputs, rolls: ScriptedRolls):
+        self.inputs = inputs
+        self.rolls = rolls
+        self.health = list(inputs.cog_health)
+        self.lured = dict(inputs.lured)
+        self.trapped = dict(inputs.trapped)
+        self.soaked = set(inputs.soaked)
+        self.encore = dict(inputs.encore)
+        self.winded = dict(inputs.winded)
+
+    def roll(self, chance: float) -> bool:
+        return self.rolls(chance)
+
+    def accuracy(self, gag: PlannedGag) -> float:
+        if self.inputs.always_hit:
+            return 1.0
+        accuracy = min(max(BaseAccuracy[gag.track][level] for level in gag.levels), AccuracyCap)
+        if len(gag.target) == 1 and gag.target[0] in self.lured:
+            return 1.0
+        return accuracy
+
+    def part_damage(self, value: float, author: Optional[int], track: int, cog: int) -> float:
+        if author is not None:
+            value *= self.encore.get(author, 1.0)
+            if track == ClashGags.Sound and 0 < self.winded.get(author, 0) < 3:
+                value *= 0.5
+        if track in KnockbackTracks:
+            value += self.lured.get(cog, 0)
+        return value
+
+    def deal(self, cog: int, damage: float):
+        self.health[cog] -= ceil(damage)
+
+    def perform_attack(self, gag: PlannedGag, cogs: Iterable[int]):
+        combo = ComboBonus.get(gag.track, 0.0) if len(gag.parts) > 1 else 0.0
+        for cog in cogs:
+            total = 0.0
+            for part in gag.parts:
+                damage = self.part_damage(PartDamage[gag.track][part.level][part.prestige], part.author, gag.track, cog)
+                self.deal(cog, damage)
+                total += damage
+                if gag.track == ClashGags.Sound and part.author in self.encore:
+                    self.winded.setdefault(part.author, 3)
+            if gag.track in UnlureTracks:
+                self.lured.pop(cog, None)
+            if combo:
+                self.deal(cog, total * combo)
+
+    def apply(self, gag: PlannedGag):
+        if gag.track == ClashGags.ToonUp:
+            return
+        if gag.track == ClashGags.Trap:
+            self.apply_trap(gag)
+        elif gag.track == ClashGags.Zap:
+            self.apply_zap(gag)
+        elif gag.track == ClashGags.Drop:
+            self.apply_drop(gag)
+        elif self.roll(self.accuracy(gag)):
+            if gag.track == ClashGags.Lure:
+                self.apply_lure(gag)
+            elif gag.track == ClashGags.Squirt:
+                self.apply_squirt(gag)
+            elif gag.track == ClashGags.Throw:
+                self.perform_attack(gag, gag.target[:1])
+            elif gag.track == ClashGags.Sound:
+                self.apply_sound(gag)
+
+    def apply_trap(self, gag: PlannedGag):
+        cog = gag.target[0]
+        if cog in self.trapped or cog in self.lured or len(gag.parts) > 1:
+            return
+        part = gag.parts[0]
+        damage = PartDamage[gag.track][part.level][0]
+        if self.inputs.executive[cog]:
+            damage *= gag_config.TrapExecutiveBoost
+        if part.prestige:
+            damage *= gag_config.TrapPrestigeBoost
+        self.trapped[cog] = self.part_damage(damage, part.author, gag.track, cog)
+
+    def apply_lure(self, gag: PlannedGag):
+        for cog in gag.target:
+            parts = [part for part in gag.parts if part.targets == () or cog in part.targets]
+            if not parts:
+                continue
+            if cog in self.trapped:
+                self.deal(cog, self.trapped.pop(cog))
+            elif cog not in self.lured:
+                self.lured[cog] = max(PartDamage[ClashGags.Lure][part.level][part.prestige] for part in parts)
+
+    def apply_squirt(self, gag: PlannedGag):
+        cog = gag.target[0]
+        self.perform_attack(gag, (cog,))
+        splash = sum(PartDamage[gag.track][part.level][0] * SplashFactor[part.prestige] for part in gag.parts)
+        self.soaked.add(cog)
+        for neighbour in (cog + 1, cog - 1):
+            if 0 <= neighbour < len(self.health):
+                self.deal(neighbour, splash)
+                self.soaked.add(neighbour)
+
+    def apply_zap(self, gag: PlannedGag):
+        cog = gag.target[0]
+        if cog not in self.soaked:
+            self.lured.pop(cog, None)
+            return
+        self.perform_attack(gag, (cog,))
+        total = sum(PartDamage[gag.track][part.level][0] for part in gag.parts) * PoolFactor[gag.parts[0].prestige]
+        for offsets in ZapPools:
+            pool = [cog + offset for offset in offsets]
+            if all(position in self.soaked for position in pool):
+                for position in pool:
+                    self.deal(position, total / len(pool))
+                break
+
+    def apply_sound(self, gag: PlannedGag):
+        self.perform_attack(gag, range(len(self.health)))
+        for part in gag.parts:
+            if part.author not in self.winded and part.author not in self.encore:
+                self.encore[part.author] = EncoreMultiplier[part.prestige]
+
+    def apply_drop(self, gag: PlannedGag):
+        cog = gag.target[0]
+        accuracy = 0.0 if cog in self.lured else self.accuracy(gag)
+        debuffed = any(target in self.lured or target in self.soaked for target in gag.target)
+        total = 0.0
+        hits = 0
+        for part in gag.parts:
+            value = PartDamage[gag.track][part.level][0]
+            if part.prestige and debuffed:
+                value *= gag_config.DropDebuffMultiplier
+            if self.roll(accuracy):
+                damage = self.part_damage(value, part.author, gag.track, cog)
+                self.deal(cog, damage)
+                total += damage
+                hits += 1
+        if hits > 1:
+            self.deal(cog, total * gag_config.DropComboDamage)
+
+
+class DamageEstimate:
+    """Damage per cog position: expected, worst and best case, plus the outcomes they come from."""
+
+    def __init__(self, inputs: BattleInputs, outcomes: list[tuple[float, tuple[int, ...]]], passes: int):
+        self.inputs = inputs
+        # (probability, health of every cog)
+        self.outcomes = outcomes
+        self.passes = passes
+        start = inputs.cog_health
+        damages = [[before - after for before, after in zip(start, health)] for _, health in outcomes]
+        self.expected = [sum(p * damage[i] for (p, _), damage in zip(outcomes, damages)) for i in range(len(start))]
+        self.worst = [min(damage[i] for damage in damages) for i in range(len(start))]
+        self.best = [max(damage[i] for damage in damages) for i in range(len(start))]
+
+    def expected_health(self, cog: int) -> float:
+        return self.inputs.cog_health[cog] - self.expected[cog]
+
+    def kill_probability(self, *cogs: int) -> float:
+        return sum(p for p, health in self.outcomes if all(health[cog] <= 0 for cog in cogs))
+
+    def __repr__(self):
+        return f"DamageEstimate(expected={self.expected}, worst={self.worst}, best={self.best})"
+
+
+def estimate(inputs: BattleInputs, gags: Sequence[ClashGagTuple]) -> DamageEstimate:
+    planned = plan_gags(inputs.toon_ids, inputs.cog_ids, gags)
+    merged: dict[tuple[int, ...], float] = {}
+    pending: list[tuple[bool, ...]] = [()]
+    passes = 0
+    while pending:
+        script = pending.pop()
+        rolls = ScriptedRolls(script)
+        scenario = Scenario(inputs, rolls)
+        for gag in planned:
+            scenario.apply(gag)
+        passes += 1
+
+        decisions = tuple(decision for _, decision in rolls.branches)
+        for index in range(len(script), len(rolls.branches)):
+            pending.append(decisions[:index] + (False,))
+        key = tuple(scenario.health)
+        merged[key] = merged.get(key, 0.0) + rolls.probability
+
+    return DamageEstimate(inputs, [(p, health) for health, p in merged.items()], passes)
+
+
+def estimate_state(
+    state: "ClashState", gags: Sequence[ClashGagTuple], validate: bool = False, tolerance: float = 1e-9
+) -> DamageEstimate:
+    """
+    Estimate for the current state of a battle. With `validate`, the plan is also run through
+    run_gags_exact and EstimateError is raised if the expected health of any cog differs.
+    """
+    result = estimate(BattleInputs.from_state(state), gags)
+    if validate:
+        distribution = state.run_gags_exact(*gags)
+        for position, cog_id in enumerate(result.inputs.cog_ids):
+            engine = distribution.expected_health(cog_id)
+            if abs(engine - result.expected_health(position)) > tolerance:
+                raise EstimateError(
+                    f"Expected health of cog {cog_id} is {result.expected_health(position)}, the engine gives {engine}"
+                )
+    return result
@@ -0,0 +1,129 @@
+"""
+In-process evaluation of gag plans over many independent battles, e.g. one plan against every cog lineup.
+
+A single warm ClashState holds the toons; every battle creates its cogs on a fork of it, so cog IDs
+are the same in every battle, and the fork is rolled back afterwards instead of building a new state.
+Plans that are passed again as the same object are only parsed once; run_gags still merges the gags and
+builds their definitions in every battle, as those are bound to the cogs of its fork.
+Results are collected into flat columns (array.array, so numpy.frombuffer can view them without copying).
+"""
+from array import array
+from math import nan
+from typing import Any, Iterable, Sequence
+
+from toonbattle.calculator.clash.gag_config import ClashGagTuple
+from toonbattle.calculator.helpers.enums import CommonEffects
+
+# a cog level, or the keyword arguments of ClashState.create_cog
+CogSpec = int | dict[str, Any]
+# a plan is a sequence of gag tuples or of (author, track, level, target, prestige) rows
+BattleItem = tuple[Sequence[CogSpec], Sequence]
+
+GagFields = ("author", "track", "level", "target", "prestige")
+
+
+def gag_rows(rows: Iterable) -> tuple[ClashGagTuple, ...]:
+    """
+    Gag tuples from (author, track, level, target, prestige) rows, such as the records of a numpy structured
+    array with GagFields as its fields. Authors and targets are avatar IDs (strings) or positions, a negative
+    target means all targets.
+    """
+    gags = []
+    for author, track, level, target, prestige in rows:
+        author = author if isinstance(author, str) else int(author)
+        if not isinstance(target, str):
+            target = () if target < 0 else int(target)
+        gags.append((author, int(track), int(level), target, bool(prestige)))
+    return tuple(gags)
+
+
+class BattleResults:
+    """
+    Outcome of every battle of BattleBatch.evaluate, one entry per battle in each column.
+    health is row-major with `width` entries per battle, in the order the cogs were specified;
+    battles with fewer cogs are padded with NaN, as health below 0 is the overkill of a dead cog.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self.hits = array("H")
+        self.cogs_alive = array("H")
+        self.damage = array("q")
+        self.health = array("d")
+
+    def __len__(self):
+        return len(self.hits)
+
+    def add(self, hits: int, before: Sequence[int], after: Sequence[int]):
+        self.hits.append(hits)
+        self.cogs_alive.append(sum(health > 0 for health in after))
+        self.damage.append(sum(max(0, start - end) for start, end in zip(before, after)))
+        self.health.extend(after)
+        self.health.extend([nan] * (self.width - len(after)))
+
+    def health_of(self, index: int) -> array:
+        return self.health[index * self.width : (index + 1) * self.width]
+
+    def killed(self, index: int) -> bool:
+        return self.cogs_alive[index] == 0
+
+    def columns(self) -> dict[str, array]:
+        return {"hits": self.hits, "cogs_alive": self.cogs_alive, "damage": self.damage, "health": self.health}
+
+    def __repr__(self):
+        return f"BattleResults({len(self)} battles)"
+
+
+class BattleBatch:
+    """
+    Evaluates (cog lineup, gag plan) pairs against the same toons.
+    Use as a context manager (or call close()) so the state is cleaned up.
+    """
+
+    def __init__(self, toons: int = 4, always_hit: bool = False):
+        from toonbattle.calculator.common.state import ClashState
+
+        self.state = ClashState()
+        self.toons = [self.state.create_toon() for _ in range(toons)]
+        if always_hit:
+            self.state.create_effect(self.state, CommonEffects.ToonsHit)
+
+    def __enter__(self) -> "BattleBatch":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.state.cleanup()
+
+    def evaluate(self, items: Iterable[BattleItem], use: bool = False) -> BattleResults:
+        """Runs (or with `use`, uses) every plan against its lineup, each on a fresh copy of the battle."""
+        items = list(items)
+        results = BattleResults(max((len(lineup) for lineup, _ in items), default=0))
+        parsed: dict[int, tuple] = {}
+        state = self.state
+        run = state.use_gags if use else state.run_gags
+
+        for lineup, plan in items:
+            gags = parsed.get(id(plan))
+            if gags is None:
+                gags = parsed[id(plan)] = self.parse(plan)
+
+            with state.fork():
+                cogs = [self.create_cog(spec) for spec in lineup]
+                before = [cog.health for cog in cogs]
+                hits = run(*gags)
+                results.add(len(hits), before, [cog.health for cog in cogs])
+        return results
+
+    def create_cog(self, spec: CogSpec):
+        if isinstance(spec, int):
+            return self.state.create_cog(spec)
+        return self.state.create_cog(**spec)
+
+    @staticmethod
+    def parse(plan: Sequence) -> tuple[ClashGagTuple, ...]:
+        if getattr(plan, "dtype", None) is not None:
+            return gag_rows(plan)
+        return tuple(tuple(gag) for gag in plan)
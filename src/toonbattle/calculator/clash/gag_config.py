@@ -1,6 +1,9 @@
 from toonbattle.calculator.common.attacks import TrackConfiguration
 from toonbattle.calculator.helpers.enums import ClashGags
 
+# (toon_avid, track 0-indexed, level 0-indexed, target_avid, prestige)
+ClashGagTuple = tuple[int, int, int, int | str | tuple[int, ...], bool]
+
 ClashGagConfiguration = {
     ClashGags.ToonUp: TrackConfiguration(0.95, (8, 15, 26, 45, 60, 84, 90, 135)),
     ClashGags.Trap: TrackConfiguration(1.0, (20, 35, 50, 75, 115, 160, 220, 280)),
@@ -3,6 +3,7 @@ from math import ceil
 
 from toonbattle.calculator.clash import gag_config
 from toonbattle.calculator.clash.cogs import ClashCog
+from toonbattle.calculator.clash.gag_config import ClashGagTuple
 from toonbattle.calculator.common.attacks import GagController, GagDefinition, GagPart
 from toonbattle.calculator.common.avatar import Avatar, AvatarHolder
 from toonbattle.calculator.helpers.enums import (
@@ -17,11 +18,10 @@ from toonbattle.calculator.helpers.enums import (
 from toonbattle.calculator.globals import ClashGagRegistry as CGReg, ClashObjectRegistry as COReg
 
 COReg.bind(AuxillaryObjects.GagController, GagController)
-# (toon_avid, track 0-indexed, level 0-indexed, target_avid, prestige)
-ClashGagTuple = tuple[int, int, int, int | str | tuple[int, ...], bool]
 
 
 class ClashGagPart(GagPart):
+    __slots__ = ("prestige",)
     prestige: bool
 
     def __init__(self, toons: AvatarHolder, targets: AvatarHolder, gag: ClashGagTuple):
@@ -45,22 +45,16 @@ class ClashGagDefinition(GagDefinition):
         return self.configuration[self.track].damages[part.level]
 
     def perform_attack(self, combo: float = 0.0, aoe: bool = False, **kwargs) -> list[tuple[ClashGagPart, float]]:
-        hit_cogs = [self.target[0]] if not aoe else self.true_parent_cluster.cogs
-        damages = []
-        for part in self.gag_parts:
-            value = self.get_damage_value(part)
-            damages.append((part, value))
+        state = self.true_parent_cluster
+        hit_cogs = (self.target[0],) if not aoe else state.cogs
+        damages = [(part, self.get_damage_value(part)) for part in self.gag_parts]
 
         for cog in hit_cogs:
-            total_damage = self.true_parent_cluster.deal_damage(
-                cog, *[(damage, dict(author=part.author)) for part, damage in damages], **kwargs
-            )
-            self.true_parent_cluster.create_effect(cog, CommonEffects.Stun, stacks=len(damages))
+            total_damage = state.deal_part_damage(cog, damages, **kwargs)
+            state.create_effect(cog, CommonEffects.Stun, stacks=len(damages))
             if combo and len(damages) > 1:
                 total_damage *= combo
-                self.true_parent_cluster.deal_damage(
-                    cog, total_damage, author=self, extra_source=ExtraSources.ComboDamage, **kwargs
-                )
+                state.deal_damage(cog, total_damage, author=self, extra_source=ExtraSources.ComboDamage, **kwargs)
 
         return damages
 
@@ -182,6 +176,7 @@ class Zap(ClashGagDefinition):
 
         soak_effect = cog.effects[ClashEffects.Soak]
         soak_effect.turns = 0
+        cog.effects.touch()
 
     def get_accuracy(self, other_self):
         return int(ClashEffects.Soak in self.target[0].effects)
@@ -260,7 +255,7 @@ class Drop(ClashGagDefinition):
         if ClashEffects.Lured in target_cog.effects:
             return 0
 
-        return super().get_accuracy()
+        return super().get_accuracy(other_self)
 
     def apply(self):
         # copied perform_attack due to separate accuracy calculation
@@ -273,9 +268,7 @@ class Drop(ClashGagDefinition):
                 damages.append((part, value))
                 hitting_gags.append(part)
 
-        total_damage = self.true_parent_cluster.deal_damage(
-            cog, *[(damage, dict(author=part.author)) for part, damage in damages], source=DamageSources.Drop
-        )
+        total_damage = self.true_parent_cluster.deal_part_damage(cog, damages, source=DamageSources.Drop)
         if len(damages) > 1:
             total_damage *= gag_config.DropComboDamage
             self.true_parent_cluster.deal_damage(
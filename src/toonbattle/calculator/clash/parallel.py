@@ -0,0 +1,147 @@
+"""
+Process-pool driver for what-if searches over many gag plans.
+
+Every worker decodes the battle (see common/wire.py) once when it starts and keeps that replica warm;
+each plan is then evaluated on a fork of the replica, so no state is rebuilt per plan.
+Plans are split into chunks in submission order and results are merged back by plan index,
+so the output does not depend on the number of processes or on scheduling.
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Optional, Sequence, TYPE_CHECKING
+
+from toonbattle.calculator.clash.combos import AvailableGag, Combo, ComboFinder, check_kill
+from toonbattle.calculator.clash.gag_config import ClashGagTuple
+from toonbattle.calculator.common.rng import RandomStreams
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import ClashState
+
+GagPlan = Sequence[ClashGagTuple]
+# evaluators run inside the workers, so they have to be picklable (module-level functions)
+Evaluator = Callable[["ClashState", GagPlan, Sequence[str]], Any]
+
+_replica: Optional["ClashState"] = None
+
+
+def _init_worker(state_class: type, data: bytes):
+    global _replica
+
+    state_class.Rules.freeze()
+    # the encoded form keeps what wrap() leaves out, such as the executive flag of cogs
+    _replica = state_class.from_bytes(data)
+
+
+def _evaluate_chunk(
+    evaluator: Evaluator, chunk: list[tuple[int, GagPlan]], targets: Sequence[str], streams: Optional[RandomStreams]
+):
+    results = []
+    for index, plan in chunk:
+        if streams is not None:
+            _replica.rng = streams.trial(0, index)
+        results.append((index, evaluator(_replica, plan, targets)))
+    return results
+
+
+def kills_targets(state: "ClashState", plan: GagPlan, targets: Sequence[str]) -> bool:
+    return check_kill(state, plan, targets)
+
+
+def kill_chance(state: "ClashState", plan: GagPlan, targets: Sequence[str]) -> float:
+    return state.run_gags_exact(*plan).kill_probability(*targets)
+
+
+def expected_health(state: "ClashState", plan: GagPlan, targets: Sequence[str]) -> tuple[float, ...]:
+    distribution = state.run_gags_exact(*plan)
+    return tuple(distribution.expected_health(target) for target in targets)
+
+
+class ParallelSearch:
+    """
+    Evaluates gag plans against one battle on a pool of worker processes.
+    Use as a context manager (or call close()) so the pool is shut down.
+    """
+
+    def __init__(
+        self,
+        state: "ClashState",
+        processes: Optional[int] = None,
+        chunk_size: int = 64,
+        seed: Optional[int] = None,
+        common: bool = False,
+    ):
+        self.state = state
+        # with a seed, plan i draws from its own stream, or with `common` every plan from the same one
+        self.streams = RandomStreams(seed, common) if seed is not None else None
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.pool = ProcessPoolExecutor(
+            self.processes, initializer=_init_worker, initargs=(type(state), state.to_bytes())
+        )
+
+    def __enter__(self) -> "ParallelSearch":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def evaluate(
+        self, plans: Iterable[GagPlan], evaluator: Evaluator = kills_targets, targets: Optional[Sequence[str]] = None
+    ) -> list:
+        """Returns evaluator(state, plan, targets) for every plan, in the order of `plans`."""
+        if targets is None:
+            targets = [str(cog.avatar_id) for cog in self.state.cogs]
+        targets = [str(target) for target in targets]
+
+        indexed = list(enumerate(plans))
+        chunks = [indexed[i : i + self.chunk_size] for i in range(0, len(indexed), self.chunk_size)]
+        futures = [self.pool.submit(_evaluate_chunk, evaluator, chunk, targets, self.streams) for chunk in chunks]
+
+        results = [None] * len(indexed)
+        for future in futures:
+            for index, result in future.result():
+                results[index] = result
+        return results
+
+    def find_combos(
+        self,
+        available: dict[str, Iterable[AvailableGag]],
+        targets: Optional[Sequence[str]] = None,
+        objective: str | Callable[[ClashGagTuple], float] = "fewest",
+        limit: int = 1,
+        wave_size: Optional[int] = None,
+    ) -> list[Combo]:
+        """
+        Parallel counterpart of ClashState.find_combos: candidates which pass the damage bounds are generated
+        cheapest first and evaluated in waves of equal cost, at most `wave_size` plans per wave (a few chunks
+        per process by default), until `limit` combos are found.
+        Equivalent plans are evaluated once. Ties are broken by enumeration order, as in the serial search.
+        """
+        finder = ComboFinder(self.state)
+        if targets is None:
+            targets = finder.cog_ids
+        targets = [str(target) for target in targets]
+        wave_size = wave_size or 4 * self.processes * self.chunk_size
+        candidates = finder.candidates(available, targets, objective)
+
+        found = []
+        results: dict[tuple, bool] = {}
+        for cost, group in itertools.groupby(candidates, key=lambda x: x[0]):
+            group = (gags for _, gags in group)
+            while wave := list(itertools.islice(group, wave_size)):
+                keys = [finder.plan_key(gags) for gags in wave]
+                unique: dict[tuple, GagPlan] = {}
+                for key, gags in zip(keys, wave):
+                    if key not in results:
+                        unique.setdefault(key, gags)
+
+                results.update(zip(unique, self.evaluate(unique.values(), targets=targets)))
+                found.extend(Combo(gags, cost) for gags, key in zip(wave, keys) if results[key])
+                if len(found) >= limit:
+                    return found[:limit]
+
+        return found
@@ -0,0 +1,111 @@
+from typing import Optional, Sequence, TYPE_CHECKING
+
+from toonbattle.calculator.clash.gag_config import ClashGagTuple
+from toonbattle.calculator.helpers.enums import ClashGags
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import ClashState
+
+
+def resolve(avatar_ids: Sequence[str], item) -> Optional[int]:
+    """Position of an avatar in an AvatarHolder, following the same id/position rules as AvatarHolder.__call__."""
+    if isinstance(item, str):
+        try:
+            return avatar_ids.index(item)
+        except ValueError:
+            return None
+    try:
+        return item if 0 <= item < len(avatar_ids) else None
+    except TypeError:
+        return None
+
+
+class PlannedPart:
+    author: int
+    level: int
+    prestige: bool
+    # positions of the targets of this exact part, () for all targets
+    targets: tuple[int, ...]
+
+    def __init__(self, author: int, level: int, prestige: bool, targets: tuple[int, ...]):
+        self.author = author
+        self.level = level
+        self.prestige = prestige
+        self.targets = targets
+
+    def __repr__(self):
+        return f"({self.level},{self.prestige}) <- {self.author}"
+
+
+class PlannedGag:
+    track: int
+    # positions of the targets of the merged gag, same as GagDefinition.target
+    target: tuple[int, ...]
+    parts: list[PlannedPart]
+
+    def __init__(self, track: int, target: tuple[int, ...], parts: list[PlannedPart]):
+        self.track = track
+        self.target = target
+        self.parts = parts
+
+    @property
+    def targets_toons(self) -> bool:
+        return self.track == ClashGags.ToonUp
+
+    @property
+    def levels(self) -> tuple[int, ...]:
+        return tuple(part.level for part in self.parts)
+
+    @property
+    def max_level(self) -> int:
+        return max(self.levels)
+
+    @property
+    def priority(self) -> float:
+        return 100 * self.track + 10 * min(self.levels) + min(part.author for part in self.parts)
+
+    def __repr__(self):
+        return f"PlannedGag({self.track}, {self.target}, {self.parts})"
+
+
+def plan_gags(toon_ids: Sequence[str], cog_ids: Sequence[str], gags: Sequence[ClashGagTuple]) -> list[PlannedGag]:
+    """
+    Object-free equivalent of ClashState.get_gag_parts followed by the priority sort of run_gags:
+    the merged gags in the order they would be applied, with avatars referred to by position.
+    """
+    from toonbattle.calculator.common.state import ClashState
+
+    def target_ids(track: int) -> Sequence[str]:
+        return cog_ids if track > 0 else toon_ids
+
+    def gag_weight(gag_pair: tuple) -> tuple[int, int]:
+        if gag_pair[1] == ():
+            return gag_pair[0], 0
+        return gag_pair[0], resolve(target_ids(gag_pair[0]), gag_pair[1])
+
+    planned = []
+    for track, target, gag_list in sorted(ClashState.build_merged_tracks(gags), key=gag_weight):
+        ids = target_ids(track)
+        target_position = resolve(ids, target)
+        parts = []
+        for author_avid, _, level, part_target, prestige in gag_list:
+            if not isinstance(part_target, tuple):
+                part_target = (part_target,)
+            parts.append(
+                PlannedPart(
+                    resolve(toon_ids, author_avid), level, prestige, tuple(resolve(ids, x) for x in part_target)
+                )
+            )
+        if target_position is not None:
+            merged_target = (target_position,)
+        else:
+            merged_target = tuple(range(len(ids)))
+        planned.append(PlannedGag(track, merged_target, parts))
+
+    return sorted(planned, key=lambda gag: gag.priority)
+
+
+def plan_state_gags(state: "ClashState", gags: Sequence[ClashGagTuple]) -> list[PlannedGag]:
+    toon_ids = [str(toon.avatar_id) for toon in state.toons]
+    cog_ids = [str(cog.avatar_id) for cog in state.cogs]
+    return plan_gags(toon_ids, cog_ids, gags)
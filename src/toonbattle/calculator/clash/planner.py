@@ -0,0 +1,206 @@
+"""
+Monte Carlo tree search over whole battles.
+
+A node of the tree is a sequence of turns, one gag plan per turn. The search is open loop: every
+iteration replays the sequence with use_gags on a fork of the battle, with fresh rolls, so hits and
+misses are sampled instead of being stored in the tree, and effects expire through Events.ToonsMoved
+as in a real battle. After the selected leaf, random plans are played until every cog is dead or the
+turn limit is reached.
+
+The tree is kept between turns: after a turn has been played for real, advance() makes the matching
+child the new root, so the statistics gathered for that line of play are reused.
+"""
+import math
+import random
+import time
+from typing import Iterable, Optional, Sequence, TYPE_CHECKING
+
+from toonbattle.calculator.clash.combos import AvailableGag
+from toonbattle.calculator.clash.gag_config import ClashGagTuple
+from toonbattle.calculator.helpers.enums import ClashGags
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import ClashState
+
+TurnPlan = tuple[ClashGagTuple, ...]
+
+
+class PlanNode:
+    def __init__(self, plan: Optional[TurnPlan] = None, parent: Optional["PlanNode"] = None):
+        self.plan = plan
+        self.parent = parent
+        self.children: dict[TurnPlan, PlanNode] = {}
+        # plans not expanded yet, sampled the first time the node is reached
+        self.untried: Optional[list[TurnPlan]] = None
+        self.visits = 0
+        self.value = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.value / self.visits if self.visits else 0.0
+
+    def ucb(self, exploration: float) -> float:
+        return self.mean + exploration * math.sqrt(math.log(self.parent.visits) / self.visits)
+
+    def best_child(self) -> Optional["PlanNode"]:
+        return max(self.children.values(), key=lambda child: (child.visits, child.mean), default=None)
+
+    def __repr__(self):
+        return f"PlanNode({self.visits} visits, {self.mean:.3f}, {self.plan})"
+
+
+class BattlePlanner:
+    """
+    Suggests gag plans for the next turns of a battle. `available` maps toon IDs to their (track, level, prestige)
+    gags, which are available every turn. A battle scores 1 when it is won on the first turn, down to 0.5 when it
+    is won on the last one, and half the fraction of cog health removed when it is not won within `max_turns`.
+    With `cogs_attack`, every turn is a full play_round and a battle in which all toons fall scores 0.
+    """
+
+    def __init__(
+        self,
+        state: "ClashState",
+        available: dict[str, Iterable[AvailableGag]],
+        max_turns: int = 4,
+        exploration: float = 0.7,
+        plans_per_node: int = 24,
+        seed: Optional[int] = None,
+        cogs_attack: bool = False,
+    ):
+        self.state = state
+        self.available = {str(toon_id): list(gags) for toon_id, gags in available.items()}
+        self.max_turns = max_turns
+        self.exploration = exploration
+        self.plans_per_node = plans_per_node
+        self.rng = random.Random(seed)
+        self.cogs_attack = cogs_attack
+        self.root = PlanNode()
+        self.rollouts = 0
+        self.elapsed = 0.0
+
+    @property
+    def rollouts_per_second(self) -> float:
+        return self.rollouts / self.elapsed if self.elapsed else 0.0
+
+    # plans
+
+    def gag_options(self, toon_id: str) -> list[ClashGagTuple]:
+        cog_ids = [cog.avatar_id for cog in self.state.cogs]
+        options = []
+        for track, level, prestige in self.available.get(toon_id, ()):
+            if track == ClashGags.ToonUp:
+                continue
+            if track == ClashGags.Sound or (track == ClashGags.Lure and level % 2):
+                options.append((toon_id, track, level, (), prestige))
+            else:
+                options.extend((toon_id, track, level, cog_id, prestige) for cog_id in cog_ids)
+        return options
+
+    def random_plan(self) -> TurnPlan:
+        plan = []
+        for toon in self.state.toons:
+            options = self.gag_options(toon.avatar_id)
+            if options:
+                plan.append(self.rng.choice(options))
+        return tuple(plan)
+
+    def sample_plans(self) -> list[TurnPlan]:
+        plans = {self.random_plan() for _ in range(self.plans_per_node)}
+        return sorted(plans, key=repr)
+
+    def playable(self, plan: TurnPlan) -> TurnPlan:
+        """The gags of a plan whose author and target are still in the battle."""
+        state = self.state
+        return tuple(
+            gag for gag in plan if state.toons(gag[0]) is not None and (gag[3] == () or state.cogs(gag[3]) is not None)
+        )
+
+    # search
+
+    def finished(self, turn: int) -> bool:
+        return turn >= self.max_turns or not len(self.state.cogs) or not len(self.state.toons)
+
+    def play(self, plan: TurnPlan):
+        if self.cogs_attack:
+            self.state.play_round(*self.playable(plan))
+        else:
+            self.state.use_gags(*self.playable(plan))
+
+    def score(self, turn: int, start_health: int) -> float:
+        remaining = sum(max(cog.health, 0) for cog in self.state.cogs)
+        if not remaining:
+            return 1 - 0.5 * max(turn - 1, 0) / max(self.max_turns - 1, 1)
+        if not len(self.state.toons):
+            return 0.0
+        return 0.5 * (1 - remaining / start_health) if start_health else 0.0
+
+    def iterate(self, start_health: int):
+        node = self.root
+        turn = 0
+        with self.state.fork():
+            while not self.finished(turn):
+                if node.untried is None:
+                    node.untried = self.sample_plans()
+                if node.untried:
+                    plan = node.untried.pop()
+                    node.children[plan] = node = PlanNode(plan, node)
+                    self.play(plan)
+                    turn += 1
+                    break
+                if not node.children:
+                    break
+                node = max(node.children.values(), key=lambda child: child.ucb(self.exploration))
+                self.play(node.plan)
+                turn += 1
+
+            while not self.finished(turn):
+                self.play(self.random_plan())
+                turn += 1
+            reward = self.score(turn, start_health)
+
+        self.rollouts += 1
+        while node is not None:
+            node.visits += 1
+            node.value += reward
+            node = node.parent
+
+    def search(self, time_budget: float = 1.0, iterations: Optional[int] = None) -> Optional[TurnPlan]:
+        """
+        Grows the tree for `time_budget` seconds (or exactly `iterations` iterations)
+        and returns the suggested plan for the next turn.
+        """
+        state = self.state
+        start_health = sum(max(cog.health, 0) for cog in state.cogs)
+        state_rng, state.rng = state.rng, self.rng
+        started = time.perf_counter()
+        try:
+            done = 0
+            while (done < iterations) if iterations is not None else (time.perf_counter() - started < time_budget):
+                self.iterate(start_health)
+                done += 1
+        finally:
+            state.rng = state_rng
+            self.elapsed += time.perf_counter() - started
+        return self.best_plan()
+
+    def best_plan(self) -> Optional[TurnPlan]:
+        child = self.root.best_child()
+        return child.plan if child is not None else None
+
+    def principal_variation(self) -> list[TurnPlan]:
+        """The most visited plan of every turn, as far as the tree goes."""
+        plans = []
+        node = self.root.best_child()
+        while node is not None:
+            plans.append(node.plan)
+            node = node.best_child()
+        return plans
+
+    def advance(self, plan: Sequence[ClashGagTuple]):
+        """Moves the root to `plan` once it has been played on the state, keeping its subtree."""
+        plan = tuple(plan)
+        node = self.root.children.get(plan)
+        if node is None:
+            node = PlanNode(plan)
+        node.parent = None
+        self.root = node
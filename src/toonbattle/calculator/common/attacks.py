@@ -1,11 +1,11 @@
 import abc
 import logging
-import random
-from typing import Sequence, TYPE_CHECKING, cast
+from typing import Optional, Sequence, TYPE_CHECKING, cast
 
 from pycluster.messenger.helpers import replaceable
 
 from toonbattle.calculator.common.avatar import Avatar
+from toonbattle.calculator.common.pooling import FreeList
 from toonbattle.calculator.globals import CalculationObject
 from toonbattle.calculator.helpers.enums import MathTargets, ReplaceTargets
 
@@ -15,6 +15,8 @@ if TYPE_CHECKING:
 
 class Attack(CalculationObject, abc.ABC):
     logger = logging.getLogger("toonbattle.calculator.Attack")
+    # (accuracy_key(), accuracy) of the last calculation
+    accuracy_cache: Optional[tuple[tuple, float]] = None
 
     @abc.abstractmethod
     def get_accuracy(self, other_self: "Attack") -> float:
@@ -23,7 +25,23 @@ class Attack(CalculationObject, abc.ABC):
 
     @property
     def hit(self):
-        return self.get_accuracy(self) >= random.random()
+        return self.true_parent_cluster.roll(self.accuracy)
+
+    @property
+    def accuracy(self) -> float:
+        key = self.accuracy_key()
+        if key is None:
+            return self.get_accuracy(self)
+        if self.accuracy_cache is None or self.accuracy_cache[0] != key:
+            self.accuracy_cache = key, self.get_accuracy(self)
+        return self.accuracy_cache[1]
+
+    def accuracy_key(self) -> Optional[tuple]:
+        """
+        Versions of everything the accuracy depends on; the accuracy is only calculated again when this changes.
+        None disables caching.
+        """
+        return None
 
     @property
     def true_parent_cluster(self) -> "CalculationState":
@@ -36,6 +54,7 @@ class Attack(CalculationObject, abc.ABC):
 
 
 class GagPart:
+    __slots__ = ("level", "author", "target")
     level: int
     author: Avatar
     target: tuple[Avatar, ...]
@@ -45,6 +64,7 @@ class GagPart:
 
 
 class TrackConfiguration:
+    __slots__ = ("accuracy", "damages", "extras")
     accuracy: tuple[float, ...]
     damages: tuple[int, ...]
 
@@ -55,13 +75,17 @@ class TrackConfiguration:
 
 
 class GagDefinition(Attack):
+    __slots__ = ("track", "gag_parts", "target", "levels", "base_accuracy", "accuracy_cache")
     track: int
     gag_parts: list[GagPart]
     configuration: dict[int, TrackConfiguration]
     target: tuple[Avatar, ...]
+    levels: tuple[int, ...]
+    base_accuracy: float
     targets_toons: bool = False
 
     def construct(self, track: int, target: int | tuple, gag_parts: Sequence[GagPart]):
+        """Sets every field of a run, definitions are reused by the next run (see common/pooling.py)."""
         self.track = track
 
         av_list = self.true_parent_cluster.cogs if not self.targets_toons else self.true_parent_cluster.toons
@@ -72,26 +96,30 @@ class GagDefinition(Attack):
         else:
             self.target = tuple(av_list)
         self.gag_parts = list(gag_parts)
+        self.levels = tuple(part.level for part in self.gag_parts)
+        self.base_accuracy = max(self.configuration[self.track].accuracy[x] for x in self.levels)
+        self.accuracy_cache = None
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.track}, {self.gag_parts})"
 
-    @property
-    def levels(self) -> tuple[int, ...]:
-        return tuple(part.level for part in self.gag_parts)
-
     @property
     def max_level(self) -> int:
         return max(self.levels)
 
-    @property
-    def base_accuracy(self):
-        return max(self.configuration[self.track].accuracy[x] for x in self.levels)
+    def accuracy_key(self) -> tuple:
+        # accuracy modifiers and replacements all come from effects of the state, the targets or the authors
+        key = [self.true_parent_cluster.effects.version]
+        key.extend(avatar.effects.version for avatar in self.target)
+        key.extend(part.author.effects.version for part in self.gag_parts)
+        return tuple(key)
 
     @replaceable(ReplaceTargets.GagAccuracy)
     def get_accuracy(self, other_self):
         return min(
-            self.calculate(MathTargets.Accuracy, 0.7 + self.base_accuracy, gags=self.gag_parts, subject=self.target),
+            self.true_parent_cluster.calculate(
+                MathTargets.Accuracy, 0.7 + self.base_accuracy, gags=self.gag_parts, subject=self.target
+            ),
             0.95,
         )
 
@@ -121,11 +149,34 @@ class GagDefinition(Attack):
 
 class GagController(CalculationObject):
     parent: "CalculationState"
+    # definitions of finished runs by track, see common/pooling.py
+    pool: Optional[FreeList] = None
 
     @property
     def registry(self):
         return self.parent_cluster.GagRegistry
 
+    def create(self, track: int, child_id: str) -> GagDefinition:
+        """Inserts a definition of the track, to be set up with construct()."""
+        gag_def = self.pool.acquire(track) if self.pool is not None else None
+        if gag_def is None:
+            return cast(GagDefinition, self.registry.create_and_insert(track, self, child_id, cast_to=GagDefinition))
+        return self.add_child(child_id, gag_def)
+
+    def release(self):
+        """Detaches every definition and keeps them for the next run; their fields stay readable until then."""
+        if self.pool is None:
+            self.pool = FreeList()
+        for child_id, gag_def in list(self.children.items()):
+            self.remove_child(child_id)
+            if not self.pool.release(gag_def.object_type, gag_def):
+                gag_def.cleanup()
+
+    def cleanup(self):
+        if self.pool is not None:
+            self.pool.clear()
+        super().cleanup()
+
     def __len__(self):
         return len(self.children)
 
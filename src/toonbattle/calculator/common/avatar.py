@@ -1,9 +1,8 @@
 from typing import Optional, Type, TypeVar
 
-from pycluster.messenger.helpers import math
 from pycluster.util.action_lock import ActionLock
 
-from toonbattle.calculator.helpers.decorators import check_subject
+from toonbattle.calculator.helpers.dispatch import subject_math
 from toonbattle.calculator.helpers.enums import AuxillaryObjects, MathTargets
 from toonbattle.calculator.globals import CalculationObject
 
@@ -50,8 +49,7 @@ class Cog(Avatar):
     def datagram(self, value):
         self.avatar_id, self.health, self.max_health, self.defense = value
 
-    @math(MathTargets.Accuracy)
-    @check_subject
+    @subject_math(MathTargets.Accuracy)
     def calculate_accuracy(self, value: float, **kwargs):
         return value - self.defense
 
@@ -68,11 +66,19 @@ class Toon(Avatar):
 
 class AvatarHolder(CalculationObject):
     children: dict[str, Avatar]
+    # child IDs in battle order
+    avatar_order: list[str]
+    # position of every child ID in avatar_order
+    positions: dict[str, int]
+    # avatars removed while the state is forked, kept so that rolling back attaches them again (see common/fork.py)
+    detached: list[Avatar]
 
     def __init__(self, parent, subclass_id: int, **kwargs):
         super().__init__(parent, **kwargs)
         self.subclass_id = subclass_id
         self.avatar_order = []
+        self.positions = {}
+        self.detached = []
         self.avatar_lock = ActionLock()
 
     def create(self, cast_to: Type[T] = Avatar, **kwargs) -> T:
@@ -83,11 +89,29 @@ class AvatarHolder(CalculationObject):
         return avatar
 
     def remove(self, avatar: Avatar) -> None:
-        if avatar.avatar_id in self.avatar_order:
-            self.avatar_order.remove(avatar.avatar_id)
-        avatar.cleanup()
+        child_id = str(avatar.avatar_id)
+        position = self.positions.pop(child_id, None)
+        if position is not None:
+            del self.avatar_order[position]
+            # positions stay dense so that neighbours close the gap, only the avatars after the removed one move
+            for other_id in self.avatar_order[position:]:
+                self.positions[other_id] -= 1
+        if self.parent_cluster.forks:
+            self.detached.append(avatar)
+        else:
+            avatar.cleanup()
         with self.avatar_lock as lock:
-            lock.delitem(self.children, str(avatar.avatar_id))
+            lock.delitem(self.children, child_id)
+
+    def attach(self, child_id: str, avatar: Avatar):
+        """Attaches an avatar which was removed while the state was forked again."""
+        self.detached = [other for other in self.detached if other is not avatar]
+        self.add_child(child_id, avatar)
+
+    def release_detached(self):
+        for avatar in self.detached:
+            avatar.cleanup()
+        self.detached.clear()
 
     def remove_dead_avatars(self) -> None:
         with self.avatar_lock:
@@ -95,24 +119,29 @@ class AvatarHolder(CalculationObject):
                 if avatar.health <= 0:
                     self.remove(avatar)
 
-    def __getitem__(self, item: int) -> Avatar:
-        item = int(item)
-        if item > 90:
-            return self.children[str(item)]
+    def by_id(self, avatar_id: str) -> Optional[Avatar]:
+        return self.children.get(avatar_id)
+
+    def at(self, position: int) -> Optional[Avatar]:
+        if 0 <= position < len(self.avatar_order):
+            return self.children.get(self.avatar_order[position])
+        return None
+
+    def __getitem__(self, item: str | int) -> Avatar:
+        """Avatar IDs are strings, anything else is a position in battle order."""
+        if isinstance(item, str):
+            return self.children[item]
         return self.children[self.avatar_order[item]]
 
-    def __call__(self, item: int) -> Optional[Avatar]:
+    def __call__(self, item: str | int) -> Optional[Avatar]:
+        """Like __getitem__, but None when there is no such avatar."""
+        if isinstance(item, str):
+            return self.by_id(item)
         try:
-            item = int(item)
-        except (TypeError, ValueError):
+            return self.at(item)
+        except TypeError:
             return None
 
-        if item > 90:
-            return self.children.get(str(item))
-        if item >= len(self.avatar_order) or item < 0:
-            return None
-        return self.children.get(self.avatar_order[item], None)
-
     def __repr__(self):
         dumped_children = []
         for i in self.avatar_order:
@@ -126,23 +155,22 @@ class AvatarHolder(CalculationObject):
         return len(self.avatar_order)
 
     def __iter__(self):
-        return (self[i] for i in range(len(self.avatar_order)))
+        return (self.children[child_id] for child_id in self.avatar_order)
 
     @property
     def datagram(self):
         return self.avatar_order
 
     @datagram.setter
-    def datagram(self, avatar_order: list[int]):
+    def datagram(self, avatar_order: list[str]):
         self.avatar_order = avatar_order
+        self.positions = {child_id: position for position, child_id in enumerate(avatar_order)}
 
     def add_child(self, child_id: str, child: Avatar, allow_subtrees: bool = False):
         super().add_child(child_id, child, allow_subtrees)
-        if child_id not in self.avatar_order:
+        if child_id not in self.positions:
+            self.positions[child_id] = len(self.avatar_order)
             self.avatar_order.append(child_id)
 
     def index(self, av: Avatar) -> int:
-        try:
-            return self.avatar_order.index(av.avatar_id)
-        except ValueError:
-            return -1
+        return self.positions.get(str(av.avatar_id), -1)
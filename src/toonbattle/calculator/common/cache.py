@@ -0,0 +1,128 @@
+"""
+Cache of run_gags_exact results keyed by the fingerprint of the state and the gag plan (see common/fingerprint.py).
+
+The first tier is an in-memory LRU of OutcomeDistribution objects. With a `path`, results are also written to a
+SQLite database in the wire format (see common/wire.py), which survives restarts and can be shared between
+processes; results found there are moved into memory. Cached distributions are shared, so they must not be
+modified by the caller.
+"""
+import sqlite3
+from collections import OrderedDict
+from typing import Optional, TYPE_CHECKING
+
+from toonbattle.calculator.common.fingerprint import canonical, digest, gag_key
+from toonbattle.calculator.common.outcomes import Outcome, OutcomeDistribution, enumerate_outcomes
+from toonbattle.calculator.common.wire import Reader, WireError, Writer
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import CalculationState
+
+CacheMagic = b"TC"
+CacheVersion = 1
+
+
+def encode_distribution(distribution: OutcomeDistribution) -> bytes:
+    writer = Writer()
+    writer.buffer += CacheMagic
+    writer.varint(CacheVersion)
+    writer.varint(distribution.evaluations)
+    writer.value([(outcome.key, outcome.probability) for outcome in distribution])
+    return bytes(writer.buffer)
+
+
+def decode_distribution(data: bytes) -> OutcomeDistribution:
+    if bytes(data[: len(CacheMagic)]) != CacheMagic:
+        raise WireError("Not a cached distribution")
+    reader = Reader(data)
+    reader.offset = len(CacheMagic)
+    if (version := reader.varint()) != CacheVersion:
+        raise WireError(f"Unsupported cache version {version}")
+    evaluations = reader.varint()
+    # sequences are read back as tuples, so the keys are hashable again
+    outcomes = [Outcome(key, probability) for key, probability in reader.value()]
+    if reader.offset != len(data):
+        raise WireError("Trailing data after the distribution")
+    return OutcomeDistribution(outcomes, evaluations)
+
+
+class OutcomeCache:
+    """
+    Use as a context manager (or call close()) when it has a database.
+    """
+
+    def __init__(self, size: int = 4096, path: Optional[str] = None):
+        self.size = size
+        self.memory: OrderedDict[bytes, OutcomeDistribution] = OrderedDict()
+        self.db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self.db = sqlite3.connect(path)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS outcomes (key BLOB PRIMARY KEY, value BLOB NOT NULL)")
+            self.db.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "OutcomeCache":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.memory)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    @staticmethod
+    def key(state: "CalculationState", pregags, use: bool = False) -> bytes:
+        return digest((canonical(state), gag_key(pregags), use))
+
+    def get(self, key: bytes) -> Optional[OutcomeDistribution]:
+        distribution = self.memory.get(key)
+        if distribution is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return distribution
+
+        if self.db is not None:
+            row = self.db.execute("SELECT value FROM outcomes WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                distribution = decode_distribution(row[0])
+                self.remember(key, distribution)
+                self.disk_hits += 1
+                return distribution
+        return None
+
+    def put(self, key: bytes, distribution: OutcomeDistribution):
+        self.remember(key, distribution)
+        if self.db is not None:
+            self.db.execute(
+                "INSERT OR REPLACE INTO outcomes (key, value) VALUES (?, ?)", (key, encode_distribution(distribution))
+            )
+            self.db.commit()
+
+    def remember(self, key: bytes, distribution: OutcomeDistribution):
+        self.memory[key] = distribution
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+
+    def clear(self):
+        """Empties both tiers."""
+        self.memory.clear()
+        if self.db is not None:
+            self.db.execute("DELETE FROM outcomes")
+            self.db.commit()
+
+    def outcomes(self, state: "CalculationState", *pregags: tuple, use: bool = False) -> OutcomeDistribution:
+        key = self.key(state, pregags, use)
+        distribution = self.get(key)
+        if distribution is None:
+            self.misses += 1
+            distribution = enumerate_outcomes(state, *pregags, use=use)
+            self.put(key, distribution)
+        return distribution
@@ -1,17 +1,21 @@
-from pycluster.messenger.helpers import math
-
 from toonbattle.calculator.common.status_effects import StatusEffectTimed
-from toonbattle.calculator.helpers.decorators import check_subject
+from toonbattle.calculator.helpers.dispatch import subject_math
 from toonbattle.calculator.helpers.enums import MathTargets
 
 
 class EffectStun(StatusEffectTimed):
     DefaultTurns = 1
+    # created on every hit cog and gone at the end of the turn
+    Pooled = True
 
     def __init__(self, parent, stacks=1, **kwargs):
         super().__init__(parent, **kwargs)
         self.stacks = stacks
 
+    def reset(self, stacks=1, **kwargs):
+        super().reset(**kwargs)
+        self.stacks = stacks
+
     def update(self, stacks=1, **kwargs):
         self.stacks += stacks
 
@@ -23,7 +27,6 @@ class EffectStun(StatusEffectTimed):
     def datagram(self, value):
         self.turns, self.stacks = value
 
-    @math(MathTargets.Accuracy)
-    @check_subject
+    @subject_math(MathTargets.Accuracy)
     def calculate_accuracy(self, value: float, **kwargs):
         return value + 0.2 * self.stacks
@@ -0,0 +1,233 @@
+from typing import Any, Optional, TYPE_CHECKING
+
+from toonbattle.calculator.common.fork import attributes, set_attributes
+from toonbattle.calculator.common.status_effects import StatusEffectController
+from toonbattle.calculator.common.wire import Reader, WireError, Writer
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.avatar import AvatarHolder
+    from toonbattle.calculator.common.state import CalculationState
+
+DeltaMagic = b"TD"
+DeltaVersion = 2
+
+# datagram and ForkedAttributes (see common/fork.py) of an avatar or effect, as datagrams do not hold everything
+ObjectState = tuple[Any, tuple]
+EffectsSnapshot = dict[str, ObjectState]
+# order, {child ID: (object state, effects)}
+HolderSnapshot = tuple[list[str], dict[str, tuple[ObjectState, EffectsSnapshot]]]
+# removed effect IDs, {effect ID: object state} of added and changed effects
+EffectsDelta = tuple[list[str], dict[str, ObjectState]]
+
+
+def object_state(obj) -> ObjectState:
+    return obj.datagram, attributes(obj)
+
+
+class Snapshot:
+    """
+    Datagrams and ForkedAttributes of every avatar and effect in a state, the input of StateDelta.diff.
+    """
+
+    def __init__(self, state: "CalculationState"):
+        self.allocated = state.LatestAllocatedID
+        self.effects = self.record_effects(state.effects)
+        self.holders: tuple[HolderSnapshot, ...] = tuple(
+            self.record_holder(holder) for holder in (state.toons, state.cogs)
+        )
+
+    @staticmethod
+    def record_effects(controller: StatusEffectController) -> EffectsSnapshot:
+        return {child_id: object_state(effect) for child_id, effect in controller.children.items()}
+
+    def record_holder(self, holder: "AvatarHolder") -> HolderSnapshot:
+        avatars = {
+            child_id: (object_state(avatar), self.record_effects(avatar.effects))
+            for child_id, avatar in holder.children.items()
+        }
+        return list(holder.avatar_order), avatars
+
+
+class HolderDelta:
+    def __init__(self):
+        self.order: Optional[list[str]] = None
+        self.removed: list[str] = []
+        self.avatars: dict[str, ObjectState] = {}
+        self.effects: dict[str, EffectsDelta] = {}
+
+    def __bool__(self):
+        return self.order is not None or bool(self.removed or self.avatars or self.effects)
+
+
+class StateDelta:
+    """
+    Changes between two snapshots of a state: avatars and effects that were added, removed or had their datagram
+    or ForkedAttributes (such as the turns left of Encore) changed, and the new avatar order. Applying the delta to
+    a state equal to the first snapshot makes it equal to the second; to_bytes() gives the compact form
+    (see common/wire.py) for sending it elsewhere.
+    """
+
+    def __init__(self):
+        self.allocated: Optional[int] = None
+        self.effects: EffectsDelta = [], {}
+        self.holders = (HolderDelta(), HolderDelta())
+
+    def __bool__(self):
+        return self.allocated is not None or bool(self.effects != ([], {}) or any(self.holders))
+
+    @staticmethod
+    def diff_effects(before: EffectsSnapshot, after: EffectsSnapshot) -> EffectsDelta:
+        removed = [child_id for child_id in before if child_id not in after]
+        changed = {
+            child_id: state
+            for child_id, state in after.items()
+            if child_id not in before or before[child_id] != state
+        }
+        return removed, changed
+
+    @classmethod
+    def diff(cls, before: Snapshot, after: Snapshot) -> "StateDelta":
+        delta = cls()
+        if before.allocated != after.allocated:
+            delta.allocated = after.allocated
+        delta.effects = cls.diff_effects(before.effects, after.effects)
+
+        for holder, (order, avatars), (new_order, new_avatars) in zip(delta.holders, before.holders, after.holders):
+            if order != new_order:
+                holder.order = new_order
+            holder.removed = [child_id for child_id in avatars if child_id not in new_avatars]
+            for child_id, (state, effects) in new_avatars.items():
+                old_state, old_effects = avatars.get(child_id, (None, {}))
+                if child_id not in avatars or old_state != state:
+                    holder.avatars[child_id] = state
+                effects_delta = cls.diff_effects(old_effects, effects)
+                if effects_delta != ([], {}):
+                    holder.effects[child_id] = effects_delta
+        return delta
+
+    @staticmethod
+    def apply_effects(controller: StatusEffectController, delta: EffectsDelta):
+        removed, changed = delta
+        for child_id in removed:
+            controller.remove(controller[child_id])
+        for child_id, (datagram, values) in changed.items():
+            effect = controller.children.get(child_id)
+            if effect is None:
+                effect = controller.create(child_id)
+            effect.datagram = datagram
+            set_attributes(effect, values)
+        if changed:
+            controller.touch()
+
+    def apply(self, state: "CalculationState"):
+        for holder, delta in zip((state.toons, state.cogs), self.holders):
+            for child_id in delta.removed:
+                holder.remove(holder.children[child_id])
+            for child_id, (datagram, values) in delta.avatars.items():
+                avatar = holder.children.get(child_id)
+                if avatar is None:
+                    avatar = holder.registry.create_and_insert(
+                        holder.subclass_id, holder, child_id, avatar_id=child_id
+                    )
+                avatar.datagram = datagram
+                set_attributes(avatar, values)
+            for child_id, effects in delta.effects.items():
+                self.apply_effects(holder.children[child_id].effects, effects)
+            if delta.order is not None:
+                holder.datagram = list(delta.order)
+
+        self.apply_effects(state.effects, self.effects)
+        if self.allocated is not None:
+            state.LatestAllocatedID = self.allocated
+
+    @staticmethod
+    def write_effects(writer: Writer, delta: EffectsDelta):
+        removed, changed = delta
+        writer.varint(len(removed))
+        for child_id in removed:
+            writer.varint(int(child_id))
+        writer.varint(len(changed))
+        for child_id, (datagram, values) in changed.items():
+            writer.varint(int(child_id))
+            writer.value(datagram)
+            writer.value(values)
+
+    @staticmethod
+    def read_effects(reader: Reader) -> EffectsDelta:
+        removed = [str(reader.varint()) for _ in range(reader.varint())]
+        changed = {str(reader.varint()): (reader.value(), reader.value()) for _ in range(reader.varint())}
+        return removed, changed
+
+    def to_bytes(self) -> bytes:
+        writer = Writer()
+        writer.buffer += DeltaMagic
+        writer.varint(DeltaVersion)
+        # 0 when unchanged
+        writer.varint(0 if self.allocated is None else self.allocated + 1)
+        self.write_effects(writer, self.effects)
+        for holder in self.holders:
+            writer.varint(0 if holder.order is None else len(holder.order) + 1)
+            for child_id in holder.order or ():
+                writer.varint(int(child_id))
+            writer.varint(len(holder.removed))
+            for child_id in holder.removed:
+                writer.varint(int(child_id))
+            writer.varint(len(holder.avatars))
+            for child_id, ((_, *datagram), values) in holder.avatars.items():
+                # avatar datagrams start with the avatar ID, which is the child ID
+                writer.varint(int(child_id))
+                writer.value(datagram)
+                writer.value(values)
+            writer.varint(len(holder.effects))
+            for child_id, effects in holder.effects.items():
+                writer.varint(int(child_id))
+                self.write_effects(writer, effects)
+        return bytes(writer.buffer)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StateDelta":
+        if bytes(data[: len(DeltaMagic)]) != DeltaMagic:
+            raise WireError("Not an encoded delta")
+        reader = Reader(data)
+        reader.offset = len(DeltaMagic)
+        if (version := reader.varint()) != DeltaVersion:
+            raise WireError(f"Unsupported delta version {version}")
+
+        delta = cls()
+        if allocated := reader.varint():
+            delta.allocated = allocated - 1
+        delta.effects = cls.read_effects(reader)
+        for holder in delta.holders:
+            if size := reader.varint():
+                holder.order = [str(reader.varint()) for _ in range(size - 1)]
+            holder.removed = [str(reader.varint()) for _ in range(reader.varint())]
+            for _ in range(reader.varint()):
+                child_id = str(reader.varint())
+                holder.avatars[child_id] = (child_id, *reader.value()), reader.value()
+            for _ in range(reader.varint()):
+                child_id = str(reader.varint())
+                holder.effects[child_id] = cls.read_effects(reader)
+        if reader.offset != len(data):
+            raise WireError("Trailing data after the delta")
+        return delta
+
+
+class DeltaRecorder:
+    """
+    Records the changes made to a state while active; use as `with state.record() as recorder: ...`,
+    the result is in recorder.delta.
+    """
+
+    def __init__(self, state: "CalculationState"):
+        self.state = state
+        self.before: Optional[Snapshot] = None
+        self.delta: Optional[StateDelta] = None
+
+    def __enter__(self) -> "DeltaRecorder":
+        self.before = Snapshot(self.state)
+        self.delta = None
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.delta = StateDelta.diff(self.before, Snapshot(self.state))
+        self.before = None
@@ -0,0 +1,417 @@
+"""
+Append-only binary log of battles as they are played, and a memory-mapped reader for it.
+
+While a state is recorded (`with log.battle(state): ...`), the state writes a record for every emitted event,
+every deal_damage result, every effect created, stacked or removed, and every random draw and roll. The state is
+also written whole (see common/wire.py) when the recording starts, after every ToonsMoved and CogsMoved emission,
+and when it ends, so reading a turn back never needs the events before it.
+
+Layout (counts and IDs are unsigned LEB128 varints, avatar ID 0 stands for the state itself or no avatar):
+
+    magic "TL", format version
+    records: kind (one byte), payload size, payload
+
+    Battle      encoded state
+    Checkpoint  event ID, encoded state
+    End         encoded state
+    Event       event ID, subject avatar ID, author avatar ID
+    Damage      avatar ID, damage (tagged value), health afterwards (tagged value)
+    Effect      avatar ID, effect ID, datagram (tagged value), for created and stacked effects
+    Removed     avatar ID, effect ID
+    Draw        float64
+    Roll        float64 chance, one byte hit
+
+A log can hold any number of battles and only ever grows; a record cut off by a crash is ignored by the reader,
+and cut off the file when an EventLog opens it again, so that new records follow the last complete one.
+Forks of a recorded state are recorded too, so run_gags_exact and the planners should not run while recording.
+Only one EventLog should append to a file at a time.
+"""
+import mmap
+import os
+from collections import Counter
+from typing import Iterator, Optional, Type, TYPE_CHECKING, TypeVar
+
+from toonbattle.calculator.common.fork import ForkedAttributes
+from toonbattle.calculator.common.wire import (
+    Float64,
+    Magic as StateMagic,
+    Reader,
+    Version as StateVersion,
+    WireError,
+    Writer,
+)
+from toonbattle.calculator.helpers.enums import Events
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import CalculationState
+
+LogMagic = b"TL"
+LogVersion = 1
+FlushSize = 1 << 16
+
+RecordBattle, RecordCheckpoint, RecordEnd, RecordEvent, RecordDamage, RecordEffect, RecordRemoved = range(7)
+RecordDraw, RecordRoll = range(7, 9)
+# events after which the whole state is written
+TurnEvents = (Events.ToonsMoved, Events.CogsMoved)
+
+S = TypeVar("S", bound="CalculationState")
+
+
+def avatar_key(obj) -> int:
+    avatar_id = getattr(obj, "avatar_id", None)
+    return int(avatar_id) if avatar_id is not None else 0
+
+
+class EventLog:
+    """
+    Use as a context manager (or call close()), records are buffered until then or until FlushSize is reached.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path):
+            with Replay(path) as replay:
+                complete = replay.complete
+            if complete < os.path.getsize(path):
+                os.truncate(path, complete)
+        self.file = open(path, "ab")
+        self.buffer = Writer()
+        if self.file.tell() == 0:
+            self.buffer.buffer += LogMagic
+            self.buffer.varint(LogVersion)
+        self.payload = Writer()
+        self.battles = 0
+
+    def __enter__(self) -> "EventLog":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def battle(self, state: "CalculationState") -> "BattleRecording":
+        return BattleRecording(self, state)
+
+    def flush(self):
+        if self.buffer.buffer:
+            self.file.write(self.buffer.buffer)
+            self.file.flush()
+            self.buffer.buffer.clear()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def write(self, kind: int):
+        """Appends the record built in self.payload."""
+        payload = self.payload.buffer
+        self.buffer.buffer.append(kind)
+        self.buffer.varint(len(payload))
+        self.buffer.buffer += payload
+        payload.clear()
+        if len(self.buffer.buffer) >= FlushSize:
+            self.flush()
+
+    def state(self, kind: int, state: "CalculationState", event: Optional[int] = None):
+        if event is not None:
+            self.payload.varint(event)
+        self.payload.buffer += state.to_bytes()
+        self.write(kind)
+
+    # called by the recorded state
+
+    def event(self, event: int, subject=None, author=None):
+        self.payload.varint(event)
+        self.payload.varint(avatar_key(subject))
+        self.payload.varint(avatar_key(author))
+        self.write(RecordEvent)
+
+    def damage(self, avatar, damage: float, health: int):
+        self.payload.varint(avatar_key(avatar))
+        self.payload.value(damage)
+        self.payload.value(health)
+        self.write(RecordDamage)
+
+    def effect(self, owner, effect):
+        self.payload.varint(avatar_key(owner))
+        self.payload.varint(int(effect.object_type))
+        self.payload.value(effect.datagram)
+        self.write(RecordEffect)
+
+    def removed(self, owner, effect):
+        self.payload.varint(avatar_key(owner))
+        self.payload.varint(int(effect.object_type))
+        self.write(RecordRemoved)
+
+    def draw(self, value: float):
+        self.payload.buffer += Float64.pack(value)
+        self.write(RecordDraw)
+
+    def roll(self, chance: float, hit: bool):
+        self.payload.buffer += Float64.pack(chance)
+        self.payload.buffer.append(hit)
+        self.write(RecordRoll)
+
+
+class BattleRecording:
+    def __init__(self, log: EventLog, state: "CalculationState"):
+        self.log = log
+        self.state = state
+
+    def __enter__(self) -> "CalculationState":
+        if self.state.event_log is not None:
+            raise RuntimeError("The state is already recorded")
+        self.log.state(RecordBattle, self.state)
+        self.log.battles += 1
+        self.state.event_log = self.log
+        return self.state
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.state.event_log = None
+        self.log.state(RecordEnd, self.state)
+
+
+class LoggedAvatar:
+    __slots__ = ("avatar_id", "datagram", "attributes", "effects")
+
+    def __init__(self, avatar_id: int, datagram: tuple, attributes: dict[str, object], effects: dict[int, object]):
+        self.avatar_id = avatar_id
+        self.datagram = datagram
+        # ForkedAttributes the avatar has, such as the executive flag and level of cogs
+        self.attributes = attributes
+        self.effects = effects
+
+    def __repr__(self):
+        return f"LoggedAvatar({self.avatar_id}, {self.health}/{self.max_health})"
+
+    @property
+    def health(self) -> int:
+        return self.datagram[1]
+
+    @property
+    def max_health(self) -> int:
+        return self.datagram[2]
+
+
+class LoggedState:
+    """The avatars and effects of an encoded state as plain datagrams, read without building a state."""
+
+    def __init__(self, data: bytes):
+        if bytes(data[: len(StateMagic)]) != StateMagic:
+            raise WireError("Not an encoded battle")
+        reader = Reader(data)
+        reader.offset = len(StateMagic)
+        if (version := reader.varint()) != StateVersion:
+            raise WireError(f"Unsupported format version {version}")
+        self.allocated = reader.varint()
+        self.effects = self.read_effects(reader)
+        self.toons = self.read_holder(reader)
+        self.cogs = self.read_holder(reader)
+
+    def __repr__(self):
+        return f"LoggedState(toons={self.toons}, cogs={self.cogs})"
+
+    @staticmethod
+    def read_effects(reader: Reader) -> dict[int, object]:
+        effects = {}
+        for _ in range(reader.varint()):
+            effects[reader.varint()] = reader.value()
+            reader.value()  # attributes
+        return effects
+
+    def read_holder(self, reader: Reader) -> list[LoggedAvatar]:
+        reader.varint()  # registry ID of the avatars
+        avatars = []
+        for _ in range(reader.varint()):
+            avatar_id = reader.varint()
+            datagram = (str(avatar_id), *reader.value())
+            attributes = {name: value for name, value in zip(ForkedAttributes, reader.value()) if value is not None}
+            avatars.append(LoggedAvatar(avatar_id, datagram, attributes, self.read_effects(reader)))
+        return avatars
+
+
+class LoggedBattle:
+    __slots__ = ("start", "end", "turns", "finished")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.end = start
+        # offsets of the state record of every turn, the first one is the Battle record
+        self.turns = [start]
+        self.finished = False
+
+
+class Replay:
+    """
+    Reads an event log through a memory map. Battles and turns are indexed on opening by skipping from header
+    to header; records are only decoded when they are asked for. A turn ends with its ToonsMoved emission,
+    or with the CogsMoved emission after it (see play_round), and turn 0 is the state the recording started with.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map: Optional[mmap.mmap] = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.data = memoryview(self.map) if self.map is not None else memoryview(b"")
+        self.battles: list[LoggedBattle] = []
+        self.truncated = False
+        # size of the log up to the end of its last complete record
+        self.complete = 0
+        self.index()
+
+    def __enter__(self) -> "Replay":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.battles)
+
+    def close(self):
+        if self.file is not None:
+            self.data.release()
+            if self.map is not None:
+                self.map.close()
+            self.file.close()
+            self.file = None
+
+    def headers(self, start: Optional[int] = None, end: Optional[int] = None) -> Iterator[tuple[int, int, int, int]]:
+        """(offset, kind, payload start, payload end) of every complete record."""
+        reader = Reader(self.data)
+        reader.offset = self.body if start is None else start
+        end = len(self.data) if end is None else end
+        while reader.offset < end:
+            offset = reader.offset
+            try:
+                kind = reader.byte()
+                size = reader.varint()
+            except WireError:
+                self.truncated = True
+                return
+            if reader.offset + size > len(self.data):
+                self.truncated = True
+                return
+            yield offset, kind, reader.offset, reader.offset + size
+            reader.offset += size
+
+    def index(self):
+        if not len(self.data):
+            self.body = 0
+            return
+        if bytes(self.data[: len(LogMagic)]) != LogMagic:
+            raise WireError("Not an event log")
+        reader = Reader(self.data)
+        reader.offset = len(LogMagic)
+        if (version := reader.varint()) != LogVersion:
+            raise WireError(f"Unsupported log version {version}")
+        self.body = reader.offset
+
+        battle: Optional[LoggedBattle] = None
+        for offset, kind, start, end in self.headers():
+            if kind == RecordBattle:
+                battle = LoggedBattle(offset)
+                self.battles.append(battle)
+            elif battle is None:
+                raise WireError("Record outside of a battle")
+            elif kind == RecordCheckpoint:
+                reader = Reader(self.data[:end])
+                reader.offset = start
+                if reader.varint() == Events.ToonsMoved:
+                    battle.turns.append(offset)
+                else:
+                    battle.turns[-1] = offset
+            elif kind == RecordEnd:
+                battle.finished = True
+            battle.end = end
+        self.complete = self.battles[-1].end if self.battles else self.body
+
+    def turns(self, battle: int) -> int:
+        """Number of turns played in the battle, the states of turns 0 to turns() can be read."""
+        return len(self.battles[battle].turns) - 1
+
+    def state_bytes(self, battle: int, turn: int = -1) -> bytes:
+        """The encoded state of the battle after the turn, by default after the last one."""
+        offset = self.battles[battle].turns[turn]
+        for _, kind, start, end in self.headers(offset):
+            # the encoded state is the last field of Battle and Checkpoint records
+            return self.decode(kind, start, end)[-1]
+        raise WireError("Missing state record")
+
+    def state(self, battle: int, turn: int = -1) -> LoggedState:
+        return LoggedState(self.state_bytes(battle, turn))
+
+    def final(self, battle: int) -> LoggedState:
+        """The state when the recording ended, which includes gags run after the last turn."""
+        logged = self.battles[battle]
+        if not logged.finished:
+            return self.state(battle)
+        for _, kind, start, end in self.headers(logged.turns[-1], logged.end):
+            if kind == RecordEnd:
+                return LoggedState(bytes(self.data[start:end]))
+        raise WireError("Missing end record")
+
+    def restore(self, battle: int, turn: int = -1, state_class: Type[S] = None) -> S:
+        """
+        Builds a state of `state_class` (ClashState by default) equal to the battle after the turn, with the same
+        fingerprint: checkpoints hold the attributes that datagrams leave out too (see common/wire.py).
+        """
+        if state_class is None:
+            from toonbattle.calculator.common.state import ClashState as state_class
+        return state_class.from_bytes(self.state_bytes(battle, turn))
+
+    def records(self, battle: Optional[int] = None, kinds: Optional[tuple[int, ...]] = None) -> Iterator[tuple]:
+        """
+        Decoded records of one battle or of the whole log as (kind, *fields), states as encoded bytes.
+        Only records of `kinds` are decoded when given.
+        """
+        if battle is None:
+            headers = self.headers()
+        else:
+            headers = self.headers(self.battles[battle].start, self.battles[battle].end)
+        for _, kind, start, end in headers:
+            if kinds is None or kind in kinds:
+                yield self.decode(kind, start, end)
+
+    def decode(self, kind: int, start: int, end: int) -> tuple:
+        reader = Reader(self.data[:end])
+        reader.offset = start
+        if kind in (RecordBattle, RecordEnd):
+            return kind, bytes(self.data[start:end])
+        if kind == RecordCheckpoint:
+            event = reader.varint()
+            return kind, Events(event), bytes(self.data[reader.offset : end])
+        if kind == RecordEvent:
+            return kind, Events(reader.varint()), reader.varint(), reader.varint()
+        if kind == RecordDamage:
+            return kind, reader.varint(), reader.value(), reader.value()
+        if kind == RecordEffect:
+            return kind, reader.varint(), reader.varint(), reader.value()
+        if kind == RecordRemoved:
+            return kind, reader.varint(), reader.varint()
+        if kind == RecordDraw:
+            return kind, reader.fixed(Float64)
+        if kind == RecordRoll:
+            return kind, reader.fixed(Float64), bool(reader.byte())
+        raise WireError(f"Unknown record kind {kind}")
+
+    # aggregates over the whole log
+
+    def event_counts(self) -> Counter:
+        return Counter(record[1] for record in self.records(kinds=(RecordEvent,)))
+
+    def damage_taken(self) -> Counter:
+        """Total damage by avatar ID, over every battle."""
+        totals = Counter()
+        for _, avatar_id, damage, _ in self.records(kinds=(RecordDamage,)):
+            totals[avatar_id] += damage
+        return totals
+
+    def hit_rate(self) -> Optional[float]:
+        rolls = hits = 0
+        for _, _, hit in self.records(kinds=(RecordRoll,)):
+            rolls += 1
+            hits += hit
+        return hits / rolls if rolls else None
@@ -0,0 +1,82 @@
+"""
+Canonical fingerprints of battle states.
+
+Two states have the same fingerprint when they have the same type and ruleset (name, rule modules and the digest of
+the engine and rule sources, so results cached on disk are not reused once a rule table changes), the same avatars
+in the same order with the same datagrams (ID, health, maximum health, defense) and ForkedAttributes (executive,
+level), and the same effects with the same datagrams and ForkedAttributes (turns left, which Encore keeps outside
+of its datagram). The summary of the effects of an avatar is kept on its controller and only rebuilt when the
+controller's version changes, which create_effect, effect removal and turn ticks bump; the avatar fields themselves
+are a handful of numbers which are read and hashed again on every call (the fingerprint is not maintained
+incrementally), so they can be set directly.
+"""
+import hashlib
+from typing import TYPE_CHECKING
+
+from toonbattle.calculator.common.fork import attributes
+from toonbattle.calculator.common.outcomes import freeze
+from toonbattle.calculator.common.status_effects import StatusEffectController
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.avatar import Avatar
+    from toonbattle.calculator.common.state import CalculationState
+
+DigestSize = 16
+
+
+def effects_key(controller: StatusEffectController) -> tuple:
+    cached = controller.fingerprint_cache
+    if cached is not None and cached[0] == controller.version:
+        return cached[1]
+
+    key = tuple(
+        sorted(
+            (int(child_id), freeze(effect.datagram), attributes(effect))
+            for child_id, effect in controller.children.items()
+        )
+    )
+    controller.fingerprint_cache = controller.version, key
+    return key
+
+
+def avatar_key(avatar: "Avatar") -> tuple:
+    return freeze(avatar.datagram), attributes(avatar), effects_key(avatar.effects)
+
+
+def ruleset_key(state: "CalculationState") -> tuple:
+    rules = state.Rules
+    if rules is None:
+        return (type(state).__name__,)
+    return type(state).__name__, rules.name, rules.modules, rules.load().digest
+
+
+def canonical(state: "CalculationState") -> tuple:
+    """Hashable form of everything the fingerprint covers, built again from the avatars on every call."""
+    return (
+        ruleset_key(state),
+        tuple(avatar_key(toon) for toon in state.toons),
+        tuple(avatar_key(cog) for cog in state.cogs),
+        effects_key(state.effects),
+    )
+
+
+def digest(value) -> bytes:
+    return hashlib.blake2b(repr(value).encode(), digest_size=DigestSize).digest()
+
+
+def fingerprint(state: "CalculationState") -> bytes:
+    return digest(canonical(state))
+
+
+def gag_part(part):
+    if isinstance(part, (tuple, list)):
+        return tuple(gag_part(item) for item in part)
+    return int(part) if isinstance(part, int) else part
+
+
+def gag_key(pregags) -> tuple:
+    """
+    Gag tuples with enums and flags as plain integers, so equal plans give equal keys however they were written.
+    Avatar IDs (strings) and positions (integers) stay apart, as they do in AvatarHolder.
+    """
+    return tuple(gag_part(gag) for gag in pregags)
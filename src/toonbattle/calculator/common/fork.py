@@ -0,0 +1,113 @@
+from typing import Any, Sequence, TYPE_CHECKING
+
+from toonbattle.calculator.common.status_effects import StatusEffectController
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.avatar import AvatarHolder
+    from toonbattle.calculator.common.state import CalculationState
+
+# state which changes during a battle but is not part of every class's datagram
+ForkedAttributes = ("turns", "executive", "level")
+
+ObjectRecord = tuple[Any, Any, dict[str, Any]]
+
+
+def attributes(obj) -> tuple:
+    """The ForkedAttributes of an object in order, None for the ones it does not have."""
+    return tuple(getattr(obj, name, None) for name in ForkedAttributes)
+
+
+def set_attributes(obj, values: Sequence):
+    for name, value in zip(ForkedAttributes, values):
+        if value is not None and hasattr(obj, name):
+            setattr(obj, name, value)
+
+
+def record(obj) -> ObjectRecord:
+    return obj, obj.datagram, {name: getattr(obj, name) for name in ForkedAttributes if hasattr(obj, name)}
+
+
+def restore(obj, datagram, attributes: dict[str, Any]) -> bool:
+    changed = obj.datagram != datagram
+    if changed:
+        obj.datagram = datagram
+    for name, value in attributes.items():
+        if getattr(obj, name) != value:
+            setattr(obj, name, value)
+            changed = True
+    return changed
+
+
+class StateFork:
+    """
+    Checkpoint of a CalculationState which can be rolled back.
+
+    Forking only records references and scalar fields, nothing is copied: the branch runs on the state itself,
+    sharing every avatar and effect with the parent. Rolling back writes back the fields that changed,
+    and drops avatars and effects created in the branch. Avatars and effects removed while a fork is active are
+    only detached, so rolling back attaches the same objects again and references to them stay valid; they are
+    cleaned up (or pooled) once the outermost fork is rolled back.
+    Forks can be nested as long as they are rolled back in reverse order.
+    """
+
+    def __init__(self, state: "CalculationState"):
+        self.state = state
+        state.forks += 1
+        self.allocated = state.LatestAllocatedID
+        self.holders = [self.record_holder(holder) for holder in (state.toons, state.cogs)]
+        self.effects = self.record_effects(state.effects)
+
+    def __enter__(self) -> "CalculationState":
+        return self.state
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.restore()
+
+    @staticmethod
+    def record_effects(controller: StatusEffectController) -> dict[str, ObjectRecord]:
+        return {child_id: record(effect) for child_id, effect in controller.children.items()}
+
+    def record_holder(self, holder: "AvatarHolder"):
+        avatars = {
+            child_id: (record(avatar), self.record_effects(avatar.effects))
+            for child_id, avatar in holder.children.items()
+        }
+        return holder, list(holder.avatar_order), avatars
+
+    @staticmethod
+    def restore_effects(controller: StatusEffectController, effects: dict[str, ObjectRecord]):
+        for child_id, effect in list(controller.children.items()):
+            if child_id not in effects or effects[child_id][0] is not effect:
+                controller.remove(effect)
+
+        changed = False
+        for child_id, (effect, datagram, attributes) in effects.items():
+            if controller.children.get(child_id) is not effect:
+                controller.attach(child_id, effect)
+            changed |= restore(effect, datagram, attributes)
+        if changed:
+            controller.touch()
+
+    def restore(self):
+        for holder, order, avatars in self.holders:
+            for child_id, avatar in list(holder.children.items()):
+                if child_id not in avatars or avatars[child_id][0][0] is not avatar:
+                    holder.remove(avatar)
+
+            for child_id, ((avatar, datagram, attributes), effects) in avatars.items():
+                if holder.children.get(child_id) is not avatar:
+                    holder.attach(child_id, avatar)
+                restore(avatar, datagram, attributes)
+                self.restore_effects(avatar.effects, effects)
+            holder.datagram = list(order)
+
+        self.restore_effects(self.state.effects, self.effects)
+        self.state.LatestAllocatedID = self.allocated
+
+        self.state.forks -= 1
+        if not self.state.forks:
+            self.state.effects.release_detached()
+            for holder, _, _ in self.holders:
+                holder.release_detached()
+                for avatar in holder.children.values():
+                    avatar.effects.release_detached()
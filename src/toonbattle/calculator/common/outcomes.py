@@ -0,0 +1,136 @@
+from typing import Callable, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import CalculationState
+
+
+def freeze(value):
+    """Turns a datagram into something hashable (lists become tuples, dicts become sorted item tuples)."""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(x) for x in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), freeze(v)) for k, v in value.items()))
+    return value
+
+
+def effects_of(holder) -> tuple:
+    """Hashable summary of the effects of an avatar (or of the state itself)."""
+    return tuple(sorted((str(k), freeze(getattr(v, "datagram", None))) for k, v in holder.effects.children.items()))
+
+
+def snapshot(state: "CalculationState") -> tuple:
+    """Hashable summary of everything a turn can change: avatar order, health and effects."""
+
+    def avatars_of(holder) -> tuple:
+        return tuple((str(av.avatar_id), av.health, effects_of(av)) for av in holder)
+
+    return avatars_of(state.toons), avatars_of(state.cogs), effects_of(state)
+
+
+class ScriptedRolls:
+    """
+    Replacement for the random roll of Attack.hit which follows a fixed list of decisions.
+    Every roll with 0 < chance < 1 is a branch point; once the script runs out the roll defaults to a hit.
+    """
+
+    def __init__(self, script: tuple[bool, ...]):
+        self.script = script
+        self.branches: list[tuple[float, bool]] = []
+
+    def __call__(self, chance: float) -> bool:
+        if chance <= 0:
+            return False
+        if chance >= 1:
+            return True
+
+        index = len(self.branches)
+        decision = self.script[index] if index < len(self.script) else True
+        self.branches.append((chance, decision))
+        return decision
+
+    @property
+    def probability(self) -> float:
+        value = 1.0
+        for chance, decision in self.branches:
+            value *= chance if decision else 1 - chance
+        return value
+
+
+class Outcome:
+    probability: float
+    health: dict[str, int]
+    effects: dict[str, dict[str, object]]
+
+    def __init__(self, key: tuple, probability: float):
+        self.key = key
+        self.probability = probability
+        toons, cogs, _ = key
+        self.health = {avid: health for avid, health, _ in toons + cogs}
+        self.effects = {avid: dict(effects) for avid, _, effects in toons + cogs}
+
+    def dead(self, avatar_id) -> bool:
+        return self.health.get(str(avatar_id), 0) <= 0
+
+    def __repr__(self):
+        return f"Outcome({self.probability:.4f}, {self.health})"
+
+
+class OutcomeDistribution:
+    """Exact probability distribution over the states a turn can end in."""
+
+    outcomes: list[Outcome]
+    evaluations: int
+
+    def __init__(self, outcomes: list[Outcome], evaluations: int):
+        self.outcomes = sorted(outcomes, key=lambda o: -o.probability)
+        self.evaluations = evaluations
+
+    def __iter__(self) -> Iterator[Outcome]:
+        return iter(self.outcomes)
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def __repr__(self):
+        return f"OutcomeDistribution({len(self.outcomes)} outcomes, {self.evaluations} evaluations)"
+
+    def probability(self, predicate: Callable[[Outcome], bool]) -> float:
+        return sum(o.probability for o in self.outcomes if predicate(o))
+
+    def kill_probability(self, *avatar_ids) -> float:
+        return self.probability(lambda o: all(o.dead(avid) for avid in avatar_ids))
+
+    def expected_health(self, avatar_id) -> float:
+        return sum(o.probability * o.health[str(avatar_id)] for o in self.outcomes)
+
+
+def enumerate_outcomes(state: "CalculationState", *pregags: tuple, use: bool = False) -> OutcomeDistribution:
+    """
+    Runs the gags on forks of the state once per distinct sequence of hit/miss decisions (depth-first),
+    merging branches that end in identical states. The state is rolled back after every branch.
+    """
+    merged: dict[tuple, float] = {}
+    pending: list[tuple[bool, ...]] = [()]
+    evaluations = 0
+    roll_hook = state.roll_hook
+    while pending:
+        script = pending.pop()
+        rolls = state.roll_hook = ScriptedRolls(script)
+        try:
+            with state.fork():
+                if use:
+                    state.use_gags(*pregags)
+                else:
+                    state.run_gags(*pregags)
+                key = snapshot(state)
+        finally:
+            state.roll_hook = roll_hook
+        evaluations += 1
+
+        # every branch point first explored by this run still has its miss side left to explore
+        decisions = tuple(decision for _, decision in rolls.branches)
+        for index in range(len(script), len(rolls.branches)):
+            pending.append(decisions[:index] + (False,))
+        merged[key] = merged.get(key, 0.0) + rolls.probability
+
+    return OutcomeDistribution([Outcome(key, p) for key, p in merged.items()], evaluations)
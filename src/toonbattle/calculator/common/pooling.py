@@ -0,0 +1,46 @@
+"""
+Free lists of detached calculation objects.
+
+run_gags builds a GagController with one GagDefinition per merged track, and every hit creates a Stun effect which
+expires at the end of the turn. Instead of being cleaned up and created again through the registry, such objects
+are detached from the tree when they are done (so they receive no events) and kept on a free list of their parent.
+Acquiring one attaches it again and runs its reset hook: GagDefinition.construct for gags, StatusEffect.reset for
+effects, which must set every field that __init__ sets. An object is only ever attached again under the parent
+it was created for, so nothing fixed at creation has to be reset.
+"""
+from typing import Any, Optional
+
+MaxPooled = 16
+
+
+class FreeList:
+    __slots__ = ("objects", "limit", "reused")
+
+    def __init__(self, limit: int = MaxPooled):
+        self.objects: dict[Any, list] = {}
+        self.limit = limit
+        self.reused = 0
+
+    def __len__(self):
+        return sum(len(objects) for objects in self.objects.values())
+
+    def acquire(self, key) -> Optional[Any]:
+        objects = self.objects.get(key)
+        if not objects:
+            return None
+        self.reused += 1
+        return objects.pop()
+
+    def release(self, key, obj) -> bool:
+        """False when the list of `key` is full, the caller should clean the object up then."""
+        objects = self.objects.setdefault(key, [])
+        if len(objects) >= self.limit:
+            return False
+        objects.append(obj)
+        return True
+
+    def clear(self):
+        for objects in self.objects.values():
+            for obj in objects:
+                obj.cleanup()
+        self.objects.clear()
@@ -0,0 +1,159 @@
+"""
+Opt-in instrumentation of the calculate/emit/replace dispatch.
+
+Nothing is hooked until a Profiler is started, so a battle which is not profiled runs exactly the same code.
+While started, the profiler watches calls in the current thread (sys.setprofile) for two kinds of frames:
+
+* sections: a call from this package into a dispatcher (pycluster, or a method marked with @dispatcher)
+  which receives a MathTargets (calculate), Events (emit) or ReplaceTargets (a @replaceable method) value;
+* handlers: a call from a dispatcher back into this package while a section is open,
+  named after the class of the object handling it, e.g. `EffectLured.replace_damage`.
+
+Times are inclusive wall time measured with the profiler active, so they are inflated,
+but they can be compared with each other.
+"""
+import os
+import sys
+import time
+from typing import Callable, Optional, TYPE_CHECKING
+
+import pycluster.messenger.cluster
+from pycluster.messenger.cluster import MessageCluster
+
+from toonbattle.calculator.helpers import decorators
+from toonbattle.calculator.helpers.enums import Events, MathTargets, ReplaceTargets
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import CalculationState
+
+SectionKinds = {MathTargets: "calculate", Events: "emit", ReplaceTargets: "replace"}
+PackageDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DispatcherDir = os.path.dirname(os.path.dirname(os.path.abspath(pycluster.messenger.cluster.__file__)))
+DecoratorsFile = decorators.__file__
+DispatchCodes = set()
+
+
+def dispatcher(func: Callable) -> Callable:
+    """Marks a method of this package which calls handlers itself, so the profiler attributes them."""
+    DispatchCodes.add(func.__code__)
+    return func
+
+
+class ProfiledCall:
+    def __init__(self, frame, label: str, counter: list, started: float):
+        self.frame = frame
+        self.label = label
+        self.counter = counter
+        self.started = started
+        self.children = 0.0
+
+
+class Profiler:
+    """
+    Counts and times the dispatch of one battle. Use as `with state.profile() as profiler: ...`,
+    then read profiler.summary() or profiler.collapsed().
+    Only one profiler can be active per thread, and it sees every battle running in that thread.
+    """
+
+    def __init__(self, state: "CalculationState"):
+        self.state = state
+        self.sections: dict[str, dict[str, list[float]]] = {kind: {} for kind in SectionKinds.values()}
+        self.handlers: dict[str, list[float]] = {}
+        self.stacks: dict[tuple[str, ...], float] = {}
+        self.stack: list[ProfiledCall] = []
+        self.previous = None
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        self.previous = sys.getprofile()
+        sys.setprofile(self.trace)
+
+    def stop(self):
+        sys.setprofile(self.previous)
+        self.previous = None
+        self.stack.clear()
+
+    @staticmethod
+    def owner(frame):
+        code = frame.f_code
+        return frame.f_locals.get(code.co_varnames[0]) if code.co_argcount else None
+
+    def section(self, frame) -> Optional[tuple[str, str]]:
+        owner = self.owner(frame)
+        if isinstance(owner, MessageCluster) and owner is not self.state:
+            return None  # another battle running in the same thread
+
+        for value in frame.f_locals.values():
+            kind = SectionKinds.get(type(value))
+            if kind is not None:
+                return kind, value.name
+        return None
+
+    @staticmethod
+    def handler(frame) -> str:
+        local_vars = frame.f_locals
+        code = frame.f_code
+        if code.co_filename == DecoratorsFile and "func" in local_vars:
+            # check_source: name the handler it wraps
+            return f"{type(local_vars.get('obj')).__name__}.{local_vars['func'].__name__}"
+        if code.co_argcount:
+            return f"{type(Profiler.owner(frame)).__name__}.{code.co_name}"
+        return code.co_name
+
+    def trace(self, frame, event: str, arg):
+        if event == "call":
+            caller = frame.f_back
+            if caller is None:
+                return
+            code = frame.f_code
+            in_dispatcher = code in DispatchCodes or code.co_filename.startswith(DispatcherDir)
+            caller_in_dispatcher = caller.f_code in DispatchCodes or caller.f_code.co_filename.startswith(DispatcherDir)
+            if in_dispatcher and not caller_in_dispatcher and caller.f_code.co_filename.startswith(PackageDir):
+                section = self.section(frame)
+                if section is None:
+                    return
+                kind, name = section
+                self.push(frame, f"{kind}:{name}", self.sections[kind].setdefault(name, [0, 0.0]))
+            elif self.stack and caller_in_dispatcher and not in_dispatcher and code.co_filename.startswith(PackageDir):
+                if caller.f_code in DispatchCodes and self.owner(frame) is self.owner(caller):
+                    return  # a helper of the dispatcher, not a handler
+                label = self.handler(frame)
+                self.push(frame, label, self.handlers.setdefault(label, [0, 0.0]))
+        elif event == "return" and self.stack and self.stack[-1].frame is frame:
+            self.pop()
+
+    def push(self, frame, label: str, counter: list):
+        self.stack.append(ProfiledCall(frame, label, counter, time.perf_counter()))
+
+    def pop(self):
+        entry = self.stack[-1]
+        elapsed = time.perf_counter() - entry.started
+        path = tuple(item.label for item in self.stack)
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1].children += elapsed
+
+        entry.counter[0] += 1
+        entry.counter[1] += elapsed
+        self.stacks[path] = self.stacks.get(path, 0.0) + elapsed - entry.children
+
+    def summary(self) -> dict:
+        """Count and total seconds of every section (by kind and target) and every handler, slowest first."""
+
+        def ordered(counters: dict[str, list[float]]) -> dict[str, dict]:
+            items = sorted(counters.items(), key=lambda item: -item[1][1])
+            return {name: {"count": count, "time": total} for name, (count, total) in items}
+
+        summary = {kind: ordered(counters) for kind, counters in self.sections.items()}
+        summary["handlers"] = ordered(self.handlers)
+        return summary
+
+    def collapsed(self) -> str:
+        """Self time of every stack in microseconds, in the collapsed format flamegraph tools read."""
+        return "\n".join(f"{';'.join(path)} {round(self_time * 1e6)}" for path, self_time in self.stacks.items())
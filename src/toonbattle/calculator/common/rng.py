@@ -0,0 +1,70 @@
+"""
+Reproducible random streams for simulations.
+
+Every CalculationState draws from its own `rng` (the global random module when unset).
+RandomStreams derives independent generators from one root seed and a key, such as a plan and
+trial index. The derivation is a hash, so a stream does not depend on which worker process
+creates it or on how many other streams were created before it.
+
+With common random numbers, trial t of every plan uses the same stream. Plans compared this way
+see identical sequences of draws, which removes most of the noise from their difference.
+"""
+import hashlib
+import random
+from typing import Any, Callable, Optional, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import CalculationState
+
+
+class RandomStreams:
+    def __init__(self, seed: Optional[int] = None, common: bool = False):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self.common = common
+
+    def stream(self, *key: int) -> random.Random:
+        digest = hashlib.blake2b(repr((self.seed, *key)).encode(), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, "little"))
+
+    def trial(self, trial: int, plan: int = 0) -> random.Random:
+        """Stream of one trial of one plan; with common random numbers, every plan shares the trial streams."""
+        if self.common:
+            return self.stream(trial)
+        return self.stream(trial, plan)
+
+
+def final_health(state: "CalculationState") -> tuple[int, ...]:
+    return tuple(cog.health for cog in state.cogs)
+
+
+def sample_plans(
+    state: "CalculationState",
+    plans: Sequence[Sequence[tuple]],
+    trials: int,
+    seed: Optional[int] = None,
+    common: bool = True,
+    evaluator: Callable[["CalculationState"], Any] = final_health,
+    use: bool = False,
+) -> list[list]:
+    """
+    Runs every plan `trials` times on forks of the state and returns evaluator(state) after each run,
+    one list per plan. By default trial t of every plan draws from the same stream (common random numbers).
+    """
+    streams = RandomStreams(seed, common)
+    run = state.use_gags if use else state.run_gags
+    rng = state.rng
+    results = []
+    try:
+        for plan_index, plan in enumerate(plans):
+            samples = []
+            for trial in range(trials):
+                state.rng = streams.trial(trial, plan_index)
+                with state.fork():
+                    run(*plan)
+                    samples.append(evaluator(state))
+            results.append(samples)
+    finally:
+        state.rng = rng
+    return results
@@ -0,0 +1,94 @@
+"""
+Rulesets: the modules which register the objects, effects and gags of one server's mechanics.
+
+A state class names its ruleset instead of importing those modules, and the ruleset is imported the first time a
+state of that class is created (or load() is called), so importing a state class or a helper module stays cheap.
+Once everything is registered, freeze() turns the registry tables read-only and precomputes the dispatch table
+of every registered class (see helpers/dispatch.py), which a worker process can do once before its first battle.
+It also raises UnroutedListener for classes whose module uses pycluster's @listen instead of helpers.dispatch.listen,
+whose events would otherwise silently never reach them.
+
+Loading also computes a digest of the sources of the engine and of the rule modules, which cached results are
+keyed on (see common/fingerprint.py), so changing a rule table or the engine does not reuse results computed
+with the old one.
+"""
+import hashlib
+import importlib
+import os
+from typing import Iterable, Optional, Sequence
+
+from pycluster.messenger.object_registry import ObjectRegistry
+
+from toonbattle.calculator.helpers.dispatch import check_listeners, filtered_handlers
+
+
+# every calculation and rule table of this package lives under it
+EnginePackage = "toonbattle.calculator"
+
+
+class RegistryFrozen(RuntimeError):
+    pass
+
+
+class FrozenTable(dict):
+    """Type ID to class table of a frozen registry; lookups are those of a dict, registering raises."""
+
+    def _frozen(self, *args, **kwargs):
+        raise RegistryFrozen("Cannot register objects in a frozen registry")
+
+    __setitem__ = __delitem__ = update = setdefault = pop = popitem = clear = _frozen
+
+
+def freeze_registry(registry: ObjectRegistry) -> ObjectRegistry:
+    if not isinstance(registry.objects, FrozenTable):
+        registry.objects = FrozenTable(registry.objects)
+    for cls in registry.objects.values():
+        check_listeners(cls)
+        filtered_handlers(cls)
+    return registry
+
+
+def source_digest(modules: Sequence[str]) -> bytes:
+    """Digest of the source files of EnginePackage and of `modules`, which have to be importable."""
+    engine = os.path.dirname(importlib.import_module(EnginePackage).__file__)
+    paths = {
+        os.path.join(root, name) for root, _, names in os.walk(engine) for name in names if name.endswith(".py")
+    }
+    paths.update(importlib.import_module(module).__file__ for module in modules)
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, engine).encode())
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.digest()
+
+
+class Ruleset:
+    def __init__(self, name: str, modules: Sequence[str], registries: Iterable[ObjectRegistry]):
+        self.name = name
+        self.modules = tuple(modules)
+        self.registries = tuple(registries)
+        self.loaded = False
+        # see source_digest, set by load()
+        self.digest: Optional[bytes] = None
+
+    def __repr__(self):
+        return f"Ruleset({self.name}, {'loaded' if self.loaded else 'not loaded'})"
+
+    def load(self) -> "Ruleset":
+        if not self.loaded:
+            for module in self.modules:
+                importlib.import_module(module)
+            self.digest = source_digest(self.modules)
+            self.loaded = True
+        return self
+
+    @property
+    def frozen(self) -> bool:
+        return all(isinstance(registry.objects, FrozenTable) for registry in self.registries)
+
+    def freeze(self) -> "Ruleset":
+        self.load()
+        for registry in self.registries:
+            freeze_registry(registry)
+        return self
@@ -1,27 +1,66 @@
 import abc
+import copy
+import random
 from math import ceil
-from typing import Sequence, Union, cast
+from typing import Callable, Iterable, Optional, Sequence, Union, cast
 
 from pycluster.messenger.cluster import MessageCluster
-from pycluster.messenger.helpers import listen, replaceable
+from pycluster.messenger.helpers import replaceable
 from pycluster.messenger.object_registry import ObjectRegistry
 
-from toonbattle.calculator.clash.gags import ClashGagPart, ClashGagTuple
-from toonbattle.calculator.common.attacks import GagController, GagDefinition
+from toonbattle.calculator.clash.cog_attacks import CogAttack, cog_turn
+from toonbattle.calculator.clash.combos import AvailableGag, Combo, ComboFinder
+from toonbattle.calculator.clash.gag_config import ClashGagTuple
+from toonbattle.calculator.common.attacks import GagController, GagDefinition, GagPart
 from toonbattle.calculator.common.avatar import Avatar, AvatarHolder, Cog, Toon
+from toonbattle.calculator.common.cache import OutcomeCache
+from toonbattle.calculator.common.delta import DeltaRecorder, Snapshot, StateDelta
+from toonbattle.calculator.common.eventlog import BattleRecording, EventLog, RecordCheckpoint, TurnEvents
+from toonbattle.calculator.common.fingerprint import fingerprint
+from toonbattle.calculator.common.fork import StateFork
+from toonbattle.calculator.common.outcomes import OutcomeDistribution, enumerate_outcomes
+from toonbattle.calculator.common.profiling import Profiler, dispatcher
+from toonbattle.calculator.common.ruleset import Ruleset
+from toonbattle.calculator.common import wire
 from toonbattle.calculator.helpers.enums import AuxillaryObjects, Events, MathTargets, ReplaceTargets
-from toonbattle.calculator.globals import CalculationObject, ClashEffectRegistry, ClashGagRegistry, ClashObjectRegistry
-from toonbattle.calculator.common.status_effects import StatusEffect, StatusEffectController
+from toonbattle.calculator.globals import (
+    CalculationObject,
+    ClashEffectRegistry,
+    ClashGagRegistry,
+    ClashObjectRegistry,
+    ClashRuleset,
+)
+from toonbattle.calculator.helpers.dispatch import BroadcastEvents, FilteredTargets, filtered_handlers, listen
+from toonbattle.calculator.common.status_effects import StatusEffectController
+
+
+GagControllerID = "gags"
 
 
 class CalculationState(CalculationObject, MessageCluster):
     StatusEffectRegistry: ObjectRegistry = None
     GagRegistry: ObjectRegistry = None
     RegistryObject: ObjectRegistry = None
+    # modules registering the objects of the registries above, loaded when the first state is created
+    Rules: Optional[Ruleset] = None
     LatestAllocatedID = 100
+    # replaces the random roll of Attack.hit when set (see common/outcomes.py)
+    roll_hook: Optional[Callable[[float], bool]] = None
+    # source of every random draw of this state, the global generator when unset (see common/rng.py)
+    rng: Optional[random.Random] = None
+    # receives the events, damage, effects and rolls of this state while it is recorded (see common/eventlog.py)
+    event_log: Optional[EventLog] = None
+    # number of active forks, avatars removed meanwhile are kept for the rollback (see common/fork.py)
+    forks: int = 0
+    # reused by run_gags, see attach_gag_controller
+    gag_controller: Optional[GagController] = None
 
-    def __init__(self, registry=None):
+    def __init__(self, registry=None, rng: Optional[random.Random] = None):
+        if self.Rules is not None:
+            self.Rules.load()
         MessageCluster.__init__(self, self.RegistryObject)
+        if rng is not None:
+            self.rng = rng
         self.toons = self.registry.create_and_insert(
             AuxillaryObjects.AvatarHolder, self, "toons", cast_to=AvatarHolder, subclass_id=AuxillaryObjects.Toon
         )
@@ -32,16 +71,80 @@ class CalculationState(CalculationObject, MessageCluster):
             AuxillaryObjects.StatusEffectController, self, "effects", cast_to=StatusEffectController
         )
 
+    @dispatcher
+    def calculate(self, target: int, value, **kwargs):
+        """
+        Runs the plain @math handlers of the cluster, then the subject_math/author_math handlers
+        of the subject and author avatars and their effects (see helpers/dispatch.py).
+        """
+        value = MessageCluster.calculate(self, target, value, **kwargs)
+        for _, handler, obj in self.filtered_handlers("math", target, kwargs.get("subject"), kwargs.get("author")):
+            value = handler(obj, value, **kwargs)
+        return value
+
+    @dispatcher
+    def emit(self, event: int, **kwargs):
+        """
+        Broadcasts the event to the plain @listen handlers if there are any, then invokes
+        the subject_listen/author_listen handlers of the subject and author avatars and their effects.
+        """
+        event_log = self.event_log
+        if event_log is not None:
+            event_log.event(event, kwargs.get("subject"), kwargs.get("author"))
+        if event in BroadcastEvents:
+            MessageCluster.emit(self, event, **kwargs)
+        for _, handler, obj in self.filtered_handlers("listen", event, kwargs.get("subject"), kwargs.get("author")):
+            handler(obj, **kwargs)
+        if event_log is not None and event in TurnEvents:
+            event_log.state(RecordCheckpoint, self, event)
+
+    def filtered_handlers(
+        self, kind: str, target: int, subject, author
+    ) -> list[tuple[int, Callable, CalculationObject]]:
+        if (kind, target) not in FilteredTargets:
+            return []
+
+        avatars: list[tuple[Avatar, tuple[str, ...]]] = []
+        if isinstance(subject, Avatar) and subject is author:
+            avatars.append((subject, ("subject", "author")))
+        else:
+            if isinstance(author, Avatar):
+                avatars.append((author, ("author",)))
+            if isinstance(subject, Avatar):
+                avatars.append((subject, ("subject",)))
+            if len(avatars) == 2 and self.precedes(subject, author):
+                avatars.reverse()
+
+        handlers = []
+        for avatar, keys in avatars:
+            for obj in (avatar, *avatar.effects.children.values()):
+                table = filtered_handlers(type(obj))
+                for key in keys:
+                    for priority, handler in table.get((kind, key, target), ()):
+                        handlers.append((priority, handler, obj))
+        # higher priorities first, as in pycluster; the sort is stable so ties stay in battle order
+        handlers.sort(key=lambda item: -item[0])
+        return handlers
+
+    def precedes(self, first: Avatar, second: Avatar) -> bool:
+        """Whether `first` comes before `second` in battle order: toons before cogs, then by position."""
+        if first.parent is not second.parent:
+            return first.parent is self.toons
+        return first.parent.index(first) < second.parent.index(second)
+
     @replaceable(ReplaceTargets.CreateEffect)
     def create_effect(self, avatar: Union[Avatar, "CalculationState"], effect_id: int, **kwargs):
         parent = avatar.effects
         current_effect = parent.get(effect_id)
         if current_effect:
             current_effect.update(**kwargs)
-            return current_effect
-
-        # have to use parent here because the effect registry != the object registry!
-        effect = parent.registry.create_and_insert(effect_id, parent, str(effect_id), **kwargs, cast_to=StatusEffect)
+            parent.version += 1
+            effect = current_effect
+        else:
+            # the controller uses the effect registry, which != the object registry!
+            effect = parent.create(effect_id, **kwargs)
+        if self.event_log is not None:
+            self.event_log.effect(avatar, effect)
         return effect
 
     @replaceable(ReplaceTargets.DealDamage)
@@ -62,6 +165,21 @@ class CalculationState(CalculationObject, MessageCluster):
             self.emit(Events.DamagePartDealt, subject=avatar, damage=ceil(total_value), **kwargs, **common_kwargs)
 
         self.emit(Events.DamageDealt, subject=avatar, damage=ceil(total_value), **common_kwargs)
+        if self.event_log is not None:
+            self.event_log.damage(avatar, total_value, avatar.health)
+        return total_value
+
+    def deal_part_damage(self, avatar: Avatar, parts: Sequence[tuple[GagPart, float]], **common_kwargs):
+        """deal_damage for (gag part, damage) pairs dealt by the authors of the parts, without building the items."""
+        total_value = 0
+        for part, damage in parts:
+            author = part.author
+            total_value += self.deal_damage_singular(avatar, damage, author=author, **common_kwargs)
+            self.emit(Events.DamagePartDealt, subject=avatar, damage=ceil(total_value), author=author, **common_kwargs)
+
+        self.emit(Events.DamageDealt, subject=avatar, damage=ceil(total_value), **common_kwargs)
+        if self.event_log is not None:
+            self.event_log.damage(avatar, total_value, avatar.health)
         return total_value
 
     @replaceable(ReplaceTargets.Heal)
@@ -72,6 +190,74 @@ class CalculationState(CalculationObject, MessageCluster):
         avatar.health += ceil(value)
         return value
 
+    def roll(self, chance: float) -> bool:
+        hit = self.roll_hook(chance) if self.roll_hook is not None else chance >= self.draw()
+        if self.event_log is not None:
+            self.event_log.roll(chance, hit)
+        return hit
+
+    def draw(self) -> float:
+        value = random.random() if self.rng is None else self.rng.random()
+        if self.event_log is not None:
+            self.event_log.draw(value)
+        return value
+
+    def seed(self, seed):
+        self.rng = random.Random(seed)
+
+    def clone(self) -> "CalculationState":
+        return cast(CalculationState, self.RegistryObject.unwrap(copy.deepcopy(self.wrap())))
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact binary form of this state, smaller and faster to parse than wrap() (see common/wire.py).
+        """
+        return wire.encode(self)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CalculationState":
+        return wire.decode(data, cls)
+
+    def snapshot(self) -> Snapshot:
+        return Snapshot(self)
+
+    def record(self) -> DeltaRecorder:
+        """
+        Records what changes while active; use as `with state.record() as recorder: ...`
+        and send recorder.delta instead of the whole state (see common/delta.py).
+        """
+        return DeltaRecorder(self)
+
+    def apply_delta(self, delta: StateDelta | bytes):
+        if isinstance(delta, (bytes, bytearray, memoryview)):
+            delta = StateDelta.from_bytes(delta)
+        delta.apply(self)
+
+    def fingerprint(self) -> bytes:
+        """Digest which is equal for states with the same avatars and effects (see common/fingerprint.py)."""
+        return fingerprint(self)
+
+    def fork(self) -> StateFork:
+        """
+        Cheap checkpoint of this state; use as `with state.fork(): ...` to run a branch
+        and roll every change back afterwards (see common/fork.py).
+        """
+        return StateFork(self)
+
+    def log_to(self, event_log: EventLog) -> BattleRecording:
+        """
+        Records this state into the log while active; use as `with state.log_to(event_log): ...`
+        and read it back with eventlog.Replay (see common/eventlog.py).
+        """
+        return event_log.battle(self)
+
+    def profile(self) -> Profiler:
+        """
+        Counts and times calculate/emit/replace dispatch while active; use as `with state.profile() as profiler: ...`
+        (see common/profiling.py).
+        """
+        return Profiler(self)
+
     def allocate(self) -> str:
         self.LatestAllocatedID += 1
         return str(self.LatestAllocatedID)
@@ -100,21 +286,70 @@ class CalculationState(CalculationObject, MessageCluster):
         return self.toons.create(max_health=150)
 
     def run_gags(self, *pregags: tuple) -> list[GagDefinition]:
+        """
+        Returns the definitions that hit. They are reused by the next run_gags of this state,
+        so read what you need from them before running gags again.
+        """
         hitting_gags = []
-        with self.registry.temporary_object(AuxillaryObjects.GagController, self) as gag_ctrl:
+        gag_ctrl = self.attach_gag_controller()
+        try:
             gags = self.get_gag_parts(gag_ctrl, pregags)
             gags = sorted(gags, key=lambda _gag: _gag.priority)
             for i, gag in enumerate(gags):
                 gag_ctrl.add_child(str(i), gag)
                 if gag.apply():
                     hitting_gags.append(gag)
+        finally:
+            gag_ctrl.release()
+            self.remove_child(GagControllerID)
         return hitting_gags
 
+    def attach_gag_controller(self) -> GagController:
+        """The GagController of run_gags is kept between runs and only attached to the state while gags run."""
+        if self.gag_controller is None:
+            self.gag_controller = self.registry.create_and_insert(
+                AuxillaryObjects.GagController, self, GagControllerID, cast_to=GagController
+            )
+        else:
+            self.add_child(GagControllerID, self.gag_controller)
+        return self.gag_controller
+
+    def cleanup(self):
+        if self.gag_controller is not None:
+            self.gag_controller.cleanup()
+            self.gag_controller = None
+        super().cleanup()
+
     def use_gags(self, *pregags: tuple) -> list[GagDefinition]:
         ans = self.run_gags(*pregags)
         self.emit(Events.ToonsMoved)
         return ans
 
+    def play_round(self, *pregags: tuple) -> list[GagDefinition]:
+        """
+        A full round: the toons use their gags, the cogs attack, then effects tick and dead avatars are removed.
+        """
+        ans = self.run_gags(*pregags)
+        self.cogs_attack()
+        self.emit(Events.ToonsMoved)
+        self.emit(Events.CogsMoved)
+        return ans
+
+    def cogs_attack(self) -> list:
+        return []
+
+    def run_gags_exact(
+        self, *pregags: tuple, use: bool = False, cache: Optional[OutcomeCache] = None
+    ) -> OutcomeDistribution:
+        """
+        Like run_gags, but branches on every hit/miss roll instead of picking one at random,
+        and returns the exact distribution of resulting states. Does not modify this state.
+        With a cache, a state and plan seen before is answered from it (see common/cache.py).
+        """
+        if cache is not None:
+            return cache.outcomes(self, *pregags, use=use)
+        return enumerate_outcomes(self, *pregags, use=use)
+
     @abc.abstractmethod
     def get_gag_parts(self, gag_ctrl: GagController, gags: Sequence[tuple]) -> list[GagDefinition]:
         pass
@@ -122,11 +357,10 @@ class CalculationState(CalculationObject, MessageCluster):
 
 @ClashObjectRegistry.register(0)
 class ClashState(CalculationState):
-    from toonbattle.calculator.clash import effects as _e, gags as _g, cogs as _c  # noqa: F401
-
     StatusEffectRegistry = ClashEffectRegistry
     RegistryObject = ClashObjectRegistry
     GagRegistry = ClashGagRegistry
+    Rules = ClashRuleset
 
     @staticmethod
     def build_merged_tracks(gags):
@@ -144,12 +378,16 @@ class ClashState(CalculationState):
         return track_split
 
     def get_gag_parts(self, gag_ctrl: GagController, gags: Sequence[ClashGagTuple]) -> list[GagDefinition]:
+        from toonbattle.calculator.clash.gags import ClashGagPart
+
         def get_target_list(__track: int) -> AvatarHolder:
             return self.cogs if __track > 0 else self.toons
 
         def get_gag_weight(gag_pair: tuple[int, str | tuple, list]):
-            av_ids = [x.avatar_id for x in get_target_list(gag_pair[0])]
-            return gag_pair[0], (av_ids.index(gag_pair[1]) if gag_pair[1] != () else 0)
+            if gag_pair[1] == ():
+                return gag_pair[0], 0
+            av_list = get_target_list(gag_pair[0])
+            return gag_pair[0], av_list.index(av_list[gag_pair[1]])
 
         # tracks = sorted({(gag[1], gag[3]) for gag in gags}, key=get_gag_weight)
         # track_split = [[gag for gag in gags if gag[1] == track and gag[3] == target] for track, target in tracks]
@@ -157,8 +395,38 @@ class ClashState(CalculationState):
 
         gag_defs = []
         for index, (track, target, gag_list) in enumerate(track_split):
-            gag_def = gag_ctrl.registry.create_and_insert(track, gag_ctrl, str(index), cast_to=GagDefinition)
+            gag_def = gag_ctrl.create(track, str(index))
             gag_parts = [ClashGagPart(self.toons, get_target_list(track), gag) for gag in gag_list]
             gag_def.construct(track, target, gag_parts)
             gag_defs.append(gag_def)
         return gag_defs
+
+    def cogs_attack(self) -> list[CogAttack]:
+        """Turn of the cogs, see clash/cog_attacks.py."""
+        return cog_turn(self)
+
+    def run_gags_batch(
+        self, *pregags: tuple, trials: int = 10000, seed=None, use: bool = False, cogs_attack: bool = False
+    ):
+        """
+        Runs the gags in `trials` independent trials at once (see clash/batch.py) and returns a BatchResult.
+        With `cogs_attack` the cogs take their turn afterwards, as in play_round.
+        Does not modify this state. Requires numpy.
+        """
+        from toonbattle.calculator.clash.batch import run_batch
+
+        return run_batch(self, pregags, trials, seed=seed, use=use, cogs_attack=cogs_attack)
+
+    def find_combos(
+        self,
+        available: dict[str, Iterable[AvailableGag]],
+        targets: Optional[Sequence[str]] = None,
+        objective: str | Callable[[ClashGagTuple], float] = "fewest",
+        limit: int = 1,
+        min_chance: Optional[float] = None,
+    ) -> list[Combo]:
+        """
+        Finds the gag assignments (at most one gag per toon) which kill the targets using the fewest
+        or cheapest gags. `available` maps toon IDs to their (track, level, prestige) gags.
+        """
+        return ComboFinder(self).find(available, targets, objective, limit, min_chance)
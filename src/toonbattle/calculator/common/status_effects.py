@@ -1,7 +1,7 @@
 import typing
 
-from pycluster.messenger.helpers import listen
-
+from toonbattle.calculator.common.pooling import FreeList
+from toonbattle.calculator.helpers.dispatch import listen
 from toonbattle.calculator.helpers.enums import Events, MathTargets
 from toonbattle.calculator.globals import CalculationObject
 
@@ -12,14 +12,74 @@ if typing.TYPE_CHECKING:
 
 class StatusEffectController(CalculationObject):
     parent: "Avatar"
+    # bumped whenever an effect is added, removed or updated, results derived from the effects are keyed on it
+    version: int = 0
+    # (version, summary of the effects), see common/fingerprint.py
+    fingerprint_cache: typing.Optional[tuple] = None
+    # removed effects of Pooled classes by effect ID, see common/pooling.py
+    pool: typing.Optional[FreeList] = None
+    # effects removed while the state is forked, kept so that rolling back attaches the same objects again
+    detached: typing.Optional[list["StatusEffect"]] = None
 
     @property
     def registry(self):
         return self.parent_cluster.StatusEffectRegistry
 
+    def create(self, effect_id, **kwargs) -> "StatusEffect":
+        """Inserts a new effect, reusing a removed one of the same ID when there is one."""
+        effect = self.pool.acquire(str(effect_id)) if self.pool is not None else None
+        if effect is None:
+            registry = self.registry
+            effect = registry.create_and_insert(int(effect_id), self, str(effect_id), **kwargs, cast_to=StatusEffect)
+        else:
+            effect.reset(**kwargs)
+            self.add_child(str(effect_id), effect)
+        return effect
+
     def remove(self, effect: "StatusEffect"):
-        effect.cleanup()
-        self.remove_child(str(effect.object_type))
+        event_log = self.parent_cluster.event_log
+        if event_log is not None:
+            event_log.removed(self.parent, effect)
+        child_id = str(effect.object_type)
+        if self.parent_cluster.forks:
+            if self.detached is None:
+                self.detached = []
+            self.detached.append(effect)
+        else:
+            self.discard(child_id, effect)
+        self.remove_child(child_id)
+        self.version += 1
+
+    def discard(self, child_id: str, effect: "StatusEffect"):
+        if effect.Pooled:
+            if self.pool is None:
+                self.pool = FreeList()
+            pooled = self.pool.release(child_id, effect)
+        else:
+            pooled = False
+        if not pooled:
+            effect.cleanup()
+
+    def attach(self, child_id: str, effect: "StatusEffect"):
+        """Attaches an effect which was removed while the state was forked again."""
+        self.detached = [other for other in self.detached if other is not effect]
+        self.add_child(child_id, effect)
+
+    def release_detached(self):
+        if self.detached:
+            for effect in self.detached:
+                self.discard(str(effect.object_type), effect)
+        self.detached = None
+
+    def cleanup(self):
+        self.release_detached()
+        if self.pool is not None:
+            self.pool.clear()
+        super().cleanup()
+
+    def touch(self):
+        """To be called after changing the fields of an effect directly."""
+        self.version += 1
 
     def __len__(self):
         return len(self.children)
@@ -28,6 +88,7 @@ class StatusEffectController(CalculationObject):
         return f"StatusEffects{list(self.children.keys())}"
 
     def add_child(self, child_id: str, child: "StatusEffect", allow_subtrees: bool = False) -> "StatusEffect":
+        self.version += 1
         return typing.cast("StatusEffect", super().add_child(child_id, child, True))
 
     def get(self, effect_id) -> "StatusEffect":
@@ -39,6 +100,8 @@ class StatusEffectController(CalculationObject):
 
 class StatusEffect(CalculationObject):
     parent: StatusEffectController
+    # removed effects are kept for reuse by their controller instead of being cleaned up
+    Pooled: bool = False
 
     @property
     def parent_avatar(self) -> "Avatar":
@@ -59,6 +122,10 @@ class StatusEffect(CalculationObject):
     def update(self, **kwargs):
         pass
 
+    def reset(self, **kwargs):
+        """Sets up a reused effect as __init__ would with these arguments."""
+        pass
+
 
 class StatusEffectTimed(StatusEffect):
     turns: int
@@ -66,11 +133,18 @@ class StatusEffectTimed(StatusEffect):
 
     def __init__(self, parent, turns: int = None, **kwargs):
         super().__init__(parent, **kwargs)
+        self.reset_turns(turns)
+
+    def reset(self, turns: int = None, **kwargs):
+        super().reset(**kwargs)
+        self.reset_turns(turns)
 
+    def reset_turns(self, turns: typing.Optional[int]):
         if turns is None:
             turns = self.DefaultTurns
 
-        turns = self.calculate(MathTargets.EffectRounds, turns, subject=self.parent_avatar, effect=self)
+        state = self.true_parent_cluster
+        turns = state.calculate(MathTargets.EffectRounds, turns, subject=self.parent_avatar, effect=self)
         self.turns = max(1, int(turns))
 
     @listen(Events.ToonsMoved)
@@ -78,6 +152,8 @@ class StatusEffectTimed(StatusEffect):
         self.turns -= 1
         if self.turns <= 0:
             self.parent.remove(self)
+        else:
+            self.parent.touch()
         super().first_cleanup()
 
     @property
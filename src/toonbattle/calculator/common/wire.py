@@ -0,0 +1,190 @@
+"""
+Compact binary encoding of a battle, the counterpart of wrap()/ObjectRegistry.unwrap for shipping states around.
+
+Layout (all counts, IDs and registry IDs are unsigned LEB128 varints):
+
+    magic "TB", format version
+    state: latest allocated ID, effects
+    toons holder, cogs holder: registry ID of the avatars, avatar count, then per avatar:
+        avatar ID, rest of the datagram (which starts with the avatar ID), attributes, effects
+    effects: count, then per effect: effect ID, datagram, attributes
+
+Attributes are the values of fork.ForkedAttributes (None when the object has no such attribute), which some
+classes keep outside of their datagram: the executive flag and level of cogs, the turns left of Encore.
+Datagrams and attributes are written as tagged values. Integers which fit are packed as fixed-width int32
+(health, turns, stacks...), floats as float64, tuples and lists as a count followed by their items.
+"""
+import struct
+from typing import Type, TYPE_CHECKING, TypeVar
+
+from toonbattle.calculator.common.fork import attributes, set_attributes
+from toonbattle.calculator.common.status_effects import StatusEffect, StatusEffectController
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.avatar import AvatarHolder
+    from toonbattle.calculator.common.state import CalculationState
+
+Magic = b"TB"
+Version = 2
+
+TagNone, TagFalse, TagTrue, TagInt32, TagVarint, TagFloat, TagString, TagSequence = range(8)
+Int32 = struct.Struct("<i")
+Float64 = struct.Struct("<d")
+
+S = TypeVar("S", bound="CalculationState")
+
+
+class WireError(ValueError):
+    pass
+
+
+class Writer:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def varint(self, value: int):
+        if value < 0:
+            raise WireError(f"Cannot write {value} as an unsigned varint")
+        while value > 0x7F:
+            self.buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.buffer.append(value)
+
+    def value(self, value):
+        if value is None:
+            self.buffer.append(TagNone)
+        elif value is True or value is False:
+            self.buffer.append(TagTrue if value else TagFalse)
+        elif isinstance(value, int):
+            if -(2**31) <= value < 2**31:
+                self.buffer.append(TagInt32)
+                self.buffer += Int32.pack(value)
+            else:
+                self.buffer.append(TagVarint)
+                self.varint(value * 2 if value >= 0 else -value * 2 - 1)  # zigzag
+        elif isinstance(value, float):
+            self.buffer.append(TagFloat)
+            self.buffer += Float64.pack(value)
+        elif isinstance(value, str):
+            data = value.encode()
+            self.buffer.append(TagString)
+            self.varint(len(data))
+            self.buffer += data
+        elif isinstance(value, (tuple, list)):
+            self.buffer.append(TagSequence)
+            self.varint(len(value))
+            for item in value:
+                self.value(item)
+        else:
+            raise WireError(f"Cannot encode datagram value {value!r}")
+
+    def effects(self, controller: StatusEffectController):
+        self.varint(len(controller.children))
+        for child_id, effect in controller.children.items():
+            self.varint(int(child_id))
+            self.value(effect.datagram)
+            self.value(attributes(effect))
+
+    def holder(self, holder: "AvatarHolder"):
+        self.varint(holder.subclass_id)
+        self.varint(len(holder))
+        for avatar in holder:
+            avatar_id, *datagram = avatar.datagram
+            self.varint(int(avatar_id))
+            self.value(datagram)
+            self.value(attributes(avatar))
+            self.effects(avatar.effects)
+
+
+class Reader:
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def byte(self) -> int:
+        if self.offset >= len(self.data):
+            raise WireError("Unexpected end of data")
+        self.offset += 1
+        return self.data[self.offset - 1]
+
+    def varint(self) -> int:
+        result = shift = 0
+        while True:
+            byte = self.byte()
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def fixed(self, fmt: struct.Struct):
+        if self.offset + fmt.size > len(self.data):
+            raise WireError("Unexpected end of data")
+        (value,) = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return value
+
+    def value(self):
+        tag = self.byte()
+        if tag == TagNone:
+            return None
+        if tag in (TagFalse, TagTrue):
+            return tag == TagTrue
+        if tag == TagInt32:
+            return self.fixed(Int32)
+        if tag == TagVarint:
+            value = self.varint()
+            return value // 2 if value % 2 == 0 else -(value + 1) // 2
+        if tag == TagFloat:
+            return self.fixed(Float64)
+        if tag == TagString:
+            size = self.varint()
+            self.offset += size
+            return bytes(self.data[self.offset - size : self.offset]).decode()
+        if tag == TagSequence:
+            return tuple(self.value() for _ in range(self.varint()))
+        raise WireError(f"Unknown tag {tag}")
+
+    def effects(self, controller: StatusEffectController):
+        for _ in range(self.varint()):
+            effect_id = self.varint()
+            effect = controller.registry.create_and_insert(effect_id, controller, str(effect_id), cast_to=StatusEffect)
+            effect.datagram = self.value()
+            set_attributes(effect, self.value())
+
+    def holder(self, holder: "AvatarHolder"):
+        subclass_id = self.varint()
+        for _ in range(self.varint()):
+            child_id = str(self.varint())
+            avatar = holder.registry.create_and_insert(subclass_id, holder, child_id, avatar_id=child_id)
+            avatar.datagram = (child_id, *self.value())
+            set_attributes(avatar, self.value())
+            self.effects(avatar.effects)
+
+
+def encode(state: "CalculationState") -> bytes:
+    writer = Writer()
+    writer.buffer += Magic
+    writer.varint(Version)
+    writer.varint(state.LatestAllocatedID)
+    writer.effects(state.effects)
+    writer.holder(state.toons)
+    writer.holder(state.cogs)
+    return bytes(writer.buffer)
+
+
+def decode(data: bytes, state_class: Type[S]) -> S:
+    if bytes(data[: len(Magic)]) != Magic:
+        raise WireError("Not an encoded battle")
+    reader = Reader(data)
+    reader.offset = len(Magic)
+    if (version := reader.varint()) != Version:
+        raise WireError(f"Unsupported format version {version}")
+
+    state = state_class()
+    state.LatestAllocatedID = reader.varint()
+    reader.effects(state.effects)
+    reader.holder(state.toons)
+    reader.holder(state.cogs)
+    if reader.offset != len(data):
+        raise WireError("Trailing data after the battle")
+    return state
@@ -5,6 +5,8 @@ from typing import cast
 from pycluster.messenger.message_object import MessageObject
 from pycluster.messenger.object_registry import ObjectRegistry
 
+from toonbattle.calculator.common.ruleset import Ruleset
+
 if typing.TYPE_CHECKING:
     from toonbattle.calculator.common.state import CalculationState
 
@@ -12,6 +14,12 @@ ClashObjectRegistry = ObjectRegistry("clash-object")
 ClashEffectRegistry = ObjectRegistry("clash-effect")
 ClashGagRegistry = ObjectRegistry("clash-gag")
 
+ClashRuleset = Ruleset(
+    "clash",
+    ("toonbattle.calculator.clash.effects", "toonbattle.calculator.clash.gags", "toonbattle.calculator.clash.cogs"),
+    (ClashObjectRegistry, ClashEffectRegistry, ClashGagRegistry),
+)
+
 
 class CalculationObject(MessageObject):
     logger = logging.getLogger("toonbattle.calculator.CalculationObject")
@@ -0,0 +1,89 @@
+"""
+Handlers which declare the avatar they are interested in, so CalculationState can look them up
+on that avatar instead of offering every calculation and event to every object of the cluster.
+"""
+import sys
+from typing import Callable
+
+from pycluster.messenger.helpers import listen as broadcast_listen
+
+# events with at least one plain @listen handler; the others are only routed to filtered handlers
+BroadcastEvents: set[int] = set()
+# (kind, target) of every filtered handler, so calculations and events nobody filters for skip the lookup
+FilteredTargets: set[tuple[str, int]] = set()
+
+Handlers = dict[tuple[str, str, int], list[tuple[int, Callable]]]
+FilteredHandlers: dict[type, Handlers] = {}
+
+
+class UnroutedListener(RuntimeError):
+    pass
+
+
+def listen(event: int, *args, **kwargs):
+    """pycluster's @listen, which also records that `event` has to be broadcast to the whole cluster."""
+    BroadcastEvents.add(event)
+    return broadcast_listen(event, *args, **kwargs)
+
+
+def filtered(kind: str, target: int, key: str, priority: int = 0):
+    FilteredTargets.add((kind, target))
+
+    def decorator(func):
+        func.dispatch_filter = (kind, target, key, priority)
+        return func
+
+    return decorator
+
+
+def subject_math(target: int, priority: int = 0):
+    """
+    Math handler which only applies when its avatar (the object itself, or the avatar of a status effect)
+    is the subject of the calculation. Replaces @math + @check_subject: CalculationState.calculate
+    looks these up on the subject instead of offering the calculation to every object.
+    Higher priorities run first, ties run in battle order (toons, then cogs; an avatar before its effects).
+    """
+    return filtered("math", target, "subject", priority)
+
+
+def author_math(target: int, priority: int = 0):
+    """Like subject_math, for the author of the calculation (replaces @math + @check_object)."""
+    return filtered("math", target, "author", priority)
+
+
+def subject_listen(event: int):
+    """Listener only invoked when its avatar is the subject of the event (replaces @listen + @check_subject)."""
+    return filtered("listen", event, "subject")
+
+
+def author_listen(event: int):
+    """Listener which is only invoked when its avatar is the author of the event."""
+    return filtered("listen", event, "author")
+
+
+def filtered_handlers(cls: type) -> Handlers:
+    """(priority, handler) of every filtered handler of a class, by (kind, filter key, target)."""
+    table = FilteredHandlers.get(cls)
+    if table is None:
+        table = {}
+        for name in dir(cls):
+            spec = getattr(getattr(cls, name, None), "dispatch_filter", None)
+            if spec is not None:
+                kind, target, key, priority = spec
+                table.setdefault((kind, key, target), []).append((priority, getattr(cls, name)))
+        FilteredHandlers[cls] = table
+    return table
+
+
+def check_listeners(cls: type):
+    """
+    Raises for a class defined in (or inheriting from) a module which uses pycluster's own @listen:
+    CalculationState.emit only broadcasts the events in BroadcastEvents, so those handlers would never be called.
+    """
+    for base in cls.__mro__:
+        module = sys.modules.get(base.__module__)
+        if module is not None and module.__name__ != __name__ and broadcast_listen in vars(module).values():
+            raise UnroutedListener(
+                f"{base.__qualname__} is defined in {module.__name__}, which uses pycluster's @listen: "
+                f"use helpers.dispatch.listen so that its events are broadcast"
+            )
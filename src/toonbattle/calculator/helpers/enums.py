@@ -63,6 +63,7 @@ class DamageSources(IntEnum):
     SquirtSplash = auto()
     ZapPool = auto()
     Caramelize = auto()
+    CogAttack = auto()
 
 
 class ExtraSources(IntEnum):
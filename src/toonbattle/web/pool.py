@@ -0,0 +1,177 @@
+"""
+Warm battle states and the queries of the web service.
+
+A query names its battle (toon count, cog lineup, whether toons always hit) and the pool keeps one
+ClashState per distinct battle, least recently used first out once `size` is reached. Queries run on
+a fork of the pooled state, so a state is built once per battle instead of once per request and is
+rolled back afterwards. Queries are plain functions of a JSON payload returning JSON-able dicts, so the
+same code serves requests in the event loop and in the worker processes of the server.
+"""
+import json
+import random
+from collections import OrderedDict
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+from toonbattle.calculator.clash.evaluate import gag_rows
+from toonbattle.calculator.clash.gag_config import ClashGagConfiguration
+from toonbattle.calculator.helpers.enums import ClashGags, CommonEffects
+
+if TYPE_CHECKING:
+    from toonbattle.calculator.common.state import ClashState
+
+MaxToons = 4
+MaxCogs = 4
+MaxPlans = 256
+Levels = 8
+# skelecog health is rolled when the cog is created, which would make pooled states differ between processes
+CogKeys = ("level", "exe", "attack_oriented")
+
+BattleKey = tuple
+Query = Callable[["ClashState", dict], dict]
+
+
+class QueryError(ValueError):
+    pass
+
+
+def battle_key(battle: Any) -> BattleKey:
+    """A hashable and normalized description of the battle of a query."""
+    if not isinstance(battle, dict):
+        raise QueryError("battle must be an object")
+    toons = battle.get("toons", MaxToons)
+    cogs = battle.get("cogs", ())
+    if not isinstance(toons, int) or not 0 < toons <= MaxToons:
+        raise QueryError(f"toons must be between 1 and {MaxToons}")
+    if not isinstance(cogs, list) or not 0 < len(cogs) <= MaxCogs:
+        raise QueryError(f"cogs must be a list of 1 to {MaxCogs} cogs")
+
+    lineup = []
+    for spec in cogs:
+        if isinstance(spec, int):
+            spec = {"level": spec}
+        if not isinstance(spec, dict) or not isinstance(spec.get("level"), int) or set(spec) - set(CogKeys):
+            raise QueryError(f"a cog is a level or an object with the keys {', '.join(CogKeys)}")
+        lineup.append(tuple((key, spec[key]) for key in CogKeys if key in spec))
+    return toons, tuple(lineup), bool(battle.get("always_hit", False))
+
+
+def parse_gags(state: "ClashState", gags: Any) -> tuple:
+    """
+    Gags are [toon position, track, level, target position or null, prestige] rows;
+    the target is a toon for ToonUp and a cog otherwise.
+    """
+    if not isinstance(gags, list) or len(gags) > MaxToons:
+        raise QueryError(f"a plan is a list of at most {MaxToons} gags")
+    try:
+        gags = gag_rows((int(gag[0]), *gag[1:3], -1 if gag[3] is None else int(gag[3]), gag[4]) for gag in gags)
+    except (TypeError, ValueError, IndexError):
+        raise QueryError("a gag is [toon, track, level, target, prestige]") from None
+
+    for author, track, level, target, _ in gags:
+        targets = state.toons if track == ClashGags.ToonUp else state.cogs
+        if track not in ClashGagConfiguration or not 0 <= level < Levels:
+            raise QueryError(f"unknown gag: track {track}, level {level}")
+        if not 0 <= author < len(state.toons) or target != () and not 0 <= target < len(targets):
+            raise QueryError(f"no such toon or target: {author}, {target}")
+    return gags
+
+
+class StatePool:
+    def __init__(self, size: int = 64):
+        self.size = size
+        self.states: OrderedDict[BattleKey, "ClashState"] = OrderedDict()
+        self.built = 0
+
+    def __len__(self):
+        return len(self.states)
+
+    def get(self, key: BattleKey) -> "ClashState":
+        state = self.states.get(key)
+        if state is not None:
+            self.states.move_to_end(key)
+            return state
+
+        state = self.states[key] = self.build(key)
+        self.built += 1
+        if len(self.states) > self.size:
+            _, evicted = self.states.popitem(last=False)
+            evicted.cleanup()
+        return state
+
+    @staticmethod
+    def build(key: BattleKey) -> "ClashState":
+        from toonbattle.calculator.common.state import ClashState
+
+        toons, lineup, always_hit = key
+        state = ClashState()
+        if always_hit:
+            state.create_effect(state, CommonEffects.ToonsHit)
+        for _ in range(toons):
+            state.create_toon()
+        for spec in lineup:
+            state.create_cog(**dict(spec))
+        return state
+
+    def close(self):
+        for state in self.states.values():
+            state.cleanup()
+        self.states.clear()
+
+    def run(self, query: Query, payload: dict) -> dict:
+        state = self.get(battle_key(payload.get("battle")))
+        seed = payload.get("seed")
+        rng, state.rng = state.rng, random.Random(seed) if seed is not None else None
+        try:
+            with state.fork():
+                return query(state, payload)
+        finally:
+            state.rng = rng
+
+
+def health(state: "ClashState") -> dict:
+    return {"cogs": [cog.health for cog in state.cogs], "toons": [toon.health for toon in state.toons]}
+
+
+def run_gags(state: "ClashState", payload: dict) -> dict:
+    hits = state.run_gags(*parse_gags(state, payload.get("gags")))
+    return {"hits": len(hits), **health(state)}
+
+
+def what_if(state: "ClashState", payload: dict) -> dict:
+    """Exact kill probability and expected cog health of every plan."""
+    plans = payload.get("plans")
+    if not isinstance(plans, list) or len(plans) > MaxPlans:
+        raise QueryError(f"plans must be a list of at most {MaxPlans} plans")
+    cog_ids = [str(cog.avatar_id) for cog in state.cogs]
+    results = []
+    for plan in plans:
+        distribution = state.run_gags_exact(*parse_gags(state, plan))
+        results.append(
+            {
+                "kill_probability": distribution.kill_probability(*cog_ids),
+                "expected_health": [distribution.expected_health(cog_id) for cog_id in cog_ids],
+            }
+        )
+    return {"plans": results}
+
+
+# name: (query, whether it is CPU-heavy and goes to the worker processes)
+Queries: dict[str, tuple[Query, bool]] = {
+    "run_gags": (run_gags, False),
+    "what_if": (what_if, True),
+}
+
+_pool: Optional[StatePool] = None
+
+
+def init_worker(size: int):
+    global _pool
+    from toonbattle.calculator.common.state import ClashState
+
+    ClashState.Rules.freeze()
+    _pool = StatePool(size)
+
+
+def run_in_worker(name: str, body: bytes) -> bytes:
+    """Entry point of the worker processes: JSON in, JSON out, errors as QueryError."""
+    return json.dumps(_pool.run(Queries[name][0], json.loads(body))).encode()
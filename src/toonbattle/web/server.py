@@ -0,0 +1,244 @@
+"""
+Local HTTP service for the calculator, built on asyncio streams and the standard library only.
+
+    POST /run_gags  {"battle": {"toons": 4, "cogs": [12, {"level": 10, "exe": true}]}, "gags": [[0, 7, 6, 0, false]]}
+    POST /what_if   {"battle": {...}, "plans": [[...gags...], ...]}
+    GET  /health
+
+Cheap queries (run_gags) are answered in the event loop from a pool of warm states (see web/pool.py).
+CPU-heavy queries (what_if) go to a process pool whose workers keep their own warm pools. At most
+`max_pending` heavy queries are queued or running at a time, further ones are refused with 503, and a
+query that misses its deadline is answered with 504. A timed-out query which is still queued is cancelled
+and frees its slot at once; one which a worker has already started cannot be cancelled, so it keeps its
+slot until the worker is done with it and abandoned work still counts against the limit.
+
+Run with `python -m toonbattle.web.server --port 8080`.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from toonbattle.web.pool import Queries, QueryError, StatePool, init_worker, run_in_worker
+
+logger = logging.getLogger(__name__)
+
+MaxBody = 256 * 1024
+MaxHeaders = 64
+IdleTimeout = 30.0
+Reasons = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def error_body(message: str) -> bytes:
+    return json.dumps({"error": message}).encode()
+
+
+def response(status: int, body: bytes, keep_alive: bool) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {Reasons[status]}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+    )
+    if status == 503:
+        head += "Retry-After: 1\r\n"
+    return head.encode() + b"\r\n" + body
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[tuple[str, str, dict[str, str], bytes]]:
+    """The next request of a connection, or None once the client has closed it."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "malformed request line") from None
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        if len(headers) >= MaxHeaders:
+            raise HttpError(400, "too many headers")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "invalid Content-Length") from None
+    if not 0 <= length <= MaxBody:
+        raise HttpError(413, f"bodies are limited to {MaxBody} bytes")
+    return method, path, headers, await reader.readexactly(length)
+
+
+class BattleServer:
+    """
+    `workers` is the number of worker processes for heavy queries; with 0 every query is answered in the
+    event loop. `deadline` is the longest a heavy query may take in seconds, a query may ask for less.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        workers: Optional[int] = None,
+        pool_size: int = 64,
+        max_pending: Optional[int] = None,
+        deadline: float = 5.0,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.pool = StatePool(pool_size)
+        self.executor = None
+        if self.workers:
+            self.executor = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(pool_size,))
+        self.max_pending = max_pending or 4 * max(self.workers, 1)
+        self.deadline = deadline
+        self.pending = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.stats = {"served": 0, "rejected": 0, "timed_out": 0, "failed": 0}
+
+    async def start(self) -> "BattleServer":
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
+
+    async def __aenter__(self) -> "BattleServer":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    # connections
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IdleTimeout)
+                except HttpError as e:
+                    writer.write(response(e.status, error_body(str(e)), False))
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                status, body = await self.dispatch(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(response(status, body, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> tuple[int, bytes]:
+        name = path.strip("/")
+        if name == "health":
+            return 200, json.dumps({"pending": self.pending, "pooled": len(self.pool), **self.stats}).encode()
+        if name not in Queries:
+            return 404, error_body(f"no such query: {name}")
+        if method != "POST":
+            return 405, error_body("queries are POST requests")
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, error_body("the body is not JSON")
+        if not isinstance(payload, dict):
+            return 400, error_body("the body must be an object")
+
+        query, heavy = Queries[name]
+        try:
+            if heavy and self.executor is not None:
+                result = await self.offload(name, body, payload.get("deadline"))
+            else:
+                result = json.dumps(self.pool.run(query, payload)).encode()
+        except QueryError as e:
+            return 400, error_body(str(e))
+        except HttpError as e:
+            return e.status, error_body(str(e))
+        except Exception:
+            logger.exception("Query %s failed", name)
+            self.stats["failed"] += 1
+            return 500, error_body("the query failed")
+        self.stats["served"] += 1
+        return 200, result
+
+    async def offload(self, name: str, body: bytes, deadline) -> bytes:
+        try:
+            deadline = self.deadline if deadline is None else min(float(deadline), self.deadline)
+        except (TypeError, ValueError):
+            raise QueryError("deadline must be a number of seconds") from None
+        if self.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise HttpError(503, "too many pending queries")
+
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(run_in_worker, name, body)
+        # the slot is only taken once the query is queued, so a failed submit does not leak it
+        self.pending += 1
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.release))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), deadline)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            raise HttpError(504, f"the query took longer than {deadline} seconds") from None
+
+    def release(self):
+        self.pending -= 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP service for the ToonBattle calculator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for heavy queries")
+    parser.add_argument("--pool-size", type=int, default=64, help="warm states kept per process")
+    parser.add_argument("--max-pending", type=int, default=None, help="heavy queries queued before refusing")
+    parser.add_argument("--deadline", type=float, default=5.0, help="seconds a heavy query may take")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = BattleServer(args.host, args.port, args.workers, args.pool_size, args.max_pending, args.deadline)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
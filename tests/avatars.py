@@ -0,0 +1,72 @@
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects
+
+
+class TestAvatarHolder(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.cogs = [self.battle.create_cog(level) for level in (5, 6, 7, 8, 9)]
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def test_lookup(self):
+        holder = self.battle.cogs
+        for position, cog in enumerate(self.cogs):
+            self.eq(holder.index(cog), position)
+            self.assertIs(holder[position], cog, msg="Numbers are positions")
+            self.assertIs(holder[cog.avatar_id], cog, msg="Strings are IDs")
+            self.assertIs(holder.at(position), cog)
+            self.assertIs(holder.by_id(cog.avatar_id), cog)
+        self.assertIsNone(holder(5))
+        self.assertIsNone(holder(-1))
+        self.assertIsNone(holder(int(self.cogs[0].avatar_id)), msg="IDs are not positions")
+        self.assertIsNone(holder("999"))
+        self.assertIsNone(holder(()))
+        self.eq(list(holder), self.cogs)
+
+    def test_remove(self):
+        holder = self.battle.cogs
+        holder.remove(self.cogs[1])
+        self.eq(len(holder), 4)
+        self.eq(holder.index(self.cogs[1]), -1)
+        self.assertIsNone(holder(self.cogs[1].avatar_id))
+        self.eq([holder.index(cog) for cog in self.cogs[2:]], [1, 2, 3], msg="Later cogs move up")
+        self.eq(list(holder), [self.cogs[0], *self.cogs[2:]])
+
+        middle = holder.index(self.cogs[2])
+        self.assertIs(holder(middle - 1), self.cogs[0], msg="Neighbours close the gap")
+        self.assertIs(holder(middle + 1), self.cogs[3])
+
+    def test_datagram(self):
+        holder = self.battle.cogs
+        holder.datagram = list(reversed(holder.datagram))
+        self.eq(holder.index(self.cogs[0]), 4)
+        self.assertIs(holder[0], self.cogs[4])
+
+    def test_many_avatars(self):
+        # as the largest size of the scaling benchmarks: positions go past the first avatar IDs
+        holder = self.battle.cogs
+        self.battle.create_effect(self.battle, CommonEffects.ToonsHit)
+        toon = self.battle.create_toon()
+        cogs = self.cogs + [self.battle.create_cog(8 + i % 12) for i in range(251)]
+        for cog in holder:
+            self.battle.create_effect(cog, ClashEffects.Soak)
+        self.eq(len(holder), 256)
+        self.assertIs(holder.at(255), cogs[255])
+        self.assertIs(holder[150], cogs[150], msg="Positions above 90 are not IDs")
+
+        middle = holder.at(128)
+        self.battle.run_gags((toon.avatar_id, ClashGags.Squirt, 6, middle.avatar_id, True))
+        damaged = [cog.health < cog.max_health for cog in cogs[127:130]]
+        self.eq(damaged, [True] * 3, msg="Squirt splashes the neighbours")
+        holder.remove(middle)
+        self.eq((holder.index(cogs[129]), holder.at(127)), (128, cogs[127]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from math import ceil
+
+from base import BaseTest
+from toonbattle.calculator.clash import cog_config
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestBatch(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.battle.create_effect(self.battle, CommonEffects.ToonsHit)
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.toon3 = self.battle.create_toon()
+        self.small_cog = self.battle.create_cog(10)
+        self.big_cog = self.battle.create_cog(15)
+        self.exe_cog = self.battle.create_cog(20, exe=True, attack_oriented=False)
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def assert_matches_engine(self, *gags):
+        result = self.battle.run_gags_batch(*gags, trials=4)
+        self.battle.run_gags(*gags)
+        for avatar in list(self.battle.cogs) + list(self.battle.toons):
+            self.eq(result.health(avatar.avatar_id).tolist(), [avatar.health] * 4, msg=f"{avatar} health matches")
+
+    def test_lure_squirt(self):
+        self.assert_matches_engine(
+            (self.toon3.avatar_id, ClashGags.Lure, 3, (), False),
+            (self.toon1.avatar_id, ClashGags.Squirt, 4, self.exe_cog.avatar_id, False),
+            (self.toon2.avatar_id, ClashGags.Squirt, 4, self.exe_cog.avatar_id, True),
+        )
+
+    def test_trap_lure(self):
+        self.assert_matches_engine(
+            (self.toon1.avatar_id, ClashGags.Lure, 4, self.big_cog.avatar_id, False),
+            (self.toon2.avatar_id, ClashGags.Trap, 3, self.big_cog.avatar_id, True),
+        )
+
+    def test_zap_pool(self):
+        self.battle.use_gags((self.toon1.avatar_id, ClashGags.Squirt, 4, self.big_cog.avatar_id, False))
+        self.assert_matches_engine(
+            (self.toon2.avatar_id, ClashGags.Zap, 5, self.big_cog.avatar_id, True),
+            (self.toon3.avatar_id, ClashGags.Throw, 6, self.small_cog.avatar_id, True),
+        )
+
+    def test_sound_encore(self):
+        sound = (
+            (self.toon1.avatar_id, ClashGags.Sound, 1, (), False),
+            (self.toon2.avatar_id, ClashGags.Sound, 1, (), True),
+        )
+        self.battle.use_gags(*sound)
+        self.assertIn(ClashEffects.Encore, self.toon1.effects)
+        self.assert_matches_engine(*sound)
+
+    def test_kill_probability(self):
+        self.battle.effects.remove(self.battle.effects[CommonEffects.ToonsHit])
+        result = self.battle.run_gags_batch(
+            (self.toon1.avatar_id, ClashGags.Drop, 7, self.small_cog.avatar_id, False), trials=20000, seed=1
+        )
+        self.assertAlmostEqual(result.kill_probability(self.small_cog.avatar_id), 0.95, delta=0.01)
+        self.eq(self.small_cog.health, self.small_cog.max_health, msg="Batches do not modify the state")
+
+    def test_cogs_attack(self):
+        self.battle.create_effect(self.exe_cog, ClashEffects.Lured)
+        result = self.battle.run_gags_batch(trials=20000, seed=2, cogs_attack=True)
+        expected = 0
+        for cog in (self.small_cog, self.big_cog):
+            damage = cog_config.CogAttackDamage[cog.level]
+            group = ceil(damage * cog_config.GroupAttackMultiplier)
+            chance = cog_config.GroupAttackChance
+            expected += cog_config.CogAttackAccuracy[cog.level] * (chance * group + (1 - chance) * damage / 3)
+        lost = self.toon1.max_health - result.health(self.toon1.avatar_id).mean()
+        self.assertAlmostEqual(lost, expected, delta=0.5, msg="Lured cogs do not attack")
+        self.eq(self.toon1.health, self.toon1.max_health)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.common.cache import OutcomeCache, decode_distribution, encode_distribution
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects, Events
+
+
+def make_battle(exe: bool = False) -> ClashState:
+    battle = ClashState()
+    battle.create_toon()
+    battle.create_toon()
+    battle.create_cog(10)
+    battle.create_cog(12, exe=exe)
+    return battle
+
+
+class TestFingerprint(BaseTest):
+    def setUp(self):
+        self.battle = make_battle()
+        self.other = make_battle()
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.other.cleanup()
+        self.battle = self.other = None
+
+    def test_equal_states(self):
+        self.eq(self.battle.fingerprint(), self.other.fingerprint())
+        executive = make_battle(exe=True)
+        self.assertNotEqual(self.battle.fingerprint(), executive.fingerprint(), msg="The executive flag is covered")
+        executive.cleanup()
+
+    def test_mutations(self):
+        original = self.battle.fingerprint()
+        cog = self.battle.cogs[0]
+        seen = {original}
+        with self.battle.fork():
+            self.battle.deal_damage(cog, 10)
+            seen.add(self.battle.fingerprint())
+            self.battle.create_effect(cog, ClashEffects.Soak)
+            seen.add(self.battle.fingerprint())
+            self.battle.use_gags()
+            seen.add(self.battle.fingerprint())
+            self.eq(len(seen), 4, msg="Damage, new effects and effect ticks change the fingerprint")
+        self.eq(self.battle.fingerprint(), original, msg="Rolling back restores the fingerprint")
+
+    def test_incremental(self):
+        self.battle.create_effect(self.battle.cogs[0], CommonEffects.Stun)
+        self.battle.fingerprint()
+        controller = self.battle.cogs[0].effects
+        summary = controller.fingerprint_cache
+        self.battle.deal_damage(self.battle.cogs[1], 10)
+        self.battle.fingerprint()
+        self.assertIs(controller.fingerprint_cache, summary, msg="Unchanged effects are not summarized again")
+        self.battle.create_effect(self.battle.cogs[0], CommonEffects.Stun)
+        self.battle.fingerprint()
+        self.assertIsNot(controller.fingerprint_cache, summary, msg="Stacking an effect updates its summary")
+
+
+class TestOutcomeCache(BaseTest):
+    def setUp(self):
+        self.battle = make_battle()
+        toon, cog = self.battle.toons[0], self.battle.cogs[0]
+        self.gags = [(toon.avatar_id, ClashGags.Throw, 5, cog.avatar_id, False)]
+        self.same_gags = [(toon.avatar_id, int(ClashGags.Throw), 5, cog.avatar_id, 0)]
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def test_memory(self):
+        cache = OutcomeCache(size=1)
+        first = self.battle.run_gags_exact(*self.gags, cache=cache)
+        self.assertIs(self.battle.run_gags_exact(*self.same_gags, cache=cache), first)
+        self.eq((cache.hits, cache.misses), (1, 1))
+
+        other = make_battle()
+        self.assertIs(other.run_gags_exact(*self.gags, cache=cache), first, msg="Equal states share results")
+        other.cleanup()
+
+        self.battle.run_gags_exact(cache=cache)
+        self.eq(len(cache), 1)
+        self.battle.run_gags_exact(*self.gags, cache=cache)
+        self.eq(cache.misses, 3, msg="The least recently used result was evicted")
+
+    def test_effect_turns(self):
+        cache = OutcomeCache()
+        self.battle.create_effect(self.battle.toons[0], ClashEffects.Encore, multiplier=1.2)
+        self.battle.run_gags_exact(*self.gags, use=True, cache=cache)
+        self.battle.emit(Events.ToonsMoved)
+        self.eq(self.battle.toons[0].effects[ClashEffects.Encore].turns, 1)
+        self.battle.run_gags_exact(*self.gags, use=True, cache=cache)
+        self.eq((cache.hits, cache.misses), (0, 2), msg="Encore about to expire is a different state")
+
+    def test_encoding(self):
+        distribution = self.battle.run_gags_exact(*self.gags)
+        decoded = decode_distribution(encode_distribution(distribution))
+        self.eq([(o.key, o.probability) for o in decoded], [(o.key, o.probability) for o in distribution])
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "outcomes.db")
+            with OutcomeCache(path=path) as cache:
+                expected = self.battle.run_gags_exact(*self.gags, cache=cache).kill_probability(*self.gags[0][3:4])
+            with OutcomeCache(path=path) as cache:
+                distribution = self.battle.run_gags_exact(*self.gags, cache=cache)
+                self.eq((cache.disk_hits, cache.misses), (1, 0), msg="Results survive a restart")
+                self.eq(distribution.kill_probability(self.gags[0][3]), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 
 from base import BaseTest
 from toonbattle.calculator.common.avatar import Cog, Toon
+from toonbattle.calculator.helpers.dispatch import BroadcastEvents
 from toonbattle.calculator.helpers.enums import ClashEffects, CommonEffects, DamageSources, Events, MathTargets
 from toonbattle.calculator.common.state import ClashState
 
@@ -149,6 +150,42 @@ class TestClashEffects(BaseTest):
         self.battle.emit(Events.ToonsMoved)
         self.eq(len(self.big_cog.effects), 0, msg="Stun wears off after 1 turn")
 
+    def test_indexed_math(self):
+        self.battle.create_effect(self.small_cog, ClashEffects.Lured, knockback=10)
+        self.battle.create_effect(self.big_cog, ClashEffects.Soak)
+        self.battle.create_effect(self.toon1, ClashEffects.Encore, multiplier=1.2)
+
+        handlers = self.battle.filtered_handlers("math", MathTargets.Damage, self.small_cog, self.toon1)
+        names = [f"{type(obj).__name__}.{handler.__name__}" for _, handler, obj in handlers]
+        self.eq(names, ["EffectEncore.calculate_damage", "EffectLured.replace_damage"], msg="Toons go before cogs")
+        handlers = self.battle.filtered_handlers("math", MathTargets.Damage, self.big_cog, self.toon2)
+        self.eq(handlers, [], msg="Effects of other avatars are not visited")
+
+        calc_damage = self.battle.calculate(
+            MathTargets.Damage, 10, author=self.toon1, subject=self.small_cog, source=DamageSources.Throw
+        )
+        self.eq(calc_damage, 22, msg="Encore multiplies before the knockback is added")
+
+    def test_priority(self):
+        manager = self.battle.create_cog(10, skelecog=1)
+        manager.health = manager.max_health * 2
+        self.eq(
+            self.battle.calculate(MathTargets.EffectRounds, 4, subject=manager),
+            2,
+            msg="Managers always get 2 rounds: their priority -100 handler runs after the skelecog reduction",
+        )
+        manager.health = manager.max_health
+        self.eq(self.battle.calculate(MathTargets.EffectRounds, 4, subject=manager), 3, msg="4 - 1 skelecog stack")
+
+    def test_indexed_events(self):
+        self.battle.create_effect(self.small_cog, ClashEffects.Lured)
+        self.battle.create_effect(self.big_cog, ClashEffects.Lured)
+        self.assertNotIn(Events.DamageDealt, BroadcastEvents, msg="Only filtered listeners, no broadcast needed")
+
+        self.battle.emit(Events.DamageDealt, subject=self.small_cog, damage=10, source=DamageSources.Throw)
+        self.assertNotIn(ClashEffects.Lured, self.small_cog.effects)
+        self.assertIn(ClashEffects.Lured, self.big_cog.effects, msg="Listeners of other cogs are not invoked")
+
 
 if __name__ == "__main__":
     unittest.main()
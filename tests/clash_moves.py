@@ -4,7 +4,7 @@ import unittest
 from base import BaseTest
 from toonbattle.calculator.clash import gag_config
 from toonbattle.calculator.common.state import ClashState
-from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects, Events
 
 
 class TestClashGags(BaseTest):
@@ -311,6 +311,19 @@ class TestClashGags(BaseTest):
             msg="Drop prestige increases damage on dazed/soaked",
         )
 
+    def test_accuracy_cache(self):
+        drops = [(toon.avatar_id, ClashGags.Drop, 3, self.big_cog.avatar_id, False) for toon in self.battle.toons]
+        with self.battle.profile() as profiler:
+            self.battle.run_gags(*drops)
+        self.eq(profiler.summary()["replace"]["GagAccuracy"]["count"], 1, msg="Drop parts share the accuracy")
+
+        version = self.big_cog.effects.version
+        self.battle.create_effect(self.big_cog, CommonEffects.Stun)
+        self.battle.create_effect(self.big_cog, CommonEffects.Stun)
+        self.eq(self.big_cog.effects.version, version + 2, msg="Creating and updating effects invalidate the cache")
+        self.battle.emit(Events.ToonsMoved)
+        self.eq(self.big_cog.effects.version, version + 3, msg="So does removing them")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,92 @@
+import random
+import unittest
+from math import ceil
+
+from base import BaseTest
+from toonbattle.calculator.clash import cog_config
+from toonbattle.calculator.clash.cog_attacks import attack_accuracy, attack_damage
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects
+
+
+class ConstantRandom(random.Random):
+    def __init__(self, value: float):
+        super().__init__()
+        self.value = value
+
+    def random(self) -> float:
+        return self.value
+
+
+class TestCogAttacks(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.cog = self.battle.create_cog(10)
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def test_tables(self):
+        damage = cog_config.CogAttackDamage[10]
+        self.eq(attack_damage(self.cog), damage)
+        self.eq(attack_accuracy(self.cog), cog_config.CogAttackAccuracy[10])
+
+        executive = self.battle.create_cog(10, exe=True)
+        self.flt(attack_damage(executive), damage * cog_config.ExecutiveAttackBoost)
+        self.cog.health = self.cog.max_health * 2
+        self.flt(attack_damage(self.cog), damage * cog_config.ManagerAttackBoost, msg="Managers hit harder")
+
+    def test_accuracy_effects(self):
+        accuracy = cog_config.CogAttackAccuracy[10]
+        self.battle.create_effect(self.cog, ClashEffects.Dazed)
+        self.flt(attack_accuracy(self.cog), accuracy - cog_config.DazedAccuracyPenalty)
+        self.battle.create_effect(self.cog, CommonEffects.Stun)
+        self.battle.create_effect(self.cog, CommonEffects.Stun)
+        penalty = cog_config.DazedAccuracyPenalty + 2 * cog_config.StunAccuracyPenalty
+        self.flt(attack_accuracy(self.cog), accuracy - penalty, msg="Stun stacks")
+
+    def test_single_and_group(self):
+        damage = cog_config.CogAttackDamage[10]
+        self.battle.rng = ConstantRandom(0.5)
+        attacks = self.battle.cogs_attack()
+        self.eq(len(attacks), 1)
+        self.eq(attacks[0][1], (self.toon2,), msg="The target is picked among the toons alive")
+        self.eq(self.toon1.health, self.toon1.max_health)
+        self.eq(self.toon2.health, self.toon2.max_health - damage)
+
+        self.battle.rng = ConstantRandom(0.1)
+        self.battle.cogs_attack()
+        group_damage = ceil(damage * cog_config.GroupAttackMultiplier)
+        self.eq(self.toon1.health, self.toon1.max_health - group_damage, msg="Group attacks hit every toon")
+        self.eq(self.toon2.health, self.toon2.max_health - damage - group_damage)
+
+    def test_lured(self):
+        self.battle.rng = ConstantRandom(0.0)
+        self.battle.create_effect(self.cog, ClashEffects.Lured)
+        self.eq(self.battle.cogs_attack(), [], msg="Lured cogs do not attack")
+
+    def test_play_round(self):
+        self.battle.rng = ConstantRandom(0.5)
+        self.toon2.health = 1
+        gag = (self.toon1.avatar_id, ClashGags.Throw, 1, self.cog.avatar_id, False)
+        self.battle.create_effect(self.battle, CommonEffects.ToonsHit)
+        self.battle.play_round(gag)
+        self.assertLess(self.cog.health, self.cog.max_health)
+        self.eq(len(self.battle.toons), 1, msg="Toons defeated by the cogs leave the battle")
+
+    def test_seeded(self):
+        healths = []
+        for _ in range(2):
+            self.battle.seed(4)
+            with self.battle.fork():
+                for _ in range(5):
+                    self.battle.cogs_attack()
+                healths.append((self.toon1.health, self.toon2.health))
+        self.eq(healths[0], healths[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
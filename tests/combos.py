@@ -0,0 +1,70 @@
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.clash.parallel import ParallelSearch, expected_health, kill_chance
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashGags
+
+
+class TestCombos(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.toon3 = self.battle.create_toon()
+        self.cog = self.battle.create_cog(10)
+        self.available = {
+            self.toon1.avatar_id: [(ClashGags.Throw, 4, False), (ClashGags.Drop, 7, False)],
+            self.toon2.avatar_id: [(ClashGags.Throw, 4, False), (ClashGags.ToonUp, 7, False)],
+            self.toon3.avatar_id: [(ClashGags.Throw, 2, False)],
+        }
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def test_fewest(self):
+        combos = self.battle.find_combos(self.available)
+        self.eq(len(combos), 1)
+        self.eq(combos[0].gags, ((self.toon1.avatar_id, ClashGags.Drop, 7, self.cog.avatar_id, False),))
+        self.eq(self.cog.health, self.cog.max_health, msg="Searching does not modify the state")
+
+    def test_custom_cost(self):
+        combos = self.battle.find_combos(self.available, objective=lambda gag: 10 if gag[2] == 7 else 1, limit=2)
+        self.eq(
+            set(combos[0].gags),
+            {
+                (self.toon1.avatar_id, ClashGags.Throw, 4, self.cog.avatar_id, False),
+                (self.toon2.avatar_id, ClashGags.Throw, 4, self.cog.avatar_id, False),
+            },
+            msg="Two Throws with combo damage kill the cog exactly",
+        )
+        self.eq([combo.cost for combo in combos], [2, 3], msg="Combos are sorted by cost")
+
+    def test_no_combo(self):
+        del self.available[self.toon1.avatar_id]
+        self.eq(self.battle.find_combos(self.available), [], msg="Throw + Throw without combo cannot kill")
+
+    def test_parallel(self):
+        executive = self.battle.create_cog(14, exe=True)
+        targets = [self.cog.avatar_id]
+        trap = [
+            (self.toon1.avatar_id, ClashGags.Trap, 7, executive.avatar_id, False),
+            (self.toon2.avatar_id, ClashGags.Lure, 0, executive.avatar_id, False),
+        ]
+        objective = lambda gag: 10 if gag[2] == 7 else 1  # noqa: E731
+        serial = self.battle.find_combos(self.available, targets, objective=objective, limit=2)
+        with ParallelSearch(self.battle, processes=2, chunk_size=1) as search:
+            parallel = search.find_combos(self.available, targets, objective=objective, limit=2)
+            small_waves = search.find_combos(self.available, targets, objective=objective, limit=2, wave_size=1)
+            chances = search.evaluate([combo.gags for combo in serial], kill_chance, targets)
+            trapped = search.evaluate([trap], expected_health, [executive.avatar_id])
+
+        self.eq([set(combo.gags) for combo in parallel], [set(combo.gags) for combo in serial])
+        self.eq([combo.gags for combo in small_waves], [combo.gags for combo in parallel])
+        self.flt(chances[0], 0.95, msg="Merged Throws roll their accuracy once")
+        self.eq(trapped[0], expected_health(self.battle, trap, [executive.avatar_id]), msg="Workers keep executives")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import random
+import tempfile
+import unittest
+
+from base import BaseTest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if numpy is not None:
+    from toonbattle.calculator.clash.dataset import DatasetGenerator, ScenarioSpace, iter_shards
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestDataset(BaseTest):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def generate(self, name: str, shards: int = 2, start: int = 0, processes: int = 0) -> list[int]:
+        path = os.path.join(self.directory.name, name)
+        with DatasetGenerator(path, shard_size=16, seed=11, processes=processes) as generator:
+            return list(generator.generate(shards, start))
+
+    def load(self, name: str) -> list[dict]:
+        return list(iter_shards(os.path.join(self.directory.name, name)))
+
+    def test_shards(self):
+        self.eq(self.generate("inline"), [0, 1])
+        self.eq(self.generate("inline", shards=3), [2], msg="Existing shards are skipped")
+        shards = self.load("inline")
+        self.eq(len(shards), 3)
+        self.eq(numpy.concatenate([shard["scenario"] for shard in shards]).tolist(), list(range(48)))
+
+        for shard in shards:
+            cogs = shard["cogs"].astype(int)
+            used = numpy.arange(4) < cogs[:, None]
+            self.assertTrue((shard["cog_level"][used] >= 1).all())
+            self.assertTrue((shard["cog_level"][~used] == -1).all(), msg="Missing cogs are padded")
+            self.assertTrue((shard["health"][used] <= shard["max_health"][used]).all())
+            self.assertTrue(numpy.isnan(shard["health"][~used]).all())
+            alive = ((shard["health"] > 0) & used).sum(axis=1)
+            self.eq(alive.tolist(), shard["cogs_alive"].tolist())
+            passing = shard["gag_track"] == -1
+            self.assertTrue((shard["gag_level"][passing] == -1).all())
+
+    def test_reproducible(self):
+        self.generate("inline")
+        self.eq(self.generate("reversed", shards=1, start=1), [1])
+        self.generate("reversed", shards=1)
+        self.eq(sorted(self.generate("parallel", processes=2)), [0, 1])
+
+        expected = self.load("inline")
+        for name in ("reversed", "parallel"):
+            for shard, other in zip(expected, self.load(name)):
+                for column, values in shard.items():
+                    same = numpy.array_equal(values, other[column], equal_nan=values.dtype.kind == "f")
+                    self.assertTrue(same, msg=f"{name} {column}")
+
+    def test_space(self):
+        with self.assertRaises(ValueError):
+            ScenarioSpace(cogs=(1, 5))
+
+        toons, lineup, gags = ScenarioSpace(toons=(2, 2), cogs=(3, 3), pass_chance=0).sample(random.Random(1))
+        self.eq((toons, len(lineup), len(gags)), (2, 3, 2))
+        self.eq([gag[0] for gag in gags], [0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
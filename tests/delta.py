@@ -0,0 +1,70 @@
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.common.delta import StateDelta
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, Events
+
+
+class TestDelta(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.small_cog = self.battle.create_cog(1)
+        self.big_cog = self.battle.create_cog(15)
+        self.battle.create_effect(self.big_cog, ClashEffects.Lured, knockback=30)
+        self.mirror = ClashState.from_bytes(self.battle.to_bytes())
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.mirror.cleanup()
+        self.battle = self.mirror = None
+
+    def test_record(self):
+        with self.battle.record() as recorder:
+            self.battle.use_gags(
+                (self.toon1.avatar_id, ClashGags.Throw, 7, self.big_cog.avatar_id, False),
+                (self.toon2.avatar_id, ClashGags.Sound, 6, (), False),
+            )
+        delta = recorder.delta
+        self.eq(delta.holders[1].removed, [self.small_cog.avatar_id], msg="Small cog died")
+        self.assertNotIn(self.toon1.avatar_id, delta.holders[0].avatars, msg="Unchanged avatars are left out")
+
+        data = delta.to_bytes()
+        self.assertLess(len(data), len(self.battle.to_bytes()), msg="Delta is smaller than the whole state")
+        self.mirror.apply_delta(data)
+        self.eq(self.mirror.to_bytes(), self.battle.to_bytes(), msg="Applying the delta catches up the mirror")
+
+    def test_diff(self):
+        before = self.battle.snapshot()
+        self.battle.create_cog(5)
+        self.battle.create_effect(self.toon1, ClashEffects.Cheer)
+        self.battle.cogs.datagram = list(reversed(self.battle.cogs.datagram))
+        self.big_cog.health -= 10
+
+        delta = StateDelta.diff(before, self.battle.snapshot())
+        self.mirror.apply_delta(StateDelta.from_bytes(delta.to_bytes()))
+        self.eq(str(self.mirror.cogs), str(self.battle.cogs))
+        self.eq(self.mirror.to_bytes(), self.battle.to_bytes())
+
+        self.assertFalse(StateDelta.diff(before, before), msg="No changes, empty delta")
+
+    def test_attributes(self):
+        with self.battle.record() as recorder:
+            self.battle.create_effect(self.toon1, ClashEffects.Encore, multiplier=1.2)
+            executive = self.battle.create_cog(9, exe=True)
+        self.mirror.apply_delta(recorder.delta.to_bytes())
+        mirrored = self.mirror.cogs[executive.avatar_id]
+        self.eq((mirrored.executive, mirrored.level), (True, 9), msg="Cogs are created with their attributes")
+
+        with self.battle.record() as recorder:
+            self.battle.emit(Events.ToonsMoved)
+        self.assertIn(self.toon1.avatar_id, recorder.delta.holders[0].effects, msg="Turn ticks are changes")
+        self.mirror.apply_delta(recorder.delta.to_bytes())
+        self.eq(self.mirror.toons[self.toon1.avatar_id].effects[ClashEffects.Encore].turns, 1)
+        self.eq(self.mirror.fingerprint(), self.battle.fingerprint())
+
+
+if __name__ == "__main__":
+    unittest.main()
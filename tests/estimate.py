@@ -0,0 +1,63 @@
+import math
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.clash.estimate import BattleInputs, estimate, estimate_state
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags
+
+
+class TestEstimate(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.toons = [self.battle.create_toon() for _ in range(4)]
+        self.cogs = [self.battle.create_cog(level) for level in (8, 11, 12)] + [self.battle.create_cog(13, exe=True)]
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def gag(self, toon: int, track: int, level: int, cog, prestige: bool = False):
+        target = self.cogs[cog].avatar_id if cog is not None else ()
+        return self.toons[toon].avatar_id, track, level, target, prestige
+
+    def test_matches_engine(self):
+        self.battle.create_effect(self.cogs[3], ClashEffects.Trapped, value=30)
+        self.battle.create_effect(self.cogs[2], ClashEffects.Soak)
+        self.battle.create_effect(self.toons[2], ClashEffects.Encore, multiplier=1.2)
+        plans = [
+            [self.gag(0, ClashGags.Drop, 5, 0), self.gag(1, ClashGags.Drop, 6, 0, True)],
+            [self.gag(0, ClashGags.Lure, 3, None), self.gag(1, ClashGags.Squirt, 4, 1)],
+            [
+                self.gag(0, ClashGags.Lure, 4, 3, True),
+                self.gag(1, ClashGags.Throw, 5, 3),
+                self.gag(2, ClashGags.Throw, 5, 3),
+            ],
+            [
+                self.gag(0, ClashGags.Trap, 4, 0, True),
+                self.gag(1, ClashGags.Lure, 2, 0),
+                self.gag(2, ClashGags.Sound, 3, None),
+            ],
+            [
+                self.gag(0, ClashGags.Squirt, 3, 1),
+                self.gag(1, ClashGags.Zap, 5, 2, True),
+                self.gag(3, ClashGags.ToonUp, 2, None),
+            ],
+        ]
+        for plan in plans:
+            result = estimate_state(self.battle, plan, validate=True)
+            for position in range(len(self.cogs)):
+                self.assertLessEqual(result.worst[position], result.expected[position] + 1e-9)
+                self.assertLessEqual(result.expected[position], result.best[position] + 1e-9)
+
+    def test_inputs(self):
+        plan = [(0, ClashGags.Throw, 5, 1, False), (1, ClashGags.Throw, 5, 1, False)]
+        result = estimate(BattleInputs(2, [100, 100], lured={1: 25}), plan)
+        self.eq(result.passes, 1, msg="Lured targets are always hit, no branches")
+        part = 90 + 25
+        self.eq(result.expected, [0, 2 * part + math.ceil(2 * part * 0.2)], msg="Knockback and combo bonus")
+        self.eq(result.kill_probability(1), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
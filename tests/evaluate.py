@@ -0,0 +1,49 @@
+import math
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.clash.evaluate import BattleBatch, gag_rows
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashGags, CommonEffects
+
+
+class TestBattleBatch(BaseTest):
+    def setUp(self):
+        self.batch = BattleBatch(toons=2, always_hit=True)
+
+    def tearDown(self):
+        self.batch.close()
+        self.batch = None
+
+    def run_single(self, lineup, plan) -> list[int]:
+        state = ClashState()
+        state.create_effect(state, CommonEffects.ToonsHit)
+        for _ in range(2):
+            state.create_toon()
+        cogs = [state.create_cog(level) for level in lineup]
+        state.run_gags(*plan)
+        health = [cog.health for cog in cogs]
+        state.cleanup()
+        return health
+
+    def test_matches_engine(self):
+        plan = [(0, ClashGags.Throw, 5, 0, False), (1, ClashGags.Sound, 3, (), True)]
+        lineups = [[level, level + 1] for level in range(1, 12)] + [[9]]
+        results = self.batch.evaluate((lineup, plan) for lineup in lineups)
+
+        self.eq(len(results), len(lineups))
+        self.eq(results.width, 2)
+        for index, lineup in enumerate(lineups):
+            health = self.run_single(lineup, plan)
+            self.eq(results.health_of(index).tolist()[: len(lineup)], health, msg=f"Battle {index} matches run_gags")
+            self.eq(results.cogs_alive[index], sum(value > 0 for value in health))
+        self.assertTrue(math.isnan(results.health_of(len(lineups) - 1)[1]), msg="Missing cogs are padded")
+        self.eq(len(self.batch.state.cogs), 0, msg="Battles do not leak into the warm state")
+
+    def test_rows(self):
+        rows = [(0, ClashGags.Drop, 6, 0, 1), (1, ClashGags.Lure, 2, -1, 0)]
+        self.eq(gag_rows(rows), ((0, ClashGags.Drop, 6, 0, True), (1, ClashGags.Lure, 2, (), False)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import random
+import tempfile
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.common.eventlog import (
+    EventLog,
+    RecordDamage,
+    RecordEffect,
+    RecordEvent,
+    RecordRemoved,
+    RecordRoll,
+    Replay,
+)
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects, Events
+
+
+class TestEventLog(BaseTest):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "battles.log")
+        self.battle = ClashState(rng=random.Random(7))
+        self.battle.create_effect(self.battle, CommonEffects.ToonsHit)
+        self.toon = self.battle.create_toon()
+        self.cog = self.battle.create_cog(10)
+        self.throw = (self.toon.avatar_id, ClashGags.Throw, 5, self.cog.avatar_id, False)
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+        self.directory.cleanup()
+
+    def record(self):
+        with EventLog(self.path) as log:
+            with self.battle.log_to(log):
+                self.battle.use_gags(self.throw)
+                health = [self.cog.health]
+                self.battle.play_round()
+                health.append(self.cog.health)
+        return health
+
+    def test_turns(self):
+        health = self.record()
+        self.assertIsNone(self.battle.event_log)
+        with Replay(self.path) as replay:
+            self.eq((len(replay), replay.turns(0)), (1, 2))
+            self.eq(replay.state(0, 0).cogs[0].health, self.cog.max_health)
+            self.eq([replay.state(0, turn).cogs[0].health for turn in (1, 2)], health)
+            self.eq(replay.state(0).cogs[0].avatar_id, int(self.cog.avatar_id))
+
+            restored = replay.restore(0, 2)
+            self.eq(restored.to_bytes(), self.battle.to_bytes(), msg="Restored states are equal to the recorded one")
+            restored.cleanup()
+
+    def test_records(self):
+        self.record()
+        cog_id = int(self.cog.avatar_id)
+        with Replay(self.path) as replay:
+            kinds = (RecordDamage, RecordEffect, RecordRemoved)
+            records = [record for record in replay.records(0, kinds) if record[1] == cog_id]
+            self.eq(records[0], (RecordDamage, cog_id, 90, self.cog.max_health - 90))
+            self.eq(records[1][:3], (RecordEffect, cog_id, CommonEffects.Stun), msg="Hits stun the cog")
+            self.eq(records[2], (RecordRemoved, cog_id, CommonEffects.Stun), msg="Stun expires after the turn")
+
+            counts = replay.event_counts()
+            self.eq((counts[Events.ToonsMoved], counts[Events.CogsMoved]), (2, 1))
+            self.eq(replay.damage_taken()[cog_id], 90)
+            self.assertTrue(any(record[1] == Events.DamageDealt for record in replay.records(0, (RecordEvent,))))
+            rolls = list(replay.records(kinds=(RecordRoll,)))
+            self.eq(len(rolls), 2, msg="The throw, then the attack of the cog")
+            self.eq(rolls[0][1:], (1, True))
+            self.eq(replay.hit_rate(), sum(hit for _, _, hit in rolls) / 2)
+
+    def test_append(self):
+        self.record()
+        other = ClashState()
+        other.create_toon()
+        with EventLog(self.path) as log:
+            with other.log_to(log):
+                other.create_cog(4)
+        other.cleanup()
+
+        with open(self.path, "ab") as file:
+            file.write(bytes([RecordDamage, 20, 1]))
+        with Replay(self.path) as replay:
+            self.eq(len(replay), 2, msg="Logs only grow")
+            self.eq(replay.turns(1), 0)
+            self.eq(len(replay.state(1).cogs), 0)
+            self.eq(len(replay.final(1).cogs), 1, msg="The end record has the state after the last turn")
+            self.assertTrue(replay.truncated)
+
+    def test_append_after_torn_record(self):
+        self.record()
+        size = os.path.getsize(self.path)
+        with open(self.path, "ab") as file:
+            file.write(bytes([RecordDamage, 20, 1]))
+
+        self.record()
+        with Replay(self.path) as replay:
+            self.eq(len(replay), 2, msg="The torn record is dropped before appending")
+            self.eq(replay.battles[1].start, size)
+            self.eq(len(replay.final(1).toons), 1)
+            self.assertFalse(replay.truncated)
+
+    def test_restore_attributes(self):
+        executive = self.battle.create_cog(9, exe=True)
+        self.battle.create_effect(self.toon, ClashEffects.Encore, multiplier=1.2)
+        with EventLog(self.path) as log:
+            with self.battle.log_to(log):
+                self.battle.use_gags(self.throw)
+                live = self.battle.fingerprint()
+
+        with Replay(self.path) as replay:
+            self.eq(replay.state(0, 1).cogs[1].attributes, {"executive": True, "level": 9})
+            restored = replay.restore(0, 1)
+            encore = restored.toons[0].effects[ClashEffects.Encore]
+            self.eq((restored.cogs[executive.avatar_id].executive, encore.turns), (True, 1))
+            self.eq(restored.fingerprint(), live, msg="Restored turns are equal to the live state")
+            restored.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
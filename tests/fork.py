@@ -0,0 +1,57 @@
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects
+
+
+class TestFork(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.battle.create_effect(self.battle, CommonEffects.ToonsHit)
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.small_cog = self.battle.create_cog(1)
+        self.big_cog = self.battle.create_cog(15)
+        self.battle.create_effect(self.big_cog, ClashEffects.Lured, knockback=30)
+        self.battle.create_effect(self.small_cog, ClashEffects.Trapped, value=20)
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def test_rollback(self):
+        before = str(self.battle.cogs), str(self.battle.toons)
+        lure = self.big_cog.effects[ClashEffects.Lured]
+        with self.battle.fork():
+            self.battle.use_gags(
+                (self.toon1.avatar_id, ClashGags.Throw, 7, self.big_cog.avatar_id, False),
+                (self.toon2.avatar_id, ClashGags.Sound, 6, (), False),
+            )
+            self.eq(len(self.battle.cogs), 1, msg="Small cog dies and is removed")
+            self.assertNotIn(ClashEffects.Lured, self.big_cog.effects)
+            self.battle.create_cog(5)
+
+        self.eq((str(self.battle.cogs), str(self.battle.toons)), before, msg="Health and avatar order are restored")
+        self.assertIs(self.battle.cogs[self.big_cog.avatar_id], self.big_cog, msg="Avatars are shared, not copied")
+        self.assertNotIn(CommonEffects.Stun, self.big_cog.effects, msg="Effects created in the branch are dropped")
+        self.assertNotIn(ClashEffects.Encore, self.toon2.effects)
+        restored_lure = self.big_cog.effects[ClashEffects.Lured]
+        self.assertIs(restored_lure, lure, msg="Removed effects are attached again")
+        self.eq((restored_lure.turns, restored_lure.knockback), (lure.turns, lure.knockback))
+        self.assertIs(self.battle.cogs(0), self.small_cog, msg="Removed avatars are attached again")
+        self.eq(self.small_cog.effects[ClashEffects.Trapped].value, 20, msg="Their effects are restored")
+        self.eq(self.battle.cogs.detached, [], msg="Detached avatars are released after the rollback")
+        self.assertIsNone(self.big_cog.effects.detached, msg="So are detached effects")
+
+    def test_nested(self):
+        with self.battle.fork():
+            self.battle.deal_damage(self.big_cog, 10)
+            with self.battle.fork():
+                self.battle.deal_damage(self.big_cog, 10)
+            self.eq(self.big_cog.max_health - self.big_cog.health, 10)
+        self.eq(self.big_cog.max_health, self.big_cog.health)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import math
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.clash import gag_config
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashGags, CommonEffects
+
+
+class TestOutcomes(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.cog = self.battle.create_cog(12)
+        self.big_cog = self.battle.create_cog(20)
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    CreamPieDamage = gag_config.ClashGagConfiguration[ClashGags.Throw].damages[7]
+    PianoDamage = gag_config.ClashGagConfiguration[ClashGags.Drop].damages[7]
+
+    def test_single_roll(self):
+        dist = self.battle.run_gags_exact((self.toon1.avatar_id, ClashGags.Throw, 7, self.cog.avatar_id, False))
+        self.eq(len(dist), 2, msg="Hit and miss are the only outcomes")
+        self.eq(dist.evaluations, 2)
+        self.flt(dist.kill_probability(self.cog.avatar_id), 0)
+        self.flt(dist.probability(lambda o: o.health[self.cog.avatar_id] == 182 - self.CreamPieDamage), 0.95)
+        self.flt(dist.probability(lambda o: True), 1.0)
+        self.eq(self.cog.health, self.cog.max_health, msg="Original state is not modified")
+
+    def test_merged_branches(self):
+        dist = self.battle.run_gags_exact(
+            (self.toon1.avatar_id, ClashGags.Drop, 7, self.big_cog.avatar_id, False),
+            (self.toon2.avatar_id, ClashGags.Drop, 7, self.big_cog.avatar_id, False),
+        )
+        self.eq(dist.evaluations, 4, msg="Drop rolls every part separately")
+        self.eq(len(dist), 3, msg="Either single hit ends in the same state")
+        single = 462 - self.PianoDamage
+        self.flt(dist.probability(lambda o: o.health[self.big_cog.avatar_id] == single), 2 * 0.95 * 0.05)
+        self.flt(dist.kill_probability(self.big_cog.avatar_id), 0.95 * 0.95)
+
+    def test_always_hit(self):
+        self.battle.create_effect(self.battle, CommonEffects.ToonsHit)
+        dist = self.battle.run_gags_exact((self.toon1.avatar_id, ClashGags.Throw, 7, self.cog.avatar_id, False))
+        self.eq(dist.evaluations, 1, msg="Certain rolls do not branch")
+        self.flt(dist.expected_health(self.cog.avatar_id), math.ceil(182 - self.CreamPieDamage))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.clash.planner import BattlePlanner
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashGags, CommonEffects
+
+
+class TestPlanner(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.battle.create_effect(self.battle, CommonEffects.ToonsHit)
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.weak_cog = self.battle.create_cog(2)
+        self.strong_cog = self.battle.create_cog(9)
+        available = {
+            self.toon1.avatar_id: [(ClashGags.Throw, 1, False), (ClashGags.Throw, 5, False)],
+            self.toon2.avatar_id: [(ClashGags.Sound, 0, False), (ClashGags.Throw, 5, False)],
+        }
+        self.planner = BattlePlanner(self.battle, available, max_turns=3, seed=1)
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def test_search(self):
+        plan = self.planner.search(iterations=400)
+        self.eq(self.planner.rollouts, 400)
+        self.eq(self.battle.cogs[0].health, self.battle.cogs[0].max_health, msg="Searching does not modify the state")
+        self.assertIsNone(self.battle.rng, msg="The state generator is restored")
+        self.eq(len(plan), 2, msg="Both toons attack")
+
+        variation = self.planner.principal_variation()
+        self.assertGreaterEqual(len(variation), 2)
+        with self.battle.fork():
+            for turn_plan in variation[:2]:
+                self.battle.use_gags(*self.planner.playable(turn_plan))
+            self.eq(len(self.battle.cogs), 0, msg="The suggested line wins in two turns, which is the fastest")
+
+    def test_advance(self):
+        plan = self.planner.search(iterations=200)
+        subtree = self.planner.root.children[plan]
+        self.battle.use_gags(*plan)
+        self.planner.advance(plan)
+        self.assertIs(self.planner.root, subtree, msg="The subtree of the played plan is reused")
+        self.assertIsNone(subtree.parent)
+        self.planner.search(iterations=50)
+        self.eq(self.planner.root.visits, subtree.visits)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashGags, CommonEffects
+
+
+def pairs(distribution) -> list:
+    return [(outcome.key, outcome.probability) for outcome in distribution]
+
+
+class TestPooling(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.battle.create_effect(self.battle, CommonEffects.ToonsHit)
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.cog1 = self.battle.create_cog(10)
+        self.cog2 = self.battle.create_cog(12)
+        self.throw = (self.toon1.avatar_id, ClashGags.Throw, 5, self.cog1.avatar_id, False)
+        self.squirt = (self.toon2.avatar_id, ClashGags.Squirt, 2, self.cog2.avatar_id, False)
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def test_gag_definitions(self):
+        first = self.battle.run_gags(self.throw)
+        throw = first[0]
+        self.eq(throw.levels, (5,))
+        controller = self.battle.gag_controller
+        self.eq(len(controller), 0, msg="Definitions are detached once the gags ran")
+
+        second = self.battle.run_gags(self.throw, self.squirt)
+        self.assertIs(self.battle.gag_controller, controller)
+        self.assertIn(throw, second, msg="The definition of the track is reused")
+        self.eq(controller.pool.reused, 1)
+        self.eq(self.cog1.health, self.cog1.max_health - 180)
+        self.eq([gag.track for gag in second], [ClashGags.Squirt, ClashGags.Throw])
+
+        self.battle.run_gags((self.toon1.avatar_id, ClashGags.Throw, 1, self.cog2.avatar_id, False))
+        self.eq((throw.levels, throw.target), ((1,), (self.cog2,)), msg="Reused definitions are constructed again")
+        self.assertIsNone(throw.accuracy_cache, msg="The accuracy of the last run is not kept")
+
+    def test_stun(self):
+        self.battle.use_gags(self.throw)
+        self.assertIsNone(self.cog1.effects.get(CommonEffects.Stun), msg="Stun expires at the end of the turn")
+        self.eq(len(self.cog1.effects.pool), 1)
+
+        stun = self.battle.create_effect(self.cog1, CommonEffects.Stun, stacks=3)
+        self.eq(self.cog1.effects.pool.reused, 1)
+        self.eq(len(self.cog1.effects.pool), 0)
+        self.eq((stun.turns, stun.stacks), (1, 3), msg="Reused effects are reset")
+        self.assertIs(self.cog1.effects.get(CommonEffects.Stun), stun)
+
+    def test_fork(self):
+        stun = self.battle.create_effect(self.cog1, CommonEffects.Stun, stacks=2)
+        with self.battle.fork():
+            self.battle.use_gags(self.squirt)
+            self.assertIsNone(self.cog1.effects.get(CommonEffects.Stun))
+            self.battle.create_effect(self.cog2, CommonEffects.Stun)
+        self.assertIs(self.cog1.effects.get(CommonEffects.Stun), stun, msg="The removed effect is attached again")
+        self.eq(stun.stacks, 2)
+        self.assertIsNone(self.cog2.effects.get(CommonEffects.Stun), msg="Effects created in the branch are dropped")
+
+    def test_same_results(self):
+        pooled = pairs(self.battle.run_gags_exact(self.throw, self.squirt, use=True))
+        self.battle.run_gags_exact(self.throw, use=True)
+        self.eq(pairs(self.battle.run_gags_exact(self.throw, self.squirt, use=True)), pooled)
+
+        fresh = ClashState()
+        fresh.create_effect(fresh, CommonEffects.ToonsHit)
+        fresh.create_toon()
+        fresh.create_toon()
+        fresh.create_cog(10)
+        fresh.create_cog(12)
+        self.eq(pairs(fresh.run_gags_exact(self.throw, self.squirt, use=True)), pooled, msg="Pooling changes nothing")
+        fresh.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
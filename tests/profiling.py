@@ -0,0 +1,48 @@
+import sys
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashEffects, ClashGags, CommonEffects
+
+
+class TestProfiling(BaseTest):
+    def setUp(self):
+        self.battle = ClashState()
+        self.battle.create_effect(self.battle, CommonEffects.ToonsHit)
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.cog = self.battle.create_cog(12)
+        self.battle.create_effect(self.cog, ClashEffects.Lured, knockback=20)
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def test_summary(self):
+        with self.battle.profile() as profiler:
+            self.battle.use_gags(
+                (self.toon1.avatar_id, ClashGags.Throw, 5, self.cog.avatar_id, False),
+                (self.toon2.avatar_id, ClashGags.Throw, 5, self.cog.avatar_id, False),
+            )
+        self.assertIsNone(sys.getprofile(), msg="The profiler is removed when stopped")
+
+        summary = profiler.summary()
+        self.assertGreater(summary["calculate"]["Damage"]["count"], 0)
+        self.assertGreater(summary["emit"]["DamageDealt"]["count"], 0)
+        self.assertGreater(summary["replace"]["DealDamage"]["count"], 0)
+        self.assertIn("EffectLured.replace_damage", summary["handlers"])
+        self.assertGreater(summary["replace"]["GagAccuracy"]["count"], 0)
+
+        lines = profiler.collapsed().splitlines()
+        self.assertTrue(any(";calculate:Damage;EffectLured.replace_damage " in line for line in lines))
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+
+    def test_disabled(self):
+        profiler = self.battle.profile()
+        self.battle.run_gags((self.toon1.avatar_id, ClashGags.Throw, 5, self.cog.avatar_id, False))
+        self.eq(profiler.summary()["handlers"], {}, msg="Nothing is recorded unless started")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import random
+import unittest
+
+from base import BaseTest
+from toonbattle.calculator.common.rng import RandomStreams, sample_plans
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.helpers.enums import ClashGags
+
+
+class TestRandomStreams(BaseTest):
+    def setUp(self):
+        self.battle = ClashState(rng=random.Random(5))
+        self.toon1 = self.battle.create_toon()
+        self.toon2 = self.battle.create_toon()
+        self.cog = self.battle.create_cog(12)
+        self.plan = [(self.toon1.avatar_id, ClashGags.Drop, 4, self.cog.avatar_id, False)]
+
+    def tearDown(self):
+        self.battle.cleanup()
+        self.battle = None
+
+    def test_state_rng(self):
+        healths = []
+        for _ in range(2):
+            self.battle.seed(3)
+            skelecog = self.battle.create_cog(10, skelecog=1)
+            with self.battle.fork():
+                for _ in range(10):
+                    self.battle.run_gags(*self.plan)
+                healths.append((skelecog.max_health, self.cog.health))
+            self.battle.cogs.remove(skelecog)
+        self.eq(healths[0], healths[1], msg="Skelecog health and rolls come from the seeded state generator")
+
+    def test_streams(self):
+        streams = RandomStreams(7)
+        self.eq(streams.trial(3, 1).random(), RandomStreams(7).trial(3, 1).random(), msg="Streams are reproducible")
+        self.assertNotEqual(streams.trial(3, 1).random(), streams.trial(3, 2).random())
+        common = RandomStreams(7, common=True)
+        self.eq(common.trial(3, 1).random(), common.trial(3, 2).random(), msg="Plans share streams")
+
+    def test_common_random_numbers(self):
+        same_plan = [self.plan, list(self.plan)]
+        common = sample_plans(self.battle, same_plan, trials=50, seed=1)
+        self.eq(common[0], common[1], msg="Identical plans see identical rolls")
+        independent = sample_plans(self.battle, same_plan, trials=50, seed=1, common=False)
+        self.assertNotEqual(independent[0], independent[1])
+        self.eq(self.cog.health, self.cog.max_health, msg="Sampling does not modify the state")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+import tempfile
+import types
+import unittest
+
+from pycluster.messenger.helpers import listen
+from pycluster.messenger.object_registry import ObjectRegistry
+
+from base import BaseTest
+from toonbattle.calculator.common.ruleset import FrozenTable, RegistryFrozen, Ruleset, source_digest
+from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.globals import CalculationObject
+from toonbattle.calculator.helpers.dispatch import UnroutedListener
+
+
+class TestRuleset(BaseTest):
+    def test_lazy(self):
+        code = (
+            "import sys; from toonbattle.calculator.common.state import ClashState; "
+            "print('toonbattle.calculator.clash.effects' in sys.modules); ClashState(); "
+            "print('toonbattle.calculator.clash.effects' in sys.modules)"
+        )
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+        self.eq(output.split(), ["False", "True"], msg="The ruleset is imported by the first state")
+
+    def test_freeze(self):
+        registry = ObjectRegistry("test-ruleset")
+
+        @registry.register(1)
+        class First(CalculationObject):
+            pass
+
+        ruleset = Ruleset("test", (), (registry,))
+        self.assertFalse(ruleset.frozen)
+        ruleset.freeze()
+        self.assertTrue(ruleset.loaded and ruleset.frozen)
+        self.assertIsInstance(registry.objects, FrozenTable)
+        self.assertIs(registry.objects[1], First)
+        with self.assertRaises(RegistryFrozen):
+
+            @registry.register(2)
+            class Second(CalculationObject):
+                pass
+
+    def test_unrouted(self):
+        module = types.ModuleType("toonbattle_test_unrouted")
+        module.listen = listen
+        sys.modules[module.__name__] = module
+        self.addCleanup(sys.modules.pop, module.__name__)
+        registry = ObjectRegistry("test-unrouted")
+
+        @registry.register(1)
+        class Listener(CalculationObject):
+            pass
+
+        Listener.__module__ = module.__name__
+        with self.assertRaises(UnroutedListener, msg="Events outside of BroadcastEvents would never reach it"):
+            Ruleset("test", (), (registry,)).freeze()
+
+    def test_digest(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "toonbattle_test_rules.py")
+        with open(path, "w") as file:
+            file.write("Damage = 10\n")
+        sys.path.insert(0, directory.name)
+        self.addCleanup(sys.path.remove, directory.name)
+        self.addCleanup(sys.modules.pop, "toonbattle_test_rules", None)
+
+        ruleset = Ruleset("test", ("toonbattle_test_rules",), ()).load()
+        self.eq(source_digest(ruleset.modules), ruleset.digest)
+        with open(path, "w") as file:
+            file.write("Damage = 12\n")
+        self.assertNotEqual(source_digest(ruleset.modules), ruleset.digest, msg="Changing a rule table changes it")
+
+    def test_state(self):
+        battle = ClashState()
+        self.assertTrue(ClashState.Rules.loaded)
+        battle.create_cog(5)
+        battle.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,24 @@
 from clash_effects import *  # noqa
 from wrap import *  # noqa
 from clash_moves import *  # noqa
+from outcomes import *  # noqa
+from batch import *  # noqa
+from combos import *  # noqa
+from fork import *  # noqa
+from profiling import *  # noqa
+from avatars import *  # noqa
+from delta import *  # noqa
+from evaluate import *  # noqa
+from estimate import *  # noqa
+from planner import *  # noqa
+from rng import *  # noqa
+from cog_attacks import *  # noqa
+from cache import *  # noqa
+from ruleset import *  # noqa
+from pooling import *  # noqa
+from eventlog import *  # noqa
+from dataset import *  # noqa
+from web import *  # noqa
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from base import BaseTest
+from toonbattle.calculator.helpers.enums import ClashGags
+from toonbattle.web.pool import QueryError, StatePool, battle_key, init_worker, run_gags, what_if
+from toonbattle.web.server import BattleServer
+
+Battle = {"toons": 2, "cogs": [10, {"level": 12, "exe": True}], "always_hit": True}
+Throw = [0, ClashGags.Throw, 5, 0, False]
+
+
+async def request(port: int, method: str, path: str, payload=None, requests: int = 1) -> list[tuple[int, dict]]:
+    """Sends the same request `requests` times over one keep-alive connection."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = b"" if payload is None else json.dumps(payload).encode()
+    responses = []
+    for _ in range(requests):
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        responses.append((status, json.loads(await reader.readexactly(int(headers["content-length"])))))
+    writer.close()
+    return responses
+
+
+async def health(server: BattleServer) -> dict:
+    (_, body), = await request(server.port, "GET", "/health")
+    return body
+
+
+class GatedExecutor(ThreadPoolExecutor):
+    """
+    One worker thread whose queries wait for `gate` to be set. submit() only returns once the first query is
+    running, so later ones are known to be queued behind it.
+    """
+
+    def __init__(self):
+        super().__init__(1)
+        self.gate = threading.Event()
+        self.occupied = False
+
+    def submit(self, fn, *args, **kwargs):
+        running = threading.Event()
+
+        def gated():
+            running.set()
+            self.gate.wait()
+            return fn(*args, **kwargs)
+
+        future = super().submit(gated)
+        if not self.occupied:
+            running.wait()
+            self.occupied = True
+        return future
+
+
+class TestStatePool(BaseTest):
+    def setUp(self):
+        self.pool = StatePool(size=2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_reuse(self):
+        first = self.pool.run(run_gags, {"battle": Battle, "gags": [Throw]})
+        second = self.pool.run(run_gags, {"battle": Battle, "gags": [Throw]})
+        self.eq(first, second, msg="Queries run on a fork of the pooled state")
+        self.eq(first["cogs"][0], 132 - 90)
+        self.eq(self.pool.built, 1)
+
+        self.pool.run(run_gags, {"battle": {**Battle, "cogs": [3]}, "gags": []})
+        self.pool.run(run_gags, {"battle": {**Battle, "cogs": [4]}, "gags": []})
+        self.eq(len(self.pool), 2, msg="The least recently used state is evicted")
+        self.assertNotIn(battle_key(Battle), self.pool.states)
+
+    def test_what_if(self):
+        result = self.pool.run(what_if, {"battle": Battle, "plans": [[Throw], []]})
+        self.eq([plan["kill_probability"] for plan in result["plans"]], [0.0, 0.0])
+        self.eq(result["plans"][0]["expected_health"][0], 132 - 90)
+
+    def test_errors(self):
+        with self.assertRaises(QueryError):
+            battle_key({"cogs": [{"level": 5, "skelecog": 1}]})
+        with self.assertRaises(QueryError):
+            self.pool.run(run_gags, {"battle": Battle, "gags": [[5, ClashGags.Throw, 6, 0, False]]})
+        with self.assertRaises(QueryError):
+            self.pool.run(run_gags, {"battle": Battle, "gags": [[0, ClashGags.Throw, 6]]})
+
+
+class TestBattleServer(BaseTest):
+    def test_requests(self):
+        async def run():
+            async with BattleServer(port=0, workers=0) as server:
+                responses = await request(server.port, "POST", "/run_gags", {"battle": Battle, "gags": [Throw]}, 3)
+                self.eq([status for status, _ in responses], [200] * 3, msg="Connections are kept alive")
+                self.eq(responses[0][1]["cogs"][0], 132 - 90)
+
+                (status, body), = await request(server.port, "POST", "/what_if", {"battle": Battle, "plans": [[]]})
+                self.eq(status, 200)
+                self.eq(len(body["plans"]), 1)
+
+                (status, _), = await request(server.port, "POST", "/run_gags", {"battle": {"cogs": []}})
+                self.eq(status, 400)
+                (status, _), = await request(server.port, "GET", "/nothing")
+                self.eq(status, 404)
+                (status, body), = await request(server.port, "GET", "/health")
+                self.eq((status, body["served"], body["pooled"]), (200, 4, 1))
+
+        asyncio.run(run())
+
+    def test_limits(self):
+        async def run():
+            async with BattleServer(port=0, workers=1, max_pending=2) as server:
+                server.executor.shutdown()
+                server.executor = executor = GatedExecutor()
+                init_worker(2)
+                heavy = {"battle": Battle, "plans": [[Throw]]}
+                try:
+                    (status, _), = await request(server.port, "POST", "/what_if", {**heavy, "deadline": 0.05})
+                    self.eq(status, 504, msg="The query is blocked on the gate")
+                    self.eq((await health(server))["pending"], 1, msg="The running query keeps its slot")
+                    (status, _), = await request(server.port, "POST", "/what_if", {**heavy, "deadline": 0.05})
+                    self.eq(status, 504)
+                    self.eq((await health(server))["pending"], 1, msg="The queued query is cancelled, freeing its slot")
+
+                    queued = asyncio.create_task(request(server.port, "POST", "/what_if", heavy))
+                    while (await health(server))["pending"] < 2:
+                        await asyncio.sleep(0.01)
+                    (status, _), = await request(server.port, "POST", "/what_if", heavy)
+                    self.eq(status, 503, msg="Both slots are taken")
+                finally:
+                    executor.gate.set()
+                (status, _), = await queued
+                self.eq(status, 200)
+                body = await health(server)
+                self.eq((body["pending"], body["rejected"], body["timed_out"]), (0, 1, 2), msg="No slot is leaked")
+
+        asyncio.run(run())
+
+    def test_workers(self):
+        async def run():
+            async with BattleServer(port=0, workers=1) as server:
+                (status, body), = await request(server.port, "POST", "/what_if", {"battle": Battle, "plans": [[[5]]]})
+                self.eq(status, 400, msg="Query errors of the workers are sent back")
+                self.assertIn("gag", body["error"])
+
+                server.executor.shutdown()
+                (status, _), = await request(server.port, "POST", "/what_if", {"battle": Battle, "plans": [[Throw]]})
+                self.eq(status, 500)
+                body = await health(server)
+                self.eq((body["pending"], body["failed"]), (0, 1), msg="No slot is leaked")
+
+        asyncio.run(run())
+
+if __name__ == "__main__":
+    unittest.main()
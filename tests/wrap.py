@@ -3,8 +3,9 @@ import unittest
 
 from base import BaseTest
 from toonbattle.calculator.common.state import ClashState
+from toonbattle.calculator.common.wire import WireError
 from toonbattle.calculator.globals import ClashObjectRegistry
-from toonbattle.calculator.helpers.enums import ClashEffects
+from toonbattle.calculator.helpers.enums import ClashEffects, Events
 
 
 class TestWrap(BaseTest):
@@ -26,6 +27,31 @@ class TestWrap(BaseTest):
         self.assertEqual(str(s2.cogs), str(self.s.cogs))
         s2.cleanup()
 
+    def test_bytes(self):
+        toon = self.s.create_toon()
+        self.s.create_effect(toon, ClashEffects.Encore, multiplier=1.2)
+        self.s.emit(Events.ToonsMoved)
+        self.s.create_cog(9, exe=True)
+        cog1 = self.s.cogs[0]
+        self.s.create_effect(cog1, ClashEffects.Lured, knockback=25)
+        data = self.s.to_bytes()
+        self.assertLess(len(data), len(json.dumps(self.s.wrap())), msg="Binary form is smaller than the wrapped one")
+
+        s2 = ClashState.from_bytes(data)
+        self.eq(str(s2.cogs), str(self.s.cogs))
+        self.eq([cog.avatar_id for cog in s2.cogs], [cog.avatar_id for cog in self.s.cogs])
+        self.eq(s2.cogs[2].health, 181)
+        self.eq(s2.cogs[0].effects[ClashEffects.Lured].datagram, cog1.effects[ClashEffects.Lured].datagram)
+        self.eq(s2.LatestAllocatedID, self.s.LatestAllocatedID)
+        self.eq((s2.cogs[3].executive, s2.cogs[3].level), (True, 9), msg="Attributes outside of datagrams are kept")
+        self.eq(s2.toons[0].effects[ClashEffects.Encore].turns, 1)
+        self.eq(s2.fingerprint(), self.s.fingerprint())
+        self.eq(s2.to_bytes(), data, msg="Decoding and encoding again round-trips")
+        s2.cleanup()
+
+        with self.assertRaises(WireError):
+            ClashState.from_bytes(data[:-1])
+
 
 if __name__ == "__main__":
     unittest.main()